@@ -0,0 +1 @@
+"""Reproducible micro- and macro-benchmarks for the conversion pipeline."""
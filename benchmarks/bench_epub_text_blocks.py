@@ -0,0 +1,75 @@
+"""Compare EPUB text-block collection before and after the single-pass walk.
+
+Usage::
+
+    python -m benchmarks.bench_epub_text_blocks [--chapters 200] [--paragraphs 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from pipeline.common import PageText, checksum, load_mapping, normalize_text
+from pipeline.epub_archive import EpubArchive
+from pipeline.epub_pipeline import EPUB_NS, _aggregate_html, _iter_text_blocks, _parse_opf, _read_container
+
+from .generators import make_synthetic_epub
+
+
+def _legacy_pages(doc, config: dict) -> List[PageText]:
+    blocks = [
+        " ".join(child.xpath(".//text()"))
+        for child in doc.xpath("//html:body/*", namespaces=EPUB_NS)
+    ]
+    pages = []
+    for idx, text in enumerate(blocks, start=1):
+        norm_text = normalize_text(text, config)
+        pages.append(PageText(idx, text, norm_text, checksum(norm_text)))
+    return pages
+
+
+def _best_of(repeat: int, func: Callable[[], object]) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chapters", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    config = load_mapping(Path("config"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        epub = make_synthetic_epub(
+            Path(tmpdir) / "bench.epub", chapters=args.chapters, paragraphs=args.paragraphs
+        )
+        with EpubArchive(epub) as archive:
+            rootfile = _read_container(archive)
+            opf = _parse_opf(archive, rootfile)
+            html_root = _aggregate_html(archive, rootfile, opf["manifest"], opf["spine"])
+
+    legacy = _legacy_pages(html_root, config)
+    single = list(_iter_text_blocks(html_root, config))
+    assert [(p.raw_text, p.checksum) for p in legacy] == [(p.raw_text, p.checksum) for p in single]
+
+    legacy_time = _best_of(args.repeat, lambda: _legacy_pages(html_root, config))
+    single_time = _best_of(args.repeat, lambda: list(_iter_text_blocks(html_root, config)))
+    print(f"blocks:      {len(single)}")
+    print(f"legacy:      {legacy_time * 1000:.1f} ms")
+    print(f"single-pass: {single_time * 1000:.1f} ms")
+    print(f"speedup:     {legacy_time / single_time:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+"""Measure packaging CPU time with and without stored (uncompressed) media.
+
+Usage::
+
+    python -m benchmarks.bench_package [--chapters 40] [--figures 10] [--image-size 512] [--workers 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+import time
+from copy import deepcopy
+from pathlib import Path
+
+from pipeline.package import package_docbook
+
+from .generators import make_synthetic_docbook
+
+
+def _package(root, media, out_dir: Path, **kwargs) -> tuple:
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    zip_path = package_docbook(
+        deepcopy(root),
+        "book",
+        "RITTDOCdtd/v1.1/RittDocBook.dtd",
+        str(out_dir / "book.xml"),
+        media_fetcher=media.get,
+        **kwargs,
+    )
+    return (
+        time.process_time() - start_cpu,
+        time.perf_counter() - start_wall,
+        zip_path.stat().st_size,
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--paragraphs", type=int, default=50)
+    parser.add_argument("--figures", type=int, default=10)
+    parser.add_argument("--image-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    root, media = make_synthetic_docbook(
+        chapters=args.chapters,
+        paragraphs=args.paragraphs,
+        figures=args.figures,
+        image_size=args.image_size,
+    )
+    print(f"images: {len(media)} ({sum(map(len, media.values())) / 1e6:.1f} MB)")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for label, kwargs in (
+            ("deflate all", {"store_compressed_media": False}),
+            ("store media", {"store_compressed_media": True}),
+            (f"{args.workers} workers", {"store_compressed_media": True, "workers": args.workers}),
+        ):
+            out_dir = Path(tmpdir) / label.replace(" ", "_")
+            cpu, wall, size = _package(root, media, out_dir, **kwargs)
+            print(f"{label:12s} cpu {cpu:6.2f} s  wall {wall:6.2f} s  zip {size / 1e6:7.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
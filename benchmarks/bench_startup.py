@@ -0,0 +1,84 @@
+"""Measure CLI start-up time and fail when it exceeds a budget.
+
+Usage::
+
+    python -m benchmarks.bench_startup [--repeat 10] [--budget-ms 100]
+
+Each command runs in a fresh interpreter; the best wall time of
+``--repeat`` runs is reported next to a bare ``python -c pass`` for
+reference.  ``cli.py validate`` checks a one-section book; the same xmllint
+run is timed on its own and subtracted before that command is held to the
+budget.  The check fails if any CLI command is over ``--budget-ms``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Sequence
+
+ROOT = Path(__file__).resolve().parents[1]
+
+COMMANDS = {
+    "cli.py --help": ["cli.py", "--help"],
+    "cli.py validate --help": ["cli.py", "validate", "--help"],
+    "cli.py pdf --help": ["cli.py", "pdf", "--help"],
+}
+
+# The RittDoc chapter content model is not deterministic, which xmllint
+# rejects, so the sample book holds a preface only.
+_VALIDATE_SAMPLE = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE book SYSTEM "{dtd}">
+<book><title>Start-up</title><preface><title>Preface</title><para>Text.</para></preface></book>
+"""
+
+
+def _best_wall(args: Sequence[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=ROOT, check=True, capture_output=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args(argv)
+
+    interpreter = _best_wall([sys.executable, "-c", "pass"], args.repeat)
+    print(f"{'python -c pass':28s} {interpreter * 1000:7.1f} ms")
+    over_budget = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # label -> (command, time spent in the tool it runs)
+        commands = {label: ([sys.executable, *command], 0.0) for label, command in COMMANDS.items()}
+        if shutil.which("xmllint"):
+            sample = Path(tmpdir) / "book.xml"
+            dtd = ROOT / "RITTDOCdtd" / "v1.1" / "RittDocBook.dtd"
+            sample.write_text(_VALIDATE_SAMPLE.format(dtd=dtd), encoding="utf-8")
+            xmllint = _best_wall(["xmllint", "--noout", "--valid", "--dtdvalid", str(dtd), str(sample)], args.repeat)
+            print(f"{'xmllint --valid':28s} {xmllint * 1000:7.1f} ms")
+            validate = [sys.executable, "cli.py", "validate", "--input", str(sample), "--catalog", ""]
+            commands["cli.py validate"] = (validate, xmllint)
+        else:
+            print("xmllint not found; skipping cli.py validate", file=sys.stderr)
+        for label, (command, tool) in commands.items():
+            wall = _best_wall(command, args.repeat)
+            print(f"{label:28s} {wall * 1000:7.1f} ms  (+{(wall - interpreter - tool) * 1000:.1f} ms)")
+            if (wall - tool) * 1000 > args.budget_ms:
+                over_budget.append(label)
+    if over_budget:
+        print(f"over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
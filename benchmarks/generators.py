@@ -0,0 +1,241 @@
+"""Deterministic generators for synthetic benchmark inputs."""
+
+from __future__ import annotations
+
+import random
+import struct
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+from pipeline.common import PageText, checksum
+
+_WORDS = (
+    "patient assessment nursing care plan outcome intervention rationale "
+    "diagnosis evaluation symptom dosage monitor chronic acute therapy "
+    "clinical evidence review protocol ventilation cardiac renal hepatic "
+    "naïve café résumé coöperate α-blocker β-agonist µg ±5% °C"
+).split()
+
+_CONTAINER_XML = (
+    '<?xml version="1.0"?>'
+    '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+    '<rootfiles><rootfile full-path="OEBPS/content.opf" '
+    'media-type="application/oebps-package+xml"/></rootfiles></container>'
+)
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+_PAGE_WIDTH = 918
+_LINE_STEP = 15
+_BODY_LEFT = 72
+_TABLE_COLUMNS = (72, 260, 450)
+
+
+def _pdfxml_text(top: float, left: float, text: str, font: int, size: int) -> str:
+    width = int(len(text) * size * 0.5)
+    return (
+        f'<text top="{top}" left="{left}" width="{width}" height="{size + 3}" '
+        f'font="{font}">{escape(text)}</text>'
+    )
+
+
+def make_synthetic_pdfxml(
+    path: Union[str, Path],
+    *,
+    pages: int = 50,
+    lines_per_page: int = 40,
+    chapter_every: int = 10,
+    table_every: int = 5,
+    index_pages: int = 2,
+    seed: int = 0,
+) -> Path:
+    """Write ``pdftohtml -xml`` style output for a synthetic book.
+
+    Page 1 opens with a book title, chapter headings start on page 2 and
+    then every *chapter_every* pages, every *table_every*-th page carries a three-column
+    table and the last *index_pages* pages form an index section.  Each body
+    page has a page number in its footer.
+    """
+
+    rng = random.Random(seed)
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    page_height = 90 + (lines_per_page + 8) * _LINE_STEP + 60
+    index_start = pages - index_pages + 1
+    with target.open("w", encoding="utf-8") as handle:
+        handle.write('<?xml version="1.0" encoding="UTF-8"?>\n<pdf2xml producer="synthetic">\n')
+        for number in range(1, pages + 1):
+            handle.write(
+                f'<page number="{number}" position="absolute" top="0" left="0" '
+                f'height="{page_height}" width="{_PAGE_WIDTH}">\n'
+            )
+            if number == 1:
+                handle.write('<fontspec id="0" size="11" family="Times" color="#000000"/>\n')
+                handle.write('<fontspec id="1" size="20" family="Times" color="#000000"/>\n')
+                handle.write('<fontspec id="2" size="28" family="Times" color="#000000"/>\n')
+            top = 90
+            texts = []
+            if number == 1:
+                texts.append(_pdfxml_text(top, 200, "Synthetic Benchmark Book", 2, 28))
+                top += 60
+            if number == index_start:
+                texts.append(_pdfxml_text(top, _BODY_LEFT, "Index", 1, 20))
+                top += 40
+            elif 1 < number < index_start and (number - 2) % chapter_every == 0:
+                chapter = (number - 2) // chapter_every + 1
+                texts.append(_pdfxml_text(top, _BODY_LEFT, f"Chapter {chapter}", 1, 20))
+                top += 40
+            table_rows = 4 if number < index_start and number % table_every == 0 else 0
+            for line in range(lines_per_page):
+                if number >= index_start:
+                    term = " ".join(rng.choice(_WORDS) for _ in range(2)).capitalize()
+                    text = f"{term}, {rng.randint(1, pages)}, {rng.randint(1, pages)}"
+                    texts.append(_pdfxml_text(top, _BODY_LEFT, text, 0, 11))
+                elif table_rows and line == lines_per_page // 2:
+                    top += _LINE_STEP
+                    for row in range(table_rows):
+                        for column, left in enumerate(_TABLE_COLUMNS):
+                            cell = f"R{row}C{column}" if row else f"Heading {column + 1}"
+                            texts.append(_pdfxml_text(top, left, cell, 0, 11))
+                        top += _LINE_STEP
+                    top += _LINE_STEP
+                    continue
+                else:
+                    words = rng.randint(9, 14)
+                    texts.append(_pdfxml_text(top, _BODY_LEFT, _sentence(rng, words), 0, 11))
+                # Paragraph break every six lines.
+                top += _LINE_STEP * 2 if line % 6 == 5 else _LINE_STEP
+            texts.append(_pdfxml_text(page_height - 50, 450, str(number), 0, 11))
+            handle.write("\n".join(texts))
+            handle.write("\n</page>\n")
+        handle.write("</pdf2xml>\n")
+    return target
+
+
+def make_page_texts(*, pages: int = 100, words: int = 400, seed: int = 0) -> List[PageText]:
+    """Return unnormalised pages with runs of whitespace and hyphenated line breaks."""
+
+    rng = random.Random(seed)
+    result = []
+    for number in range(1, pages + 1):
+        parts = []
+        for idx in range(words):
+            word = rng.choice(_WORDS)
+            if idx % 13 == 12 and len(word) > 4:
+                parts.append(f"{word[:3]}-\n{word[3:]}")
+            else:
+                parts.append(word)
+            parts.append("  " if idx % 7 == 0 else ("\n" if idx % 11 == 0 else " "))
+        raw = "".join(parts)
+        result.append(PageText(number, raw, raw, checksum(raw)))
+    return result
+
+
+def make_synthetic_epub(
+    path: Union[str, Path],
+    *,
+    chapters: int = 20,
+    paragraphs: int = 50,
+    seed: int = 0,
+) -> Path:
+    """Write a synthetic EPUB with *chapters* spine items of *paragraphs* each."""
+
+    rng = random.Random(seed)
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    manifest = []
+    spine = []
+    with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        zf.writestr("META-INF/container.xml", _CONTAINER_XML)
+        for chapter in range(1, chapters + 1):
+            item_id = f"ch{chapter:03d}"
+            href = f"text/{item_id}.xhtml"
+            manifest.append(
+                f'<item id="{item_id}" href="{href}" media-type="application/xhtml+xml"/>'
+            )
+            spine.append(f'<itemref idref="{item_id}"/>')
+            body = [f"<h1>Chapter {chapter}</h1>"]
+            for para in range(paragraphs):
+                if para % 10 == 9:
+                    body.append(f"<h2>Section {chapter}.{para // 10 + 1}</h2>")
+                body.append(
+                    f"<p>{_sentence(rng, 12)} <em>{_sentence(rng, 4)}</em> {_sentence(rng, 20)}</p>"
+                )
+            zf.writestr(
+                f"OEBPS/{href}",
+                '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>'
+                f"Chapter {chapter}</title></head><body>{''.join(body)}</body></html>",
+            )
+        zf.writestr(
+            "OEBPS/content.opf",
+            '<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+            f"<manifest>{''.join(manifest)}</manifest><spine>{''.join(spine)}</spine></package>",
+        )
+    return target
+
+
+def _png_chunk(kind: bytes, payload: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(payload))
+        + kind
+        + payload
+        + struct.pack(">I", zlib.crc32(kind + payload) & 0xFFFFFFFF)
+    )
+
+
+def make_png(width: int, height: int, *, seed: int = 0) -> bytes:
+    """Return a valid RGB PNG filled with noise, i.e. effectively incompressible."""
+
+    rng = random.Random(seed)
+    row_bytes = width * 3
+    raw = b"".join(b"\x00" + rng.randbytes(row_bytes) for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(raw, 1))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+def make_synthetic_docbook(
+    *,
+    chapters: int = 20,
+    paragraphs: int = 50,
+    figures: int = 5,
+    image_size: int = 256,
+    seed: int = 0,
+) -> Tuple[etree._Element, Dict[str, bytes]]:
+    """Return a RITTDoc-style ``book`` tree and the media store it references."""
+
+    rng = random.Random(seed)
+    media: Dict[str, bytes] = {}
+    root = etree.Element("book")
+    info = etree.SubElement(root, "bookinfo")
+    etree.SubElement(info, "title").text = "Synthetic Benchmark Book"
+    etree.SubElement(info, "isbn").text = "978-0-0000-0000-0"
+    toc = etree.SubElement(root, "chapter", role="toc")
+    etree.SubElement(toc, "title").text = "Table of Contents"
+    for chapter_num in range(1, chapters + 1):
+        chapter = etree.SubElement(root, "chapter", id=f"ch{chapter_num}")
+        etree.SubElement(chapter, "title").text = f"Chapter {chapter_num}"
+        for para in range(paragraphs):
+            etree.SubElement(chapter, "para").text = _sentence(rng, 30)
+            if figures and para % max(1, paragraphs // figures) == 0:
+                fig_num = para // max(1, paragraphs // figures) + 1
+                ref = f"img/ch{chapter_num:03d}_{fig_num:02d}.png"
+                media.setdefault(ref, make_png(image_size, image_size, seed=len(media) + seed))
+                figure = etree.SubElement(chapter, "figure", id=f"f{chapter_num}_{fig_num}")
+                etree.SubElement(figure, "title").text = f"Figure {chapter_num}.{fig_num}"
+                imageobject = etree.SubElement(etree.SubElement(figure, "mediaobject"), "imageobject")
+                etree.SubElement(imageobject, "imagedata", fileref=ref)
+    return root, media
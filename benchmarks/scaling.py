@@ -0,0 +1,89 @@
+"""Fit the scaling exponent of ``label_blocks`` over synthetic PDFXML.
+
+Usage::
+
+    python -m benchmarks.scaling [--lines 1000,10000,100000] [--max-exponent 1.25]
+
+Times ``label_blocks`` at each input size and fits ``time ~ lines ** k`` by
+least squares in log-log space.  Exits with status 1 when ``k`` exceeds
+``--max-exponent``, so an accidentally quadratic path fails loudly.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import math
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+from pipeline.common import load_mapping
+from pipeline.structure.heuristics import label_blocks
+
+from .generators import make_synthetic_pdfxml
+
+LINES_PER_PAGE = 40
+DEFAULT_MAX_EXPONENT = 1.25
+
+
+def fit_exponent(sizes: Sequence[float], times: Sequence[float]) -> float:
+    """Return the least-squares slope of ``log(time)`` against ``log(size)``."""
+
+    if len(sizes) != len(times) or len(sizes) < 2:
+        raise ValueError("need at least two (size, time) samples")
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(value, 1e-9)) for value in times]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    if not spread:
+        raise ValueError("sizes must not all be equal")
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+
+
+def measure(line_counts: Sequence[int], *, repeat: int = 3) -> List[Tuple[int, float]]:
+    config = load_mapping(Path("config"))
+    samples = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for lines in line_counts:
+            pages = max(1, lines // LINES_PER_PAGE)
+            path = make_synthetic_pdfxml(
+                Path(tmpdir) / f"pdfxml_{lines}.xml", pages=pages, lines_per_page=LINES_PER_PAGE
+            )
+            # Fewer repeats for the big inputs; their timings are stable anyway.
+            runs = repeat if lines <= 10_000 else 1
+            best = float("inf")
+            for _ in range(runs):
+                gc.collect()
+                start = time.perf_counter()
+                label_blocks(str(path), config)
+                best = min(best, time.perf_counter() - start)
+            samples.append((pages * LINES_PER_PAGE, best))
+            path.unlink()
+    return samples
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-exponent", type=float, default=DEFAULT_MAX_EXPONENT)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    samples = measure([int(value) for value in args.lines.split(",") if value], repeat=args.repeat)
+    for lines, seconds in samples:
+        print(f"{lines:8d} lines  {seconds * 1000:10.1f} ms  {seconds / lines * 1e6:8.2f} us/line")
+    exponent = fit_exponent([lines for lines, _ in samples], [seconds for _, seconds in samples])
+    print(f"scaling exponent: {exponent:.3f} (bound {args.max_exponent:.2f})")
+    if exponent > args.max_exponent:
+        print("label_blocks scales worse than the configured bound")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
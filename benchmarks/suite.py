@@ -0,0 +1,289 @@
+"""Time the core pipeline stages on synthetic inputs and compare against a baseline.
+
+Usage::
+
+    python -m benchmarks.suite [--sizes small,medium] [--only label_blocks]
+        [--output out/benchmarks.json] [--baseline benchmarks/baseline.json]
+        [--threshold 0.25] [--update-baseline]
+
+Results are written as JSON.  When a baseline file exists, every benchmark
+whose median time grew by more than ``--threshold`` (a fraction) and by more
+than the noise floor is reported as a regression and the command exits with
+status 1.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pipeline.common import PageText, checksum, load_mapping, normalize_text
+from pipeline.epub_pipeline import convert_epub
+from pipeline.package import package_docbook
+from pipeline.structure.docbook import build_docbook_tree
+from pipeline.structure.heuristics import label_blocks
+from pipeline.transform.rittdoc import transform_docbook_to_rittdoc
+from pipeline.validators.counters import compute_metrics
+
+from .generators import make_page_texts, make_synthetic_docbook, make_synthetic_epub, make_synthetic_pdfxml
+
+RESULTS_VERSION = 1
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+# Differences below this many seconds are noise, whatever the ratio: the
+# small inputs run for a few milliseconds, where scheduling and cache effects
+# alone move the median by a third.
+NOISE_FLOOR_S = 0.010
+DEFAULT_REPEAT = 11
+
+SIZES: Dict[str, Dict[str, int]] = {
+    "small": {"pages": 25, "lines": 40, "chapters": 5, "figures": 3, "words": 300},
+    "medium": {"pages": 100, "lines": 40, "chapters": 20, "figures": 5, "words": 400},
+    "large": {"pages": 400, "lines": 40, "chapters": 80, "figures": 5, "words": 500},
+}
+
+# A benchmark prepares its input once and returns the callable to time plus
+# the item counts that describe the input size.
+Setup = Callable[[Dict[str, int], Path, dict], Tuple[Callable[[], object], Dict[str, int]]]
+
+
+@dataclass
+class Result:
+    benchmark: str
+    size: str
+    items: Dict[str, int]
+    repeat: int
+    best_s: float
+    median_s: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.benchmark}[{self.size}]"
+
+    def as_dict(self) -> Dict:
+        return {
+            "benchmark": self.benchmark,
+            "size": self.size,
+            "items": self.items,
+            "repeat": self.repeat,
+            "best_s": round(self.best_s, 6),
+            "median_s": round(self.median_s, 6),
+        }
+
+
+def _passthrough_labels(blocks: List[dict]) -> List[dict]:
+    # Mirrors convert_pdf with the classifier disabled.
+    return [
+        {**block, "classifier_label": block.get("label", "para"), "classifier_confidence": 1.0}
+        for block in blocks
+    ]
+
+
+def _pdfxml(size: Dict[str, int], workdir: Path) -> Path:
+    path = workdir / f"pdfxml_{size['pages']}x{size['lines']}.xml"
+    if not path.exists():
+        make_synthetic_pdfxml(path, pages=size["pages"], lines_per_page=size["lines"])
+    return path
+
+
+def _setup_label_blocks(size, workdir, config):
+    path = _pdfxml(size, workdir)
+    return (lambda: label_blocks(str(path), config)), {
+        "pages": size["pages"],
+        "lines": size["pages"] * size["lines"],
+    }
+
+
+def _setup_build_docbook_tree(size, workdir, config):
+    blocks = _passthrough_labels(label_blocks(str(_pdfxml(size, workdir)), config))
+    return (lambda: build_docbook_tree(blocks, "book")), {"blocks": len(blocks)}
+
+
+def _setup_transform(size, workdir, config):
+    blocks = _passthrough_labels(label_blocks(str(_pdfxml(size, workdir)), config))
+    root = build_docbook_tree(blocks, "book")
+    return (lambda: transform_docbook_to_rittdoc(root)), {"elements": sum(1 for _ in root.iter())}
+
+
+def _setup_package(size, workdir, config):
+    root, media = make_synthetic_docbook(
+        chapters=size["chapters"], paragraphs=50, figures=size["figures"], image_size=128
+    )
+    out_path = workdir / f"package_{size['chapters']}" / "book.xml"
+
+    def run():
+        return package_docbook(
+            root,
+            "book",
+            "RITTDOCdtd/v1.1/RittDocBook.dtd",
+            str(out_path),
+            media_fetcher=media.get,
+        )
+
+    return run, {"chapters": size["chapters"], "images": len(media)}
+
+
+def _setup_normalize_text(size, workdir, config):
+    pages = make_page_texts(pages=size["pages"], words=size["words"])
+
+    def run():
+        return [normalize_text(page.raw_text, config) for page in pages]
+
+    return run, {"pages": len(pages), "chars": sum(len(page.raw_text) for page in pages)}
+
+
+def _setup_compute_metrics(size, workdir, config):
+    pre = make_page_texts(pages=size["pages"], words=size["words"])
+    for page in pre:
+        page.norm_text = normalize_text(page.raw_text, config)
+        page.checksum = checksum(page.norm_text)
+    post = [PageText(p.page_num, p.norm_text, p.norm_text, p.checksum) for p in pre]
+    # Perturb every tenth output page so the mismatch paths are exercised too.
+    for page in post[::10]:
+        page.norm_text = page.norm_text.replace("e", "é", 1)
+        page.checksum = checksum(page.norm_text)
+    return (lambda: compute_metrics(pre, post)), {"pages": len(pre)}
+
+
+def _setup_convert_epub(size, workdir, config):
+    epub = workdir / f"book_{size['chapters']}.epub"
+    if not epub.exists():
+        make_synthetic_epub(epub, chapters=size["chapters"], paragraphs=50)
+    out_path = workdir / f"epub_{size['chapters']}" / "book.xml"
+    return (lambda: convert_epub(str(epub), str(out_path), "publisher_A")), {
+        "chapters": size["chapters"]
+    }
+
+
+BENCHMARKS: Dict[str, Setup] = {
+    "label_blocks": _setup_label_blocks,
+    "build_docbook_tree": _setup_build_docbook_tree,
+    "transform_docbook_to_rittdoc": _setup_transform,
+    "package_docbook": _setup_package,
+    "normalize_text": _setup_normalize_text,
+    "compute_metrics": _setup_compute_metrics,
+    "convert_epub": _setup_convert_epub,
+}
+
+
+def _time(func: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_suite(
+    names: List[str], sizes: List[str], *, repeat: int = DEFAULT_REPEAT, config: Optional[dict] = None
+) -> List[Result]:
+    config = config if config is not None else load_mapping(Path("config"))
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = Path(tmpdir)
+        for size_name in sizes:
+            for name in names:
+                func, items = BENCHMARKS[name](SIZES[size_name], workdir, config)
+                func()  # warm-up: XSLT compilation, imports, file cache
+                samples = _time(func, repeat)
+                result = Result(name, size_name, items, repeat, min(samples), statistics.median(samples))
+                print(f"{result.key:40s} best {result.best_s * 1000:10.2f} ms  "
+                      f"median {result.median_s * 1000:10.2f} ms", flush=True)
+                results.append(result)
+    return results
+
+
+def results_document(results: List[Result]) -> Dict:
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {result.key: result.as_dict() for result in results},
+    }
+
+
+def compare_results(current: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """Return one row per benchmark present in both documents.
+
+    Medians are compared: the best of a few runs is itself an outlier.
+    ``regression`` is set when the median grew by more than *threshold* (a
+    fraction of the baseline) and by more than :data:`NOISE_FLOOR_S`.
+    """
+
+    rows = []
+    base_results = baseline.get("results", {})
+    for key, entry in current.get("results", {}).items():
+        base = base_results.get(key)
+        if base is None:
+            continue
+        old, new = base["median_s"], entry["median_s"]
+        ratio = new / old if old else float("inf")
+        rows.append(
+            {
+                "key": key,
+                "baseline_s": old,
+                "current_s": new,
+                "ratio": ratio,
+                "regression": ratio > 1 + threshold and new - old > NOISE_FLOOR_S,
+            }
+        )
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="small,medium", help=f"Comma list of {', '.join(SIZES)}")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="Comma list of benchmarks")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", type=Path, default=Path("out/benchmarks.json"))
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--update-baseline", action="store_true", help="Write results to --baseline")
+    args = parser.parse_args(argv)
+
+    names = [name for name in args.only.split(",") if name]
+    sizes = [size for size in args.sizes.split(",") if size]
+    unknown = [name for name in names if name not in BENCHMARKS] + [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown benchmark or size: {', '.join(unknown)}")
+
+    logging.disable(logging.WARNING)
+    document = results_document(run_suite(names, sizes, repeat=args.repeat))
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+    print(f"wrote {args.output}")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+        print(f"updated baseline {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        return 0
+
+    rows = compare_results(document, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+    regressions = [row for row in rows if row["regression"]]
+    for row in rows:
+        marker = "REGRESSION" if row["regression"] else ""
+        print(f"{row['key']:40s} {row['baseline_s'] * 1000:10.2f} -> {row['current_s'] * 1000:10.2f} ms "
+              f"({row['ratio']:5.2f}x) {marker}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,15 +2,22 @@ from __future__ import annotations
 
 import argparse
 import csv
-import html
 import importlib.util
 import json
 import logging
 import sys
+import time
+from dataclasses import asdict
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Callable, Dict, Iterable, List, Optional, Set
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-from pipeline.validators.dtd_validator import validate_dtd
+# Keep module-level imports to the standard library: every subcommand imports
+# only the pipeline modules it needs, so --help and validate start quickly.
+if TYPE_CHECKING:  # pragma: no cover
+    from pipeline.batch import CostEstimate
+    from pipeline.instrumentation import StageRecorder
+    from pipeline.profiling import StageProfiler
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
 logger = logging.getLogger(__name__)
@@ -19,24 +26,23 @@ logger = logging.getLogger(__name__)
 _DEPENDENCY_HINTS = {
     "lxml": "Install the lxml wheels via `pip install -r tools/requirements.txt`.",
     "pdfminer": "Install pdfminer.six via `pip install -r tools/requirements.txt`.",
+    "jinja2": "Install Jinja2 via `pip install -r tools/requirements.txt`; it renders the QA reports.",
 }
 
-def _module_available(module: str) -> bool:
-    """Return True if *module* can be imported without executing it."""
-
-    if importlib.util.find_spec(module):
-        return True
-    if "." in module:
-        root = module.split(".")[0]
-        if importlib.util.find_spec(root):
-            return True
-    return False
 
+@lru_cache(maxsize=None)
 def _module_available(module: str) -> bool:
-    """Return True if *module* can be imported without executing it."""
+    """Return True if *module* can be imported without executing it.
+
+    Results are cached; a batch checks the same modules for every job.
+    """
 
-    if importlib.util.find_spec(module):
-        return True
+    try:
+        if importlib.util.find_spec(module):
+            return True
+    except ModuleNotFoundError:
+        # find_spec imports the parent package of a dotted name first.
+        return False
     if "." in module:
         root = module.split(".")[0]
         if importlib.util.find_spec(root):
@@ -76,103 +82,29 @@ def _ensure_report_dir(path: Path) -> Path:
 
 
 def _write_reports(metrics: Dict, source: str, report_dir: Path) -> None:
-    report_dir = _ensure_report_dir(report_dir)
-    stem = Path(source).stem
-    csv_path = report_dir / f"{stem}_qa.csv"
-    html_path = report_dir / f"{stem}_qa.html"
-
-    with csv_path.open("w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(
-            [
-                "file",
-                "page",
-                "chars_in",
-                "chars_out",
-                "words_in",
-                "words_out",
-                "checksum_in",
-                "checksum_out",
-                "flags",
-                "has_ocr",
-                "status",
-            ]
-        )
-        for page in metrics.get("pages", []):
-            flags = page.get("flags", [])
-            discrepancy = bool(flags)
-            writer.writerow(
-                [
-                    source,
-                    page["page"],
-                    page["chars_in"],
-                    page["chars_out"],
-                    page["words_in"],
-                    page["words_out"],
-                    page["checksum_in"],
-                    page["checksum_out"],
-                    ";".join(flags),
-                    "yes" if page.get("has_ocr") else "no",
-                    "discrepancy" if discrepancy else "ok",
-                ]
-            )
+    from pipeline.qa_report import write_reports
 
-    rows = []
-    for page in metrics.get("pages", []):
-        flags = page.get("flags", [])
-        discrepancy = bool(flags)
-        row_class = " class=\"has-discrepancy\"" if discrepancy else ""
-        rows.append(
-            f"            <tr{row_class}>\n"
-            f"                <td>{html.escape(str(page['page']))}</td>\n"
-            f"                <td>{html.escape(str(page['chars_in']))}</td>\n"
-            f"                <td>{html.escape(str(page['chars_out']))}</td>\n"
-            f"                <td>{html.escape(str(page['words_in']))}</td>\n"
-            f"                <td>{html.escape(str(page['words_out']))}</td>\n"
-            f"                <td>{html.escape(str(page['checksum_in']))}</td>\n"
-            f"                <td>{html.escape(str(page['checksum_out']))}</td>\n"
-            f"                <td>{html.escape(';'.join(flags))}</td>\n"
-            f"                <td>{'yes' if page.get('has_ocr') else 'no'}</td>\n"
-            "            </tr>"
-        )
+    write_reports(metrics.get("pages", []), source, report_dir, stages=metrics.get("stages", []))
 
-    report_html = (
-        "<!DOCTYPE html>\n"
-        "<html lang=\"en\">\n"
-        "  <head>\n"
-        "    <meta charset=\"utf-8\">\n"
-        f"    <title>{html.escape(source)} QA Report</title>\n"
-        "    <style>table {border-collapse: collapse;} th, td {border: 1px solid #999; padding: 0.3em; text-align: left;} th {background: #eee;} .has-discrepancy {background: #fde8e8;}</style>\n"
-        "  </head>\n"
-        "  <body>\n"
-        f"    <h1>QA Report for {html.escape(source)}</h1>\n"
-        "    <table>\n"
-        "      <thead>\n"
-        "        <tr>\n"
-        "          <th>Page</th>\n"
-        "          <th>Chars In</th>\n"
-        "          <th>Chars Out</th>\n"
-        "          <th>Words In</th>\n"
-        "          <th>Words Out</th>\n"
-        "          <th>Checksum In</th>\n"
-        "          <th>Checksum Out</th>\n"
-        "          <th>Flags</th>\n"
-        "          <th>Has OCR</th>\n"
-        "        </tr>\n"
-        "      </thead>\n"
-        "      <tbody>\n"
-        + ("\n".join(rows) if rows else "        <tr><td colspan=\"9\">No pages processed</td></tr>")
-        + "\n      </tbody>\n"
-        "    </table>\n"
-        "  </body>\n"
-        "</html>\n"
-    )
-    html_path.write_text(report_html, encoding="utf-8")
 
-def _build_parser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(description="RIT DocBook converter CLI")
-    parser.add_argument("--config-dir", default=Path("config"), type=_directory)
-    parser.add_argument("--report-dir", default=Path("out/reports"), type=_directory)
+_PROFILE_HELP = "Profile each stage and write .pstats and .folded files next to the QA reports"
+
+
+def _stage_recorder(source: str, profiler: Optional["StageProfiler"]) -> Optional["StageRecorder"]:
+    if profiler is None:
+        return None
+    from pipeline.instrumentation import StageRecorder
+
+    return StageRecorder(source, profiler=profiler)
+
+
+def _make_profiler(args: argparse.Namespace) -> Optional["StageProfiler"]:
+    if not getattr(args, "profile", False):
+        return None
+    from pipeline.profiling import StageProfiler
+
+    return StageProfiler()
+
 
 def _existing_file(path_str: str) -> Path:
     path = Path(path_str)
@@ -192,6 +124,16 @@ def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="RIT DocBook converter CLI")
     parser.add_argument("--config-dir", default=Path("config"), type=_directory)
     parser.add_argument("--report-dir", default=Path("out/reports"), type=_directory)
+    parser.add_argument(
+        "--stage-log",
+        type=Path,
+        help="Append per-stage timings to this file as JSON lines",
+    )
+    parser.add_argument(
+        "--server",
+        type=Path,
+        help="Send pdf/epub/validate commands to the conversion service on this socket",
+    )
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
@@ -201,22 +143,52 @@ def _build_parser() -> argparse.ArgumentParser:
     pdf_parser.add_argument("--publisher", required=True)
     pdf_parser.add_argument("--ocr-on-image-only", action="store_true")
     pdf_parser.add_argument("--strict", action="store_true")
+    pdf_parser.add_argument("--profile", action="store_true", help=_PROFILE_HELP)
 
     epub_parser = subparsers.add_parser("epub", help="Convert an EPUB to DocBook XML")
     epub_parser.add_argument("--input", dest="input_path", required=True, type=_existing_file)
     epub_parser.add_argument("--out", dest="out_path", required=True)
     epub_parser.add_argument("--publisher", required=True)
     epub_parser.add_argument("--strict", action="store_true")
+    epub_parser.add_argument("--profile", action="store_true", help=_PROFILE_HELP)
 
     batch_parser = subparsers.add_parser("batch", help="Run batch conversions from a manifest")
     batch_parser.add_argument("--manifest", dest="manifest_path", required=True, type=_existing_file)
-    batch_parser.add_argument("--parallel", type=int, default=1)
+    batch_parser.add_argument(
+        "--parallel", type=int, default=1, help="Worker processes; jobs are dispatched longest first"
+    )
     batch_parser.add_argument("--strict", action="store_true")
+    batch_parser.add_argument("--profile", action="store_true", help=_PROFILE_HELP)
+    batch_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip jobs the journal records as done whose input, config and output are unchanged",
+    )
+    batch_parser.add_argument(
+        "--journal",
+        dest="journal_path",
+        type=Path,
+        default=None,
+        help="Job journal (default: <manifest>.journal.jsonl next to the manifest)",
+    )
+    batch_parser.add_argument(
+        "--retries", type=int, default=2, help="Retries for transient external tool failures"
+    )
+    batch_parser.add_argument(
+        "--retry-backoff", type=float, default=5.0, help="Seconds before the first retry; doubles each time"
+    )
 
     validate_parser = subparsers.add_parser("validate", help="Validate a DocBook XML file")
     validate_parser.add_argument("--input", dest="input_path", required=True, type=_existing_file)
     validate_parser.add_argument("--catalog", default="validation/catalog.xml")
 
+    serve_parser = subparsers.add_parser(
+        "serve", help="Run a persistent conversion service on a Unix socket"
+    )
+    serve_parser.add_argument(
+        "--socket", dest="socket_path", type=Path, default=Path("out/converter.sock")
+    )
+
     return parser
 
 
@@ -234,10 +206,11 @@ def _load_manifest(manifest_path: Path) -> List[Dict[str, str]]:
     return rows
 
 
-def _handle_pdf(args: argparse.Namespace, config_dir: Path, report_dir: Path) -> int:
-    _verify_runtime_dependencies({"lxml.etree", "pdfminer"})
+def _run_pdf(args: argparse.Namespace, config_dir: Path, report_dir: Path) -> Dict:
+    _verify_runtime_dependencies({"lxml.etree", "pdfminer", "jinja2"})
     from pipeline.pdf_pipeline import convert_pdf
 
+    profiler = _make_profiler(args)
     metrics = convert_pdf(
         str(args.input_path),
         args.out_path,
@@ -245,118 +218,493 @@ def _handle_pdf(args: argparse.Namespace, config_dir: Path, report_dir: Path) ->
         config_dir=str(config_dir),
         ocr_on_image_only=args.ocr_on_image_only,
         strict=args.strict,
+        recorder=_stage_recorder(str(args.input_path), profiler),
     )
     _write_reports(metrics, str(args.input_path), report_dir)
+    if profiler is not None:
+        profiler.write(_ensure_report_dir(report_dir), Path(args.input_path).stem)
+    return metrics
+
+
+def _pdf_exit_code(args: argparse.Namespace, metrics: Dict) -> int:
     if args.strict and metrics.get("mismatches"):
         logger.error("Extractor mismatches detected in strict mode: %s", metrics["mismatches"])
         return 1
-    print(metrics.get("output_path", args.out_path))
     return 0
 
 
-def _handle_epub(args: argparse.Namespace, config_dir: Path, report_dir: Path) -> int:
-    _verify_runtime_dependencies({"lxml.etree"})
+def _handle_pdf(args: argparse.Namespace, config_dir: Path, report_dir: Path) -> int:
+    metrics = _run_pdf(args, config_dir, report_dir)
+    exit_code = _pdf_exit_code(args, metrics)
+    if exit_code == 0:
+        print(metrics.get("output_path", args.out_path))
+    return exit_code
+
+
+def _run_epub(args: argparse.Namespace, config_dir: Path, report_dir: Path) -> Dict:
+    _verify_runtime_dependencies({"lxml.etree", "jinja2"})
     from pipeline.epub_pipeline import convert_epub
 
+    profiler = _make_profiler(args)
     metrics = convert_epub(
         str(args.input_path),
         args.out_path,
         args.publisher,
         config_dir=str(config_dir),
         strict=args.strict,
+        recorder=_stage_recorder(str(args.input_path), profiler),
     )
     _write_reports(metrics, str(args.input_path), report_dir)
+    if profiler is not None:
+        profiler.write(_ensure_report_dir(report_dir), Path(args.input_path).stem)
+    return metrics
+
+
+def _handle_epub(args: argparse.Namespace, config_dir: Path, report_dir: Path) -> int:
+    metrics = _run_epub(args, config_dir, report_dir)
     print(metrics.get("output_path", args.out_path))
     return 0
 
 
-def _handle_batch(args: argparse.Namespace, config_dir: Path) -> int:
-    if args.parallel > 1:
-        logger.warning("Parallel processing not implemented; running sequentially.")
+def _convert_batch_job(job: Dict, args: argparse.Namespace, config_dir: Path, profiler) -> Dict:
+    job_type = job.get("type")
+    if job_type == "pdf":
+        from pipeline.pdf_pipeline import convert_pdf
 
+        return convert_pdf(
+            job["input"],
+            job["out"],
+            job["publisher"],
+            config_dir=str(config_dir),
+            ocr_on_image_only=job.get("ocr_on_image_only", "false").lower() == "true",
+            strict=args.strict,
+            recorder=_stage_recorder(job["input"], profiler),
+        )
+    if job_type == "epub":
+        from pipeline.epub_pipeline import convert_epub
+
+        return convert_epub(
+            job["input"],
+            job["out"],
+            job["publisher"],
+            config_dir=str(config_dir),
+            strict=args.strict,
+            recorder=_stage_recorder(job["input"], profiler),
+        )
+    raise ValueError(f"Unknown job type: {job_type}")
+
+
+# Set in batch pool workers: each job puts its key here as it starts, so the
+# parent journals "started" when the job runs rather than when it is queued.
+_started_queue = None
+# Seconds between checks for started jobs while the pool is busy.
+_START_POLL_S = 0.2
+
+
+def _init_batch_worker(resources: Optional[Dict], started_queue) -> None:
+    from pipeline.governor import configure_governor
+
+    global _started_queue
+    # Workers draw external tool slots from the same cross-process pool.
+    configure_governor(resources)
+    _started_queue = started_queue
+
+
+def _run_batch_job(
+    job: Dict,
+    args: argparse.Namespace,
+    config_dir: Path,
+    report_dir: Path,
+    profiler: Optional["StageProfiler"] = None,
+) -> Dict:
+    """Convert one manifest job and write its QA reports.
+
+    Runs in the batch process or in a pool worker, so it returns plain data:
+    the job summary, output path and attempts, plus the worker's exported
+    profile when profiling without a shared *profiler*.
+    """
+
+    from pipeline.batch import job_key, retry_transient
+    from pipeline.qa_report import JobSummary
+
+    if _started_queue is not None:
+        _started_queue.put(job_key(job))
+    own_profiler = _make_profiler(args) if profiler is None else None
+    source = job.get("input", "")
+    start = time.perf_counter()
+    try:
+        metrics, attempts = retry_transient(
+            partial(_convert_batch_job, job, args, config_dir, profiler or own_profiler),
+            retries=args.retries,
+            backoff_s=args.retry_backoff,
+        )
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("Failed job %s", job)
+        outcome = {"summary": JobSummary.failed(source, str(job.get("type")), time.perf_counter() - start, exc)}
+    else:
+        wall_s = time.perf_counter() - start
+        _write_reports(metrics, source, report_dir)
+        outcome = {
+            "summary": JobSummary.from_metrics(source, str(job.get("type")), metrics, wall_s),
+            "output_path": metrics.get("output_path", job.get("out")),
+            "attempts": attempts,
+        }
+    if own_profiler is not None:
+        outcome["profile"] = own_profiler.export()
+    return outcome
+
+
+def _resource_settings(config_dir: Path, publisher: Optional[str] = None) -> Optional[Dict]:
+    """Return the ``resources`` config section with *publisher*'s overrides merged in."""
+
+    if not (config_dir / "mapping.default.json").exists():
+        return None
+    from pipeline.common import load_mapping
+
+    return load_mapping(config_dir, publisher).get("resources")
+
+
+# Commands that run conversions and so share tool slots with other processes.
+# validate runs a single xmllint under the built-in limits and skips reading
+# the resources config.
+_CONVERSION_COMMANDS = {"pdf", "epub", "batch", "serve"}
+
+
+def _configure_resources(args: argparse.Namespace, config_dir: Path) -> None:
+    from pipeline.governor import configure_governor
+
+    # The governor is process-wide: a single conversion uses its publisher's
+    # limits, while batch and serve, which mix publishers, use the defaults.
+    configure_governor(_resource_settings(config_dir, getattr(args, "publisher", None)))
+
+
+def _run_batch_pool(
+    args: argparse.Namespace,
+    config_dir: Path,
+    report_dir: Path,
+    pending: List[Tuple],
+    stamp_input: Callable[..., Optional[Dict]],
+    started: Callable[..., None],
+    finish: Callable[..., None],
+) -> None:
+    """Run *pending* jobs on ``args.parallel`` worker processes.
+
+    Jobs are queued in *pending* order.  "started" is journaled when a
+    worker picks a job up, and a job whose worker dies, or whose result
+    cannot be returned, is recorded as failed.
+    """
+
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    from pipeline.qa_report import JobSummary
+
+    started_queue = multiprocessing.SimpleQueue()
+    with ProcessPoolExecutor(
+        max_workers=args.parallel,
+        initializer=_init_batch_worker,
+        initargs=(_resource_settings(config_dir), started_queue),
+    ) as pool:
+        futures = {}
+        queued = {}
+        for job, key, fingerprint, estimate in pending:
+            stamp = stamp_input(job, key, fingerprint, estimate)
+            if stamp is not None:
+                # The pool hands out tasks in submission order.
+                future = pool.submit(_run_batch_job, job, args, config_dir, report_dir)
+                futures[future] = (job, key, fingerprint, estimate, stamp)
+                queued[key] = (fingerprint, estimate, stamp)
+        start_times = {}
+
+        def drain_started() -> None:
+            # A worker posts its key before it returns, so draining before
+            # handling results journals "started" ahead of "done".
+            while not started_queue.empty():
+                key = started_queue.get()
+                if key in queued:
+                    start_times[key] = time.perf_counter()
+                    started(key, *queued.pop(key))
+
+        running = set(futures)
+        while running:
+            done, running = wait(running, timeout=_START_POLL_S, return_when=FIRST_COMPLETED)
+            drain_started()
+            for future in done:
+                job, key, fingerprint, estimate, stamp = futures[future]
+                try:
+                    outcome = future.result()
+                except Exception as exc:  # noqa: BLE001 - e.g. BrokenProcessPool
+                    logger.error("Failed job %s: %s", job, exc)
+                    wall_s = time.perf_counter() - start_times.get(key, time.perf_counter())
+                    outcome = {"summary": JobSummary.failed(job.get("input", ""), str(job.get("type")), wall_s, exc)}
+                finish(key, fingerprint, estimate, stamp, outcome)
+
+
+def _handle_batch(args: argparse.Namespace, config_dir: Path, report_dir: Path) -> int:
     jobs = _load_manifest(args.manifest_path)
 
+    job_types = {job.get("type") for job in jobs}
     required_modules: Set[str] = set()
-    needs_pdf = False
-    needs_epub = False
-    for job in jobs:
-        job_type = job.get("type")
-        if job_type == "pdf":
-            required_modules.update({"lxml.etree", "pdfminer"})
-            needs_pdf = True
-        elif job_type == "epub":
-            required_modules.add("lxml.etree")
-            needs_epub = True
+    if "pdf" in job_types:
+        required_modules.update({"lxml.etree", "pdfminer", "jinja2"})
+    if "epub" in job_types:
+        required_modules.update({"lxml.etree", "jinja2"})
 
     if required_modules:
         _verify_runtime_dependencies(required_modules)
+    # Import the converters once here; forked pool workers inherit them.
+    if "pdf" in job_types:
+        from pipeline.pdf_pipeline import load_pdf_steps
+
+        load_pdf_steps()
+    if "epub" in job_types:
+        import pipeline.epub_pipeline  # noqa: F401
+
+    from pipeline.batch import (
+        BatchJournal,
+        CostModel,
+        config_fingerprint,
+        default_journal_path,
+        input_stamp,
+        job_key,
+    )
+    from pipeline.qa_report import BatchReport, JobSummary
 
-    pdf_converter: Optional[Callable[..., Dict]] = None
-    epub_converter: Optional[Callable[..., Dict]] = None
-    if needs_pdf:
-        from pipeline.pdf_pipeline import convert_pdf as _convert_pdf
+    default_resources = _resource_settings(config_dir)
+    for publisher in sorted({str(job["publisher"]) for job in jobs if job.get("publisher")}):
+        if _resource_settings(config_dir, publisher) != default_resources:
+            logger.warning("Publisher %s overrides resources; batch runs use the default limits", publisher)
 
-        pdf_converter = _convert_pdf
-    if needs_epub:
-        from pipeline.epub_pipeline import convert_epub as _convert_epub
+    batch_name = Path(args.manifest_path).stem
+    dashboard = BatchReport(report_dir, batch_name, total_jobs=len(jobs))
+    journal = BatchJournal(args.journal_path or default_journal_path(args.manifest_path))
+    journal.append("run", manifest=str(args.manifest_path), jobs=len(jobs), resume=args.resume)
+    model = CostModel.from_journal(journal.entries.values())
 
-        epub_converter = _convert_epub
+    pending = []
+    for job in jobs:
+        key = job_key(job)
+        fingerprint = config_fingerprint(config_dir, job, strict=args.strict)
+        if args.resume:
+            done = journal.completed(key, fingerprint=fingerprint, input_path=job.get("input", ""))
+            if done is not None:
+                logger.info("Skipping %s; unchanged since %s", job.get("input"), done["time"])
+                dashboard.add(JobSummary(**{**done["summary"], "status": "skipped"}))
+                continue
+        pending.append((job, key, fingerprint, model.estimate(job)))
+    if args.parallel > 1:
+        # Longest processing time first: the biggest books start while every
+        # worker is free instead of running alone at the end of the batch.
+        pending.sort(key=lambda item: item[3].seconds, reverse=True)
 
     success = True
-    for job in jobs:
-        job_type = job.get("type")
+
+    def stamp_input(job: Dict, key: str, fingerprint: str, estimate: "CostEstimate") -> Optional[Dict]:
         try:
-            if job_type == "pdf":
-                assert pdf_converter is not None
-                pdf_converter(
-                    job["input"],
-                    job["out"],
-                    job["publisher"],
-                    config_dir=str(config_dir),
-                    ocr_on_image_only=job.get("ocr_on_image_only", "false").lower() == "true",
-                    strict=args.strict,
-                )
-            elif job_type == "epub":
-                assert epub_converter is not None
-                epub_converter(
-                    job["input"],
-                    job["out"],
-                    job["publisher"],
-                    config_dir=str(config_dir),
-                    strict=args.strict,
-                )
-            else:
-                raise ValueError(f"Unknown job type: {job_type}")
-        except Exception:  # noqa: BLE001
-            logger.exception("Failed job %s", job)
+            return input_stamp(job.get("input", ""), journal.entries.get(key, {}).get("input"))
+        except OSError as exc:
+            logger.error("Failed job %s: %s", job, exc)
+            summary = JobSummary.failed(job.get("input", ""), str(job.get("type")), 0.0, exc)
+            finish(key, fingerprint, estimate, None, {"summary": summary})
+            return None
+
+    def started(key: str, fingerprint: str, estimate: "CostEstimate", stamp: Dict) -> None:
+        journal.append("started", job=key, input=stamp, config=fingerprint, estimate=estimate.as_dict())
+
+    def finish(key: str, fingerprint: str, estimate: "CostEstimate", stamp: Optional[Dict], outcome: Dict) -> None:
+        nonlocal success
+        summary = outcome["summary"]
+        summary.estimate_s = estimate.seconds
+        if summary.status == "failed":
             success = False
+            journal.append("failed", job=key, error=summary.error)
+        else:
+            journal.append(
+                "done",
+                job=key,
+                input=stamp,
+                config=fingerprint,
+                output_path=outcome["output_path"],
+                attempts=outcome["attempts"],
+                estimate=estimate.as_dict(),
+                summary=asdict(summary),
+            )
+        if profiler is not None and "profile" in outcome:
+            profiler.merge(outcome["profile"])
+        dashboard.add(summary)
+
+    profiler = _make_profiler(args)
+    try:
+        if args.parallel > 1:
+            _run_batch_pool(args, config_dir, report_dir, pending, stamp_input, started, finish)
+        else:
+            # Jobs run in this process, so a single profiler aggregates all of them.
+            for job, key, fingerprint, estimate in pending:
+                stamp = stamp_input(job, key, fingerprint, estimate)
+                if stamp is not None:
+                    started(key, fingerprint, estimate, stamp)
+                    outcome = _run_batch_job(job, args, config_dir, report_dir, profiler)
+                    finish(key, fingerprint, estimate, stamp, outcome)
+    finally:
+        journal.close()
+        dashboard.finish()
+
+    totals = dashboard.totals()
+    logger.info(
+        "Batch finished: %s jobs, %s failed; cost estimates off by %.0f%% on average",
+        totals["jobs"],
+        totals["failed"],
+        totals["estimate_error"] * 100,
+    )
+    if profiler is not None:
+        profiler.write(_ensure_report_dir(report_dir), batch_name)
     return 0 if success else 1
 
 
-def _handle_validate(args: argparse.Namespace, config_dir: Path) -> int:
+def _run_validate(args: argparse.Namespace, config_dir: Path) -> None:
+    from pipeline.validators.dtd_validator import validate_dtd
+
     default_mapping = json.loads((config_dir / "mapping.default.json").read_text(encoding="utf-8"))
     dtd_path = default_mapping.get("docbook", {}).get(
         "dtd_system", "RITTDOCdtd/v1.1/RittDocBook.dtd"
     )
     validate_dtd(str(args.input_path), dtd_path, args.catalog)
+
+
+def _handle_validate(args: argparse.Namespace, config_dir: Path) -> int:
+    _run_validate(args, config_dir)
     print("valid")
     return 0
 
 
+def _service_job(request: Dict, *, config_dir: Path, report_dir: Path) -> Dict:
+    """Run one client request inside the conversion service."""
+
+    command = request.get("command")
+    args = argparse.Namespace(
+        command=command,
+        input_path=Path(request["input"]),
+        out_path=request.get("out"),
+        publisher=request.get("publisher"),
+        strict=bool(request.get("strict")),
+        ocr_on_image_only=bool(request.get("ocr_on_image_only")),
+        profile=bool(request.get("profile")),
+        catalog=request.get("catalog", "validation/catalog.xml"),
+    )
+    if not args.input_path.is_file():
+        raise FileNotFoundError(args.input_path)
+    config_dir = Path(request.get("config_dir", config_dir))
+    report_dir = Path(request.get("report_dir", report_dir))
+
+    if command == "pdf":
+        metrics = _run_pdf(args, config_dir, report_dir)
+        exit_code = _pdf_exit_code(args, metrics)
+    elif command == "epub":
+        metrics = _run_epub(args, config_dir, report_dir)
+        exit_code = 0
+    elif command == "validate":
+        _run_validate(args, config_dir)
+        return {"exit_code": 0}
+    else:
+        raise ValueError(f"Unknown command: {command}")
+    return {"exit_code": exit_code, "output_path": metrics.get("output_path"), "metrics": metrics}
+
+
+def _service_request(args: argparse.Namespace, config_dir: Path, report_dir: Path) -> Dict:
+    # The service has its own working directory, so send absolute paths.
+    request: Dict = {
+        "command": args.command,
+        "input": str(Path(args.input_path).resolve()),
+        "config_dir": str(config_dir.resolve()),
+        "report_dir": str(report_dir.resolve()),
+    }
+    if args.command in {"pdf", "epub"}:
+        request.update(
+            out=str(Path(args.out_path).resolve()),
+            publisher=args.publisher,
+            strict=args.strict,
+            profile=args.profile,
+        )
+    if args.command == "pdf":
+        request["ocr_on_image_only"] = args.ocr_on_image_only
+    if args.command == "validate":
+        catalog = Path(args.catalog)
+        # Relative catalogs that do not exist here are resolved against the
+        # project root by the validator, as in local mode.
+        request["catalog"] = str(catalog.resolve()) if catalog.exists() else args.catalog
+    return request
+
+
+def _submit_to_service(args: argparse.Namespace, config_dir: Path, report_dir: Path) -> int:
+    from pipeline.service import ServiceError, submit
+
+    try:
+        response = submit(args.server, _service_request(args, config_dir, report_dir))
+    except ServiceError as exc:
+        logger.error("Conversion service error: %s", exc)
+        return 1
+    except OSError as exc:
+        logger.error("Cannot reach conversion service at %s: %s", args.server, exc)
+        return 1
+    exit_code = int(response.get("exit_code", 1))
+    if exit_code == 0:
+        print(response.get("output_path") or "valid")
+    return exit_code
+
+
+def _handle_serve(args: argparse.Namespace, config_dir: Path, report_dir: Path) -> int:
+    _verify_runtime_dependencies({"lxml.etree", "jinja2"})
+    from pipeline.service import ConversionServer, warm_up
+
+    timings = warm_up(config_dir)
+    logger.info(
+        "Service warm-up done: %s",
+        ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items()),
+    )
+    server = ConversionServer(
+        args.socket_path, partial(_service_job, config_dir=config_dir, report_dir=report_dir)
+    )
+    logger.info("Conversion service listening on %s", args.socket_path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def _attach_stage_log(path: Path) -> None:
+    from pipeline.instrumentation import stage_logger
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    stage_logger.addHandler(handler)
+
+
 def main(argv: Optional[List[str]] = None) -> int:
     parser = _build_parser()
     args = parser.parse_args(argv)
     config_dir = args.config_dir
     report_dir = args.report_dir
+    if args.stage_log:
+        _attach_stage_log(args.stage_log)
 
+    if args.server and args.command in {"pdf", "epub", "validate"}:
+        return _submit_to_service(args, config_dir, report_dir)
+    if args.command in _CONVERSION_COMMANDS:
+        _configure_resources(args, config_dir)
     if args.command == "pdf":
         return _handle_pdf(args, config_dir, report_dir)
     if args.command == "epub":
         return _handle_epub(args, config_dir, report_dir)
     if args.command == "batch":
-        return _handle_batch(args, config_dir)
+        return _handle_batch(args, config_dir, report_dir)
     if args.command == "validate":
         return _handle_validate(args, config_dir)
+    if args.command == "serve":
+        return _handle_serve(args, config_dir, report_dir)
     parser.error("Unknown command")
     return 2
 
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple, TypeVar, Union
+
+from .common import ToolError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+JOURNAL_VERSION = 1
+# Part of every config fingerprint; bump it when the hashing changes so that
+# jobs journaled under the old scheme re-run on --resume on purpose.
+# 2: the resources section is no longer hashed.
+FINGERPRINT_VERSION = 2
+_HASH_CHUNK = 1024 * 1024
+
+
+def default_journal_path(manifest_path: Union[str, Path]) -> Path:
+    manifest_path = Path(manifest_path)
+    return manifest_path.with_name(f"{manifest_path.stem}.journal.jsonl")
+
+
+def job_key(job: Dict) -> str:
+    """Identify a manifest job across runs by what it reads and writes."""
+
+    return f"{job.get('type')}:{job.get('input')}->{job.get('out')}"
+
+
+def config_fingerprint(config_dir: Union[str, Path], job: Dict, *, strict: bool = False) -> str:
+    """Hash everything besides the input file that shapes a job's output.
+
+    Covers the default mapping (apart from its ``resources`` limits), the
+    job's publisher overrides and the job options, so editing a publisher
+    config re-runs only that publisher's books on ``--resume``.
+    """
+
+    config_dir = Path(config_dir)
+    digest = hashlib.sha256(f"fingerprint-v{FINGERPRINT_VERSION}\n".encode("utf-8"))
+    for path in (config_dir / "mapping.default.json", config_dir / "publishers" / f"{job.get('publisher')}.json"):
+        digest.update(path.name.encode("utf-8"))
+        if not path.exists():
+            digest.update(b"-")
+            continue
+        mapping = json.loads(path.read_text(encoding="utf-8"))
+        # Resource limits change how fast a job runs, not what it produces.
+        mapping.pop("resources", None)
+        digest.update(json.dumps(mapping, sort_keys=True).encode("utf-8"))
+    options = {
+        "type": job.get("type"),
+        "publisher": job.get("publisher"),
+        "out": job.get("out"),
+        "ocr_on_image_only": str(job.get("ocr_on_image_only", "false")).lower(),
+        "strict": strict,
+    }
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def input_stamp(path: Union[str, Path], previous: Optional[Dict] = None) -> Dict:
+    """Return size, mtime and SHA-256 of *path*.
+
+    The hash from *previous* is reused when size and mtime are unchanged, so
+    resuming a large batch does not re-read every finished input.
+    """
+
+    stat = os.stat(path)
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+        return dict(previous)
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+
+class BatchJournal:
+    """Append-only JSON-lines record of batch job states.
+
+    Each line is one event (``run``, ``started``, ``done`` or ``failed``) and
+    is flushed and fsynced before the call returns, so a batch killed at any
+    point leaves a journal describing every job that finished.  The latest
+    event per job key wins when the journal is read back.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.entries: Dict[str, Dict] = {}
+        if self.path.exists():
+            self._load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = self.path.open("a", encoding="utf-8")
+
+    def _load(self) -> None:
+        with self.path.open("r", encoding="utf-8") as fh:
+            for number, line in enumerate(fh, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A crash mid-write can leave a truncated last line.
+                    logger.warning("Ignoring malformed journal line %s in %s", number, self.path)
+                    continue
+                if "job" in entry:
+                    self.entries[entry["job"]] = entry
+
+    def append(self, event: str, **fields) -> Dict:
+        entry = {
+            "version": JOURNAL_VERSION,
+            "event": event,
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **fields,
+        }
+        self._fh.write(json.dumps(entry, default=str) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        if "job" in entry:
+            self.entries[entry["job"]] = entry
+        return entry
+
+    def completed(self, key: str, *, fingerprint: str, input_path: Union[str, Path]) -> Optional[Dict]:
+        """Return the ``done`` entry for *key* if it can be reused as is.
+
+        That requires the same config fingerprint, an unchanged input and an
+        output file that still exists.
+        """
+
+        entry = self.entries.get(key)
+        if not entry or entry["event"] != "done" or entry.get("config") != fingerprint:
+            return None
+        if not Path(entry.get("output_path", "")).is_file():
+            return None
+        try:
+            stamp = input_stamp(input_path, entry.get("input"))
+        except OSError:
+            return None
+        if stamp["sha256"] != entry.get("input", {}).get("sha256"):
+            return None
+        return entry
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self) -> "BatchJournal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def retry_transient(
+    func: Callable[[], T],
+    *,
+    retries: int,
+    backoff_s: float,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Tuple[T, int]:
+    """Call *func*, retrying transient :class:`ToolError` failures.
+
+    Waits ``backoff_s * 2 ** n`` seconds before retry ``n + 1`` and gives up
+    after *retries* retries.  Returns the result and the number of attempts.
+    """
+
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return func(), attempt
+        except ToolError as exc:
+            if not exc.transient or attempt > retries:
+                raise
+            delay = backoff_s * 2 ** (attempt - 1)
+            logger.warning("Transient tool failure (%s); retrying in %.1f s", exc, delay)
+            sleep(delay)
+
+
+# Seconds per cost unit (a PDF page or an EPUB spine document) before any
+# history is available.  Only the ratio between job types matters for the
+# dispatch order; the journal replaces both after the first run.
+DEFAULT_RATES = {"pdf": 0.5, "epub": 0.4}
+# Bytes per cost unit, used when the page count or spine cannot be read.
+BYTES_PER_UNIT = {"pdf": 100_000, "epub": 50_000}
+
+
+@dataclass
+class CostEstimate:
+    units: float
+    basis: str
+    seconds: float
+
+    def as_dict(self) -> Dict:
+        return {"units": self.units, "basis": self.basis, "seconds": round(self.seconds, 3)}
+
+
+def pdf_page_count(path: Union[str, Path]) -> Optional[int]:
+    """Read the page count from the document catalog without parsing pages."""
+
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    with open(path, "rb") as fh:
+        document = PDFDocument(PDFParser(fh))
+        count = resolve1(resolve1(document.catalog.get("Pages")).get("Count"))
+    return int(count) if isinstance(count, int) else None
+
+
+def epub_spine_length(path: Union[str, Path]) -> Optional[int]:
+    from .epub_archive import EpubArchive
+    from .epub_pipeline import _parse_opf, _read_container
+
+    with EpubArchive(path) as archive:
+        return len(_parse_opf(archive, _read_container(archive))["spine"])
+
+
+_UNIT_READERS: Dict[str, Tuple[str, Callable[[Union[str, Path]], Optional[int]]]] = {
+    "pdf": ("pages", pdf_page_count),
+    "epub": ("spine", epub_spine_length),
+}
+
+
+def job_units(job: Dict) -> Tuple[float, str]:
+    """Return the cost units of *job* and what they were derived from."""
+
+    job_type = job.get("type")
+    path = job.get("input", "")
+    reader = _UNIT_READERS.get(job_type)
+    if reader is not None:
+        basis, read = reader
+        try:
+            units = read(path)
+        except Exception as exc:  # noqa: BLE001 - any unreadable input falls back to its size
+            logger.debug("Cannot read %s of %s: %s", basis, path, exc)
+            units = None
+        if units:
+            return float(units), basis
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 1.0, "default"
+    return max(size / BYTES_PER_UNIT.get(job_type, 100_000), 1.0), "size"
+
+
+class CostModel:
+    """Estimate job durations from input size and earlier runs.
+
+    Rates (seconds per unit, per job type) are fitted from the ``done``
+    records of a :class:`BatchJournal`.  A job the journal has already timed
+    on an input of the same size and mtime is estimated at that time.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, history: Optional[Dict[str, Dict]] = None) -> None:
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        self.history = history or {}
+
+    @classmethod
+    def from_journal(cls, entries: Iterable[Dict]) -> "CostModel":
+        seconds: Dict[str, float] = {}
+        units: Dict[str, float] = {}
+        history = {}
+        for entry in entries:
+            if entry.get("event") != "done" or "estimate" not in entry or "summary" not in entry:
+                continue
+            job_type = entry["summary"]["job_type"]
+            seconds[job_type] = seconds.get(job_type, 0.0) + entry["summary"]["wall_s"]
+            units[job_type] = units.get(job_type, 0.0) + entry["estimate"]["units"]
+            history[entry["job"]] = entry
+        rates = {job_type: seconds[job_type] / units[job_type] for job_type in seconds if units[job_type] > 0}
+        return cls(rates, history)
+
+    def estimate(self, job: Dict) -> CostEstimate:
+        units, basis = job_units(job)
+        previous = self.history.get(job_key(job))
+        if previous is not None:
+            try:
+                stat = os.stat(job.get("input", ""))
+            except OSError:
+                stat = None
+            stamp = previous.get("input", {})
+            if stat and stamp.get("size") == stat.st_size and stamp.get("mtime_ns") == stat.st_mtime_ns:
+                return CostEstimate(units, "history", previous["summary"]["wall_s"])
+        rate = self.rates.get(job.get("type"), max(self.rates.values()))
+        return CostEstimate(units, basis, units * rate)
+
+
+__all__ = [
+    "BatchJournal",
+    "CostEstimate",
+    "CostModel",
+    "config_fingerprint",
+    "default_journal_path",
+    "input_stamp",
+    "job_key",
+    "job_units",
+    "retry_transient",
+]
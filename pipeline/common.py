@@ -1,13 +1,28 @@
 from __future__ import annotations
 
+import codecs
+import errno
 import hashlib
+import io
 import logging
 import os
 import re
+import signal
 import subprocess
+import threading
+import time
+from contextlib import nullcontext
+from copy import deepcopy
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import IO, TYPE_CHECKING, AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+
+from .governor import get_governor
+from .instrumentation import record_cpu_time, record_queue_wait
+
+if TYPE_CHECKING:  # pragma: no cover
+    import asyncio
 
 logger = logging.getLogger(__name__)
 
@@ -63,18 +78,41 @@ def merge_dicts(base: dict, override: dict) -> dict:
     return result
 
 
-def load_mapping(config_dir: Path, publisher: str | None = None) -> dict:
+@lru_cache(maxsize=64)
+def _load_mapping_cached(
+    default_path: Path, publisher_path: Optional[Path], stamps: Tuple[Tuple[int, int], ...]
+) -> dict:
     import json
 
-    default_path = config_dir / "mapping.default.json"
     with default_path.open("r", encoding="utf-8") as fh:
         config = json.load(fh)
+    if publisher_path is not None:
+        with publisher_path.open("r", encoding="utf-8") as fh:
+            config = merge_dicts(config, json.load(fh))
+    return config
+
+
+def _file_stamp(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_mapping(config_dir: Path, publisher: str | None = None) -> dict:
+    """Return the default mapping merged with *publisher*'s overrides.
+
+    Merged mappings are cached per file modification time, so long-running
+    processes pick up edited configs.  Each call returns a private copy.
+    """
+
+    default_path = config_dir / "mapping.default.json"
+    publisher_path: Optional[Path] = None
+    stamps = [_file_stamp(default_path)]
     if publisher:
         publisher_path_json = config_dir / "publishers" / f"{publisher}.json"
         if publisher_path_json.exists():
-            with publisher_path_json.open("r", encoding="utf-8") as fh:
-                config = merge_dicts(config, json.load(fh))
-    return config
+            publisher_path = publisher_path_json
+            stamps.append(_file_stamp(publisher_path))
+    return deepcopy(_load_mapping_cached(default_path, publisher_path, tuple(stamps)))
 
 
 def normalize_text(text: str, config: dict, events: Optional[List[NormalizationEvent]] = None) -> str:
@@ -112,23 +150,306 @@ def checksum(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
-def run_cmd(args: Iterable[str], cwd: Optional[Path] = None, env: Optional[dict] = None) -> str:
+class ToolError(RuntimeError):
+    """An external command failed.
+
+    ``transient`` marks failures worth retrying: the tool could not be
+    started for lack of processes, memory or file descriptors, or it was
+    killed by a signal (typically the OOM killer) rather than exiting with an
+    error of its own.
+    """
+
+    def __init__(self, message: str, *, returncode: Optional[int] = None, transient: bool = False) -> None:
+        super().__init__(message)
+        self.returncode = returncode
+        self.transient = transient
+
+
+class ToolInterrupted(ToolError):
+    """A command was killed because it hit its timeout or was cancelled."""
+
+
+_TRANSIENT_LAUNCH_ERRNOS = {errno.EAGAIN, errno.ENOMEM, errno.EMFILE, errno.ENFILE}
+_STREAM_CHUNK = 64 * 1024
+# Only the end of stderr is kept for error messages; the rest is discarded.
+_STDERR_TAIL = 64 * 1024
+_CANCEL_POLL_S = 0.05
+
+
+def _command_env(env: Optional[dict]) -> Optional[dict]:
+    # None lets the child inherit os.environ without copying it.
+    return {**os.environ, **env} if env else None
+
+
+def _kill_group(pid: int) -> None:
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _reap(proc: subprocess.Popen, lock: Optional[threading.Lock] = None) -> int:
+    """Wait for *proc* and charge its CPU time to the running stage.
+
+    *proc* is reaped, and its ``returncode`` set, while holding *lock*, so a
+    watcher that checks ``returncode`` under the same lock never signals a
+    process group whose id has been reused.
+    """
+
+    if not hasattr(os, "wait4"):
+        proc.wait()
+        return proc.returncode
+    if hasattr(os, "waitid"):
+        # Wait for the exit without reaping: until the zombie is collected
+        # below, its pid (and so its process group id) cannot be reused.
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+    with lock or nullcontext():
+        # Per-child usage, unlike RUSAGE_CHILDREN, is not shared with tools
+        # that other threads are running at the same time.
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    record_cpu_time(usage.ru_utime + usage.ru_stime)
+    return proc.returncode
+
+
+def _drain(stream: IO[bytes], tail: bytearray) -> None:
+    for block in iter(lambda: stream.read1(_STREAM_CHUNK), b""):
+        tail.extend(block)
+        del tail[:-_STDERR_TAIL]
+
+
+def _watch(
+    proc: subprocess.Popen,
+    done: threading.Event,
+    reap_lock: threading.Lock,
+    timeout: Optional[float],
+    cancel: Optional[threading.Event],
+    reason: List[str],
+) -> None:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while not done.is_set():
+        if cancel is not None and cancel.is_set():
+            why = "was cancelled"
+        elif deadline is not None and time.monotonic() >= deadline:
+            why = f"timed out after {timeout:g} s"
+        else:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            if cancel is not None:
+                remaining = _CANCEL_POLL_S if remaining is None else min(remaining, _CANCEL_POLL_S)
+            done.wait(remaining)
+            continue
+        with reap_lock:
+            # A command that has already exited and been reaped finished on
+            # its own; its pid may belong to another process by now.
+            if proc.returncode is None:
+                reason.append(why)
+                _kill_group(proc.pid)
+        return
+
+
+def _text_decoder(encoding: str) -> io.IncrementalNewlineDecoder:
+    # Universal newlines, as text-mode pipes give: "\r\n" and "\r" become "\n",
+    # also when a "\r\n" pair is split across reads.
+    return io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+
+
+def _check_result(
+    args: List[str], returncode: int, stderr_tail: bytearray, encoding: str, interrupted: List[str]
+) -> None:
+    stderr = stderr_tail.decode(encoding, errors="replace").strip()
+    command = " ".join(map(str, args))
+    if interrupted:
+        logger.error("Command %s: %s", interrupted[0], command)
+        raise ToolInterrupted(f"Command {command} {interrupted[0]}", returncode=returncode)
+    if returncode != 0:
+        logger.error("Command failed (%s): %s", returncode, stderr)
+        raise ToolError(f"Command {command} failed: {stderr}", returncode=returncode, transient=returncode < 0)
+    if stderr:
+        logger.debug("Command stderr: %s", stderr)
+
+
+def stream_cmd(
+    args: Iterable[str],
+    cwd: Optional[Path] = None,
+    env: Optional[dict] = None,
+    *,
+    timeout: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+    encoding: str = "utf-8",
+) -> Iterator[str]:
+    """Run a command and yield its stdout as decoded text chunks.
+
+    Output is decoded incrementally, so multi-byte characters split across
+    reads come out whole.  stderr is drained on a separate thread so a tool
+    writing a lot of diagnostics cannot block on a full pipe.  The command
+    runs in its own process group, which is killed when *timeout* seconds
+    pass, when *cancel* is set, or when the caller stops iterating early.
+
+    The command starts on the first ``next()``.  Raises :class:`ToolError`
+    when it exits non-zero and :class:`ToolInterrupted` when it was killed.
+    """
+
+    args = list(args)
+    logger.debug("Running command: %s", " ".join(map(str, args)))
+    with get_governor().acquire(Path(str(args[0])).name) as waited:
+        record_queue_wait(waited)
+        try:
+            proc = subprocess.Popen(
+                args,
+                cwd=cwd,
+                env=_command_env(env),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+            )
+        except OSError as exc:
+            if exc.errno not in _TRANSIENT_LAUNCH_ERRNOS:
+                raise
+            raise ToolError(f"Command {args[0]} could not be started: {exc}", transient=True) from exc
+
+        stderr_tail = bytearray()
+        done = threading.Event()
+        reap_lock = threading.Lock()
+        interrupted: List[str] = []
+        helpers = [threading.Thread(target=_drain, args=(proc.stderr, stderr_tail), daemon=True)]
+        if timeout is not None or cancel is not None:
+            watch_args = (proc, done, reap_lock, timeout, cancel, interrupted)
+            helpers.append(threading.Thread(target=_watch, args=watch_args, daemon=True))
+        for helper in helpers:
+            helper.start()
+        decoder = _text_decoder(encoding)
+        try:
+            for block in iter(lambda: proc.stdout.read1(_STREAM_CHUNK), b""):
+                text = decoder.decode(block)
+                if text:
+                    yield text
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+            returncode = _reap(proc, reap_lock)
+        except BaseException:
+            # Includes GeneratorExit when the caller abandons the stream.
+            # Only this thread reaps, so the child cannot be gone yet.
+            if proc.returncode is None:
+                _kill_group(proc.pid)
+                _reap(proc, reap_lock)
+            raise
+        finally:
+            done.set()
+            for helper in helpers:
+                helper.join()
+            proc.stdout.close()
+            proc.stderr.close()
+
+    _check_result(args, returncode, stderr_tail, encoding, interrupted)
+
+
+def run_cmd(
+    args: Iterable[str], cwd: Optional[Path] = None, env: Optional[dict] = None, *, timeout: Optional[float] = None
+) -> str:
+    """Run a command and return its whole stdout; see :func:`stream_cmd`."""
+
+    return "".join(stream_cmd(args, cwd, env, timeout=timeout))
+
+
+def _kill_asyncio_child(proc) -> None:
+    # asyncio reaps the child on the loop thread, which is running this, and
+    # sets returncode when it does; after that the pid may have been reused.
+    if proc.returncode is None:
+        _kill_group(proc.pid)
+
+
+async def _adrain(stream: asyncio.StreamReader, tail: bytearray) -> None:
+    while True:
+        block = await stream.read(_STREAM_CHUNK)
+        if not block:
+            return
+        tail.extend(block)
+        del tail[:-_STDERR_TAIL]
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+
+async def astream_cmd(
+    args: Iterable[str],
+    cwd: Optional[Path] = None,
+    env: Optional[dict] = None,
+    *,
+    timeout: Optional[float] = None,
+    encoding: str = "utf-8",
+) -> AsyncIterator[str]:
+    """Asynchronous :func:`stream_cmd` for use on an event loop.
+
+    Waits for a governor slot without blocking the loop.  Cancelling the
+    awaiting task, or closing the iterator early, kills the command's
+    process group; the cancellation itself propagates as
+    :class:`asyncio.CancelledError`.  asyncio reaps the process itself and
+    does not expose its resource usage, so its CPU time is not charged to
+    the running stage.
+    """
+
+    # asyncio is imported here rather than at module level: it is only
+    # needed on the event loop, and it would add to every CLI start-up.
+    import asyncio
+
+    args = list(args)
     logger.debug("Running command: %s", " ".join(map(str, args)))
-    proc_env = os.environ.copy()
-    if env:
-        proc_env.update(env)
-    proc = subprocess.run(
-        list(args),
-        cwd=cwd,
-        check=False,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        env=proc_env,
-    )
-    if proc.returncode != 0:
-        logger.error("Command failed (%s): %s", proc.returncode, proc.stderr.strip())
-        raise RuntimeError(f"Command {' '.join(args)} failed: {proc.stderr.strip()}")
-    if proc.stderr:
-        logger.debug("Command stderr: %s", proc.stderr.strip())
-    return proc.stdout
+    async with get_governor().acquire_async(Path(str(args[0])).name) as waited:
+        record_queue_wait(waited)
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *args,
+                cwd=cwd,
+                env=_command_env(env),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+            )
+        except OSError as exc:
+            if exc.errno not in _TRANSIENT_LAUNCH_ERRNOS:
+                raise
+            raise ToolError(f"Command {args[0]} could not be started: {exc}", transient=True) from exc
+
+        stderr_tail = bytearray()
+        drain = asyncio.ensure_future(_adrain(proc.stderr, stderr_tail))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interrupted: List[str] = []
+        decoder = _text_decoder(encoding)
+        try:
+            try:
+                while True:
+                    block = await asyncio.wait_for(proc.stdout.read(_STREAM_CHUNK), _remaining(deadline))
+                    if not block:
+                        break
+                    text = decoder.decode(block)
+                    if text:
+                        yield text
+                text = decoder.decode(b"", final=True)
+                if text:
+                    yield text
+                returncode = await asyncio.wait_for(proc.wait(), _remaining(deadline))
+            except asyncio.TimeoutError:
+                interrupted.append(f"timed out after {timeout:g} s")
+                _kill_asyncio_child(proc)
+                returncode = await proc.wait()
+        except BaseException:
+            # Includes CancelledError and GeneratorExit from an early close.
+            _kill_asyncio_child(proc)
+            await proc.wait()
+            raise
+        finally:
+            await drain
+
+    _check_result(args, returncode, stderr_tail, encoding, interrupted)
+
+
+async def arun_cmd(
+    args: Iterable[str], cwd: Optional[Path] = None, env: Optional[dict] = None, *, timeout: Optional[float] = None
+) -> str:
+    """Asynchronous :func:`run_cmd`; see :func:`astream_cmd`."""
+
+    return "".join([chunk async for chunk in astream_cmd(args, cwd, env, timeout=timeout)])
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import logging
+import os
+import posixpath
+import shutil
+import struct
+import sys
+import threading
+import zipfile
+from collections import OrderedDict
+from functools import partial
+from pathlib import Path
+from typing import IO, Dict, Optional, Union
+from urllib.parse import unquote
+
+from .media_files import MediaPayload, MediaStream
+
+logger = logging.getLogger(__name__)
+
+
+_COPY_CHUNK_SIZE = 1024 * 1024
+_PASSTHROUGH_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif"}
+_ENCRYPTED_FLAG = 0x1
+_LOCAL_HEADER_MAGIC = b"PK\x03\x04"
+_LOCAL_HEADER_SIZE = 30
+
+# zipfile has no public API for adding an entry whose data is already
+# compressed.  _append_raw does for such an entry what ZipFile.mkdir() does
+# for a directory, through ZipFile internals that were checked on these
+# Python versions; elsewhere copy_to inflates the member and stores it.
+_RAW_COPY_PYTHONS = ((3, 10), (3, 13))
+_RAW_COPY_ATTRS = (
+    "fp", "start_dir", "filelist", "NameToInfo", "_lock", "_seekable", "_writing", "_writecheck", "_didModify"
+)
+
+
+def normalise_member_path(name: str) -> str:
+    """Return the canonical index key for an EPUB member or reference.
+
+    References inside XHTML are URL-encoded, may carry fragments and are often
+    written with a leading slash or ``./`` segments; ZIP member names are not.
+    Both sides are folded onto the same key so a single dictionary lookup
+    replaces the former "with and without leading slash" probing.
+    """
+
+    path = unquote(name.split("#", 1)[0]).replace("\\", "/")
+    path = posixpath.normpath(path.lstrip("/"))
+    return "" if path == "." else path
+
+
+class EpubArchive:
+    """Indexed, lazily inflating view over an EPUB container.
+
+    The ZIP central directory is indexed once on open.  Members are served as
+    streams via :meth:`open`, while :meth:`read` keeps the most recently used
+    small members in an LRU so that assets referenced from several chapters are
+    inflated only once.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        *,
+        cache_entries: int = 64,
+        cache_bytes: int = 8 * 1024 * 1024,
+        max_cached_member: int = 1024 * 1024,
+        stream_threshold: int = 4 * 1024 * 1024,
+    ) -> None:
+        self.path = Path(path)
+        self._zf = zipfile.ZipFile(self.path, "r")
+        self._index: Dict[str, zipfile.ZipInfo] = {}
+        for info in self._zf.infolist():
+            if info.is_dir():
+                continue
+            self._index.setdefault(normalise_member_path(info.filename), info)
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_size = 0
+        self._cache_entries = cache_entries
+        self._cache_bytes = cache_bytes
+        self._max_cached_member = max_cached_member
+        self._stream_threshold = stream_threshold
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self) -> "EpubArchive":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._cache_size = 0
+        self._zf.close()
+
+    def __contains__(self, name: str) -> bool:
+        return self.resolve(name) is not None
+
+    def resolve(self, name: str) -> Optional[zipfile.ZipInfo]:
+        """Return the indexed member for *name*, or ``None`` if absent."""
+
+        return self._index.get(normalise_member_path(name))
+
+    def open(self, name: str) -> IO[bytes]:
+        """Return a lazily inflated stream for *name*.
+
+        Raises :class:`KeyError` when the member does not exist.
+        """
+
+        info = self.resolve(name)
+        if info is None:
+            raise KeyError(name)
+        return self._zf.open(info, "r")
+
+    def read(self, name: str) -> bytes:
+        """Return the bytes of *name*, serving small members from the LRU.
+
+        Raises :class:`KeyError` when the member does not exist.
+        """
+
+        info = self.resolve(name)
+        if info is None:
+            raise KeyError(name)
+        key = info.filename
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        data = self._zf.read(info)
+        if len(data) <= self._max_cached_member:
+            self._remember(key, data)
+        return data
+
+    def fetch(self, ref: str) -> Optional[MediaPayload]:
+        """Media fetcher entry point; ``None`` if *ref* is missing.
+
+        Already-compressed images come back as a :class:`MediaStream` that
+        the packager copies raw via :meth:`copy_to`, so they never enter the
+        LRU.  Other members of at least *stream_threshold* bytes come back as
+        a stream that inflates on demand and is never held whole; smaller
+        ones as bytes via :meth:`read`, which caches them when they fit.
+        """
+
+        info = self.resolve(ref)
+        if info is None:
+            logger.warning("Missing media resource in EPUB: %s", ref)
+            return None
+        if self.is_passthrough(ref):
+            return MediaStream(partial(self.open, ref), info.file_size, copy_raw=partial(self.copy_to, ref))
+        if info.file_size >= self._stream_threshold:
+            return MediaStream(partial(self.open, ref), info.file_size)
+        return self.read(ref)
+
+    def is_passthrough(self, name: str) -> bool:
+        """Return True if *name* is an already-compressed image :meth:`copy_to` can copy raw."""
+
+        info = self.resolve(name)
+        if info is None or info.flag_bits & _ENCRYPTED_FLAG:
+            return False
+        if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            return False
+        return posixpath.splitext(normalise_member_path(name))[1].lower() in _PASSTHROUGH_SUFFIXES
+
+    def copy_to(self, name: str, target: zipfile.ZipFile, arcname: str) -> int:
+        """Copy member *name* into *target* as *arcname* without re-encoding it.
+
+        The compressed bytes are copied as they are, so the entry keeps the
+        EPUB's compression method and CRC and is neither inflated nor
+        deflated.  On Python versions where that is not supported the member
+        is inflated once and stored through ``ZipFile.open(..., "w")``.
+        *target* must be open for writing with no other entry being written.
+        Returns the number of bytes written for the entry's data.
+        """
+
+        info = self.resolve(name)
+        if info is None:
+            raise KeyError(name)
+        if not self.is_passthrough(name):
+            raise ValueError(f"Cannot copy {name} raw")
+        entry = zipfile.ZipInfo(arcname, date_time=info.date_time)
+        if not _can_append_raw(target):
+            entry.compress_type = zipfile.ZIP_STORED
+            with self._zf.open(info) as source, target.open(
+                entry, "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT
+            ) as sink:
+                shutil.copyfileobj(source, sink, _COPY_CHUNK_SIZE)
+            return info.file_size
+        entry.compress_type = info.compress_type
+        entry.CRC = info.CRC
+        entry.compress_size = info.compress_size
+        entry.file_size = info.file_size
+        with self.path.open("rb") as source:
+            source.seek(info.header_offset)
+            header = source.read(_LOCAL_HEADER_SIZE)
+            if len(header) != _LOCAL_HEADER_SIZE or header[:4] != _LOCAL_HEADER_MAGIC:
+                raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+            name_length, extra_length = struct.unpack("<HH", header[26:30])
+            source.seek(name_length + extra_length, os.SEEK_CUR)
+            _append_raw(target, entry, source)
+        return info.compress_size
+
+    def _remember(self, key: str, data: bytes) -> None:
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = data
+            self._cache_size += len(data)
+            while self._cache and (
+                len(self._cache) > self._cache_entries or self._cache_size > self._cache_bytes
+            ):
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted)
+
+
+def _can_append_raw(target: zipfile.ZipFile) -> bool:
+    low, high = _RAW_COPY_PYTHONS
+    return low <= sys.version_info[:2] <= high and all(hasattr(target, attr) for attr in _RAW_COPY_ATTRS)
+
+
+def _append_raw(target: zipfile.ZipFile, entry: zipfile.ZipInfo, source: IO[bytes]) -> None:
+    """Add *entry* to *target*, copying its ``compress_size`` data bytes from *source*."""
+
+    with target._lock:
+        if target._writing:
+            raise ValueError("Can't write to the ZIP file while there is another write handle open")
+        target._writecheck(entry)
+        if target._seekable:
+            target.fp.seek(target.start_dir)
+        entry.header_offset = target.fp.tell()
+        target._didModify = True
+        target.fp.write(entry.FileHeader())
+        remaining = entry.compress_size
+        while remaining:
+            chunk = source.read(min(remaining, _COPY_CHUNK_SIZE))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated member for {entry.filename}")
+            target.fp.write(chunk)
+            remaining -= len(chunk)
+        target.start_dir = target.fp.tell()
+        target.filelist.append(entry)
+        target.NameToInfo[entry.filename] = entry
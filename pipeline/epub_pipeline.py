@@ -2,14 +2,18 @@ from __future__ import annotations
 
 import logging
 import tempfile
-import zipfile
+from concurrent.futures import Executor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from lxml import etree
 
 from .common import PageText, checksum, load_mapping, normalize_text
-from .package import package_docbook
+from .epub_archive import EpubArchive
+from .instrumentation import ProgressCallback, StageRecorder
+from .package import DEFAULT_XML_COMPRESSLEVEL, count_images, package_docbook
+from .steps import Steps, arun_steps, cpu_step, run_steps
 from .transform import RittDocTransformResult, transform_docbook_to_rittdoc
 from .validators.counters import compute_metrics
 from .validators.dtd_validator import validate_dtd
@@ -24,29 +28,46 @@ EPUB_NS = {
     "html": "http://www.w3.org/1999/xhtml",
 }
 
+_ROOTFILE_XPATH = etree.XPath("//c:rootfile/@full-path", namespaces=EPUB_NS)
+_MANIFEST_ITEM_XPATH = etree.XPath("//opf:manifest/opf:item", namespaces=EPUB_NS)
+_SPINE_ITEMREF_XPATH = etree.XPath("//opf:spine/opf:itemref", namespaces=EPUB_NS)
+_IMG_XPATH = etree.XPath("//html:img", namespaces=EPUB_NS)
+_BODY_BLOCKS_XPATH = etree.XPath("//html:body/*", namespaces=EPUB_NS)
 
-def _read_container(zf: zipfile.ZipFile) -> str:
-    container_xml = etree.fromstring(zf.read("META-INF/container.xml"))
-    rootfile = container_xml.xpath("//c:rootfile/@full-path", namespaces=EPUB_NS)
+
+@lru_cache(maxsize=1)
+def _load_transform() -> etree.XSLT:
+    xslt_path = Path(__file__).parent / "transform" / "epub_to_docbook.xsl"
+    return etree.XSLT(etree.parse(str(xslt_path)))
+
+
+def _parse_member(archive: EpubArchive, name: str) -> etree._Element:
+    with archive.open(name) as fh:
+        return etree.parse(fh).getroot()
+
+
+def _read_container(archive: EpubArchive) -> str:
+    container_xml = _parse_member(archive, "META-INF/container.xml")
+    rootfile = _ROOTFILE_XPATH(container_xml)
     if not rootfile:
         raise ValueError("EPUB container missing rootfile")
     return rootfile[0]
 
 
-def _parse_opf(zf: zipfile.ZipFile, opf_path: str) -> Dict:
-    opf_doc = etree.fromstring(zf.read(opf_path))
+def _parse_opf(archive: EpubArchive, opf_path: str) -> Dict:
+    opf_doc = _parse_member(archive, opf_path)
     manifest = {
         item.get("id"): item.get("href")
-        for item in opf_doc.xpath("//opf:manifest/opf:item", namespaces=EPUB_NS)
+        for item in _MANIFEST_ITEM_XPATH(opf_doc)
     }
     spine = [
         item.get("idref")
-        for item in opf_doc.xpath("//opf:spine/opf:itemref", namespaces=EPUB_NS)
+        for item in _SPINE_ITEMREF_XPATH(opf_doc)
     ]
     return {"manifest": manifest, "spine": spine, "opf": opf_doc}
 
 
-def _aggregate_html(zf: zipfile.ZipFile, opf_path: str, manifest: Dict[str, str], spine: List[str]) -> etree._Element:
+def _aggregate_html(archive: EpubArchive, opf_path: str, manifest: Dict[str, str], spine: List[str]) -> etree._Element:
     base = Path(opf_path).parent
     html_root = etree.Element("{http://www.w3.org/1999/xhtml}html", nsmap={None: "http://www.w3.org/1999/xhtml"})
     body = etree.SubElement(html_root, "{http://www.w3.org/1999/xhtml}body")
@@ -56,114 +77,191 @@ def _aggregate_html(zf: zipfile.ZipFile, opf_path: str, manifest: Dict[str, str]
             logger.warning("Missing manifest item for spine id %s", item_id)
             continue
         item_path = str((base / href).as_posix())
-        doc = etree.fromstring(zf.read(item_path))
+        doc = _parse_member(archive, item_path)
         doc_dir = Path(item_path).parent
-        for img in doc.xpath("//html:img", namespaces=EPUB_NS):
+        for img in _IMG_XPATH(doc):
             src = img.get("src")
             if src:
                 resolved = (doc_dir / src).as_posix()
                 img.set("src", resolved)
-        for child in doc.xpath("//html:body/*", namespaces=EPUB_NS):
+        for child in _BODY_BLOCKS_XPATH(doc):
             body.append(child)
     return html_root
 
 
-def _collect_text_blocks(doc: etree._Element) -> List[str]:
-    return [
-        " ".join(child.xpath(".//text()"))
-        for child in doc.xpath("//html:body/*", namespaces=EPUB_NS)
+def _iter_text_blocks(doc: etree._Element, config: dict, *, strict: bool = False) -> Iterator[PageText]:
+    """Yield one normalised, checksummed :class:`PageText` per body block.
+
+    Text, normalisation and checksum are produced in the same walk over the
+    block so each block's text is gathered exactly once.
+    """
+
+    for idx, block in enumerate(_BODY_BLOCKS_XPATH(doc), start=1):
+        text = " ".join(block.itertext())
+        if strict and not text.strip():
+            raise ValueError('Empty content block detected in strict mode')
+        norm_text = normalize_text(text, config)
+        yield PageText(
+            page_num=idx,
+            raw_text=text,
+            norm_text=norm_text,
+            checksum=checksum(norm_text),
+        )
+
+
+def _read_epub(archive: EpubArchive) -> Tuple[Dict, etree._Element]:
+    rootfile = _read_container(archive)
+    opf_info = _parse_opf(archive, rootfile)
+    return opf_info, _aggregate_html(archive, rootfile, opf_info["manifest"], opf_info["spine"])
+
+
+def _text_blocks(html_root: etree._Element, config: dict, strict: bool) -> List[PageText]:
+    return list(_iter_text_blocks(html_root, config, strict=strict))
+
+
+def _apply_xslt(html_root: etree._Element, root_name: str) -> etree._Element:
+    transform = _load_transform()
+    result_tree = transform(html_root, **{"root-element": etree.XSLT.strparam(root_name)})
+    return result_tree.getroot()
+
+
+def _write_docbook(rittdoc: RittDocTransformResult, root_name: str, dtd_system: str) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp_file = Path(tmpdir) / "full_book.xml"
+        header_lines = ["<?xml version=\"1.0\" encoding=\"UTF-8\"?>"]
+        for target, data in rittdoc.processing_instructions:
+            header_lines.append(f"<?{target} {data}?>")
+        header_lines.append(f"<!DOCTYPE {root_name} SYSTEM \"{dtd_system}\">")
+        header = "\n".join(header_lines) + "\n"
+        xml_bytes = etree.tostring(
+            rittdoc.root, encoding="UTF-8", pretty_print=True, xml_declaration=False
+        )
+        tmp_file.write_text(header + xml_bytes.decode("utf-8"), encoding="utf-8")
+        # Temporarily skip DTD validation to inspect raw conversion output.
+        # validate_dtd(str(tmp_file), dtd_system, catalog)
+
+
+def _page_metrics(pages: List[PageText]) -> Dict:
+    post_pages = [
+        PageText(
+            page_num=page.page_num,
+            raw_text=page.norm_text,
+            norm_text=page.norm_text,
+            checksum=page.checksum,
+        )
+        for page in pages
     ]
+    return compute_metrics(pages, post_pages)
 
 
-def convert_epub(
+def _epub_steps(
     epub_path: str,
     out_path: str,
     publisher: str,
     *,
-    config_dir: str = "config",
-    strict: bool = False,
-    catalog: str = "validation/catalog.xml",
-) -> Dict:
+    config_dir: str,
+    strict: bool,
+    recorder: StageRecorder,
+) -> Steps[Dict]:
     config = load_mapping(Path(config_dir), publisher)
     epub_file = Path(epub_path)
     if not epub_file.exists():
         raise FileNotFoundError(epub_path)
 
-    with zipfile.ZipFile(epub_file, "r") as zf:
-        rootfile = _read_container(zf)
-        opf_info = _parse_opf(zf, rootfile)
-        html_root = _aggregate_html(zf, rootfile, opf_info["manifest"], opf_info["spine"])
-        blocks = _collect_text_blocks(html_root)
-
-        if strict and any(not block.strip() for block in blocks):
-            raise ValueError('Empty content block detected in strict mode')
-
-        pages: List[PageText] = []
-        for idx, text in enumerate(blocks, start=1):
-            norm_text = normalize_text(text, config)
-            pages.append(
-                PageText(
-                    page_num=idx,
-                    raw_text=text,
-                    norm_text=norm_text,
-                    checksum=checksum(norm_text),
-                )
-            )
+    packaging_cfg = config.get("packaging", {})
+    stream_threshold = int(packaging_cfg.get("media_stream_threshold_mb", 4) * 1024 * 1024)
+    with EpubArchive(epub_file, stream_threshold=stream_threshold) as archive:
+        with recorder.stage("read_epub") as stage:
+            opf_info, html_root = yield cpu_step(_read_epub, archive)
+            stage.items["documents"] = len(opf_info["spine"])
+        with recorder.stage("text_blocks") as stage:
+            pages: List[PageText] = yield cpu_step(_text_blocks, html_root, config, strict)
+            stage.items["pages"] = len(pages)
 
-        xslt_path = Path(__file__).parent / "transform" / "epub_to_docbook.xsl"
-        transform = etree.XSLT(etree.parse(str(xslt_path)))
         root_name = config.get("docbook", {}).get("root", "book")
-        result_tree = transform(html_root, **{"root-element": etree.XSLT.strparam(root_name)})
-        docbook_root = result_tree.getroot()
-        rittdoc: RittDocTransformResult = transform_docbook_to_rittdoc(docbook_root)
+        with recorder.stage("xslt"):
+            docbook_root = yield cpu_step(_apply_xslt, html_root, root_name)
+        with recorder.stage("transform"):
+            rittdoc: RittDocTransformResult = yield cpu_step(transform_docbook_to_rittdoc, docbook_root)
 
         dtd_system = config.get("docbook", {}).get(
             "dtd_system", "RITTDOCdtd/v1.1/RittDocBook.dtd"
         )
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmp_file = Path(tmpdir) / "full_book.xml"
-            header_lines = ["<?xml version=\"1.0\" encoding=\"UTF-8\"?>"]
-            for target, data in rittdoc.processing_instructions:
-                header_lines.append(f"<?{target} {data}?>")
-            header_lines.append(f"<!DOCTYPE {root_name} SYSTEM \"{dtd_system}\">")
-            header = "\n".join(header_lines) + "\n"
-            xml_bytes = etree.tostring(
-                rittdoc.root, encoding="UTF-8", pretty_print=True, xml_declaration=False
-            )
-            tmp_file.write_text(header + xml_bytes.decode("utf-8"), encoding="utf-8")
-            # Temporarily skip DTD validation to inspect raw conversion output.
-            # validate_dtd(str(tmp_file), dtd_system, catalog)
-
-        def fetch_media(ref: str) -> Optional[bytes]:
-            normalized = ref.lstrip("/")
-            try:
-                return zf.read(normalized)
-            except KeyError:
-                try:
-                    return zf.read(ref)
-                except KeyError:
-                    logger.warning("Missing media resource in EPUB: %s", ref)
-                    return None
-
-        zip_path = package_docbook(
-            rittdoc.root,
-            root_name,
-            dtd_system,
-            out_path,
-            processing_instructions=rittdoc.processing_instructions,
-            assets=rittdoc.assets,
-            media_fetcher=fetch_media,
-        )
+        with recorder.stage("write_docbook"):
+            yield cpu_step(_write_docbook, rittdoc, root_name, dtd_system)
 
-        post_pages = [
-            PageText(
-                page_num=page.page_num,
-                raw_text=page.norm_text,
-                norm_text=page.norm_text,
-                checksum=page.checksum,
+        with recorder.stage("package") as stage:
+            stage.items["images"] = count_images(rittdoc.root)
+            zip_path = yield cpu_step(
+                partial(
+                    package_docbook,
+                    processing_instructions=rittdoc.processing_instructions,
+                    assets=rittdoc.assets,
+                    media_fetcher=archive.fetch,
+                    xml_compresslevel=packaging_cfg.get("xml_compresslevel", DEFAULT_XML_COMPRESSLEVEL),
+                    store_compressed_media=packaging_cfg.get("store_compressed_media", True),
+                    workers=packaging_cfg.get("workers", 1),
+                    consume_root=True,
+                ),
+                rittdoc.root,
+                root_name,
+                dtd_system,
+                out_path,
             )
-            for page in pages
-        ]
-        metrics = compute_metrics(pages, post_pages)
+
+        with recorder.stage("metrics") as stage:
+            metrics = yield cpu_step(_page_metrics, pages)
+            stage.items["pages"] = len(pages)
         metrics["output_path"] = str(zip_path)
+        metrics["stages"] = recorder.as_metrics()
         return metrics
+
+
+def convert_epub(
+    epub_path: str,
+    out_path: str,
+    publisher: str,
+    *,
+    config_dir: str = "config",
+    strict: bool = False,
+    catalog: str = "validation/catalog.xml",
+    recorder: Optional[StageRecorder] = None,
+) -> Dict:
+    return run_steps(
+        _epub_steps(
+            epub_path,
+            out_path,
+            publisher,
+            config_dir=config_dir,
+            strict=strict,
+            recorder=recorder if recorder is not None else StageRecorder(epub_path),
+        )
+    )
+
+
+async def convert_epub_async(
+    epub_path: str,
+    out_path: str,
+    publisher: str,
+    *,
+    config_dir: str = "config",
+    strict: bool = False,
+    executor: Optional[Executor] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict:
+    """Asynchronous :func:`convert_epub`; every stage runs on *executor*.
+
+    *progress* is called on the event loop as each stage starts and finishes.
+    """
+
+    return await arun_steps(
+        _epub_steps(
+            epub_path,
+            out_path,
+            publisher,
+            config_dir=config_dir,
+            strict=strict,
+            recorder=StageRecorder(epub_path, progress=progress, thread_cpu=False),
+        ),
+        executor=executor,
+    )
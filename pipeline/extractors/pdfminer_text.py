@@ -4,17 +4,31 @@ import io
 import logging
 from typing import List
 
-from pdfminer.converter import TextConverter
-from pdfminer.layout import LAParams
-from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
-from pdfminer.pdfpage import PDFPage
-
 from ..common import PageText, checksum
 
 logger = logging.getLogger(__name__)
 
 
+def load_pdfminer() -> None:
+    """Import the pdfminer modules used here.
+
+    pdfminer is imported on first use rather than with this module because
+    it accounts for most of the pipeline's import time.  Long-running
+    processes call this up front to pay that cost before the first job.
+    """
+
+    import pdfminer.converter  # noqa: F401
+    import pdfminer.layout  # noqa: F401
+    import pdfminer.pdfinterp  # noqa: F401
+    import pdfminer.pdfpage  # noqa: F401
+
+
 def pdfminer_pages(pdf_path: str) -> List[PageText]:
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+
     pages: List[PageText] = []
     logger.info("Extracting pdfminer text for %s", pdf_path)
     with open(pdf_path, "rb") as fh:
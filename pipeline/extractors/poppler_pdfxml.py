@@ -2,17 +2,19 @@ from __future__ import annotations
 
 import logging
 from pathlib import Path
+from typing import List
 
-from ..common import run_cmd
+from ..common import arun_cmd, run_cmd
 
 logger = logging.getLogger(__name__)
 
 
-def pdftohtml_xml(pdf_path: str, out_xml: str) -> None:
+def _pdftohtml_args(pdf_path: str, out_xml: str) -> List[str]:
     pdf = Path(pdf_path)
     out = Path(out_xml)
     out.parent.mkdir(parents=True, exist_ok=True)
-    args = [
+    logger.info("Generating Poppler PDFXML for %s", pdf)
+    return [
         "pdftohtml",
         "-xml",
         "-enc",
@@ -23,5 +25,11 @@ def pdftohtml_xml(pdf_path: str, out_xml: str) -> None:
         str(pdf),
         str(out),
     ]
-    logger.info("Generating Poppler PDFXML for %s", pdf)
-    run_cmd(args)
+
+
+def pdftohtml_xml(pdf_path: str, out_xml: str) -> None:
+    run_cmd(_pdftohtml_args(pdf_path, out_xml))
+
+
+async def pdftohtml_xml_async(pdf_path: str, out_xml: str) -> None:
+    await arun_cmd(_pdftohtml_args(pdf_path, out_xml))
@@ -1,25 +1,59 @@
 from __future__ import annotations
 
 import logging
-from typing import List
+from typing import Iterable, Iterator, List
 
-from ..common import PageText, checksum, run_cmd
+from ..common import PageText, astream_cmd, checksum, stream_cmd
 
 logger = logging.getLogger(__name__)
 
 
-def pdftotext_pages(pdf_path: str) -> List[PageText]:
-    args = ["pdftotext", "-enc", "UTF-8", "-layout", str(pdf_path), "-"]
+class _PageSplitter:
+    """Split streamed text on form feeds, holding one page at a time."""
+
+    def __init__(self) -> None:
+        self.pending = ""
+
+    def feed(self, chunk: str) -> List[str]:
+        self.pending += chunk
+        if "\f" not in chunk:
+            return []
+        *complete, self.pending = self.pending.split("\f")
+        return complete
+
+
+def _split_pages(chunks: Iterable[str]) -> Iterator[str]:
+    # Same pages as "".join(chunks).split("\f").
+    splitter = _PageSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield splitter.pending
+
+
+def _pdftotext_args(pdf_path: str) -> List[str]:
     logger.info("Extracting Poppler text for %s", pdf_path)
-    output = run_cmd(args)
-    pages = []
-    for idx, page_text in enumerate(output.split("\f"), start=1):
-        pages.append(
-            PageText(
-                page_num=idx,
-                raw_text=page_text,
-                norm_text=page_text,
-                checksum=checksum(page_text),
-            )
-        )
+    return ["pdftotext", "-enc", "UTF-8", "-layout", str(pdf_path), "-"]
+
+
+def _page(idx: int, page_text: str) -> PageText:
+    return PageText(
+        page_num=idx,
+        raw_text=page_text,
+        norm_text=page_text,
+        checksum=checksum(page_text),
+    )
+
+
+def pdftotext_pages(pdf_path: str) -> List[PageText]:
+    chunks = stream_cmd(_pdftotext_args(pdf_path))
+    return [_page(idx, page_text) for idx, page_text in enumerate(_split_pages(chunks), start=1)]
+
+
+async def pdftotext_pages_async(pdf_path: str) -> List[PageText]:
+    splitter = _PageSplitter()
+    pages: List[PageText] = []
+    async for chunk in astream_cmd(_pdftotext_args(pdf_path)):
+        for page_text in splitter.feed(chunk):
+            pages.append(_page(len(pages) + 1, page_text))
+    pages.append(_page(len(pages) + 1, splitter.pending))
     return pages
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+
+try:  # pragma: no cover - fcntl is POSIX only
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# Mirrors the "resources" section of config/mapping.default.json.
+DEFAULT_RESOURCES: Dict = {
+    "enabled": True,
+    "tool_slots": {"pdftotext": 4, "pdftohtml": 2, "ocrmypdf": 1, "xmllint": 4},
+    "tool_memory_mb": {"pdftotext": 100, "pdftohtml": 500, "ocrmypdf": 1500, "xmllint": 200},
+    "memory_budget_mb": 4096,
+    "lock_dir": None,
+}
+# Replaces the per-user default lock_dir, e.g. to keep test runs or separate
+# deployments of the same user from sharing slots.
+LOCK_DIR_ENV = "RITDOC_GOVERNOR_DIR"
+# The memory budget is handed out in slots of this size.
+MEMORY_SLOT_MB = 64
+_MUTEX_NAME = "governor.lock"
+
+
+def _default_lock_dir() -> Path:
+    override = os.environ.get(LOCK_DIR_ENV)
+    if override:
+        return Path(override)
+    uid = os.getuid() if hasattr(os, "getuid") else "user"
+    return Path(tempfile.gettempdir()) / f"ritdoc-governor-{uid}"
+
+
+class ResourceGovernor:
+    """Limit concurrent external tool runs across threads and processes.
+
+    Each configured tool has a number of slots, and every run also reserves
+    its estimated memory from a shared budget.  Slots are ``flock`` locks on
+    files in *lock_dir*, so every converter process of the same user (batch
+    workers, the conversion service, separate CLI runs) draws from the same
+    pool, and a crashed process releases its slots automatically.  Tools
+    without a configured slot count or memory estimate are not limited, and
+    a governor with ``enabled=False`` limits nothing.  *lock_dir* defaults to
+    :data:`LOCK_DIR_ENV` when set, else to a per-user temp directory.
+    """
+
+    def __init__(
+        self,
+        *,
+        tool_slots: Dict[str, int],
+        tool_memory_mb: Dict[str, int],
+        memory_budget_mb: int,
+        lock_dir: Optional[Union[str, Path]] = None,
+        poll_s: float = 0.01,
+        max_poll_s: float = 0.5,
+        enabled: bool = True,
+    ) -> None:
+        self.enabled = enabled
+        self.tool_slots = dict(tool_slots)
+        self.tool_memory_mb = dict(tool_memory_mb)
+        self.memory_slots = max(int(memory_budget_mb) // MEMORY_SLOT_MB, 0)
+        self.lock_dir = Path(lock_dir) if lock_dir else _default_lock_dir()
+        self.poll_s = poll_s
+        self.max_poll_s = max_poll_s
+
+    @classmethod
+    def from_config(cls, resources: Optional[Dict]) -> "ResourceGovernor":
+        settings = {**DEFAULT_RESOURCES, **(resources or {})}
+        return cls(
+            tool_slots=settings["tool_slots"],
+            tool_memory_mb=settings["tool_memory_mb"],
+            memory_budget_mb=settings["memory_budget_mb"],
+            lock_dir=settings.get("lock_dir"),
+            enabled=bool(settings.get("enabled", True)),
+        )
+
+    def _limits(self, tool: str) -> Tuple[int, int]:
+        if not self.enabled or fcntl is None:
+            return 0, 0
+        return int(self.tool_slots.get(tool, 0)), self._memory_needed(tool)
+
+    def _memory_needed(self, tool: str) -> int:
+        if not self.memory_slots:
+            return 0
+        needed = -(-int(self.tool_memory_mb.get(tool, 0)) // MEMORY_SLOT_MB)
+        # A tool larger than the whole budget runs alone rather than never.
+        return min(needed, self.memory_slots)
+
+    @contextmanager
+    def acquire(self, tool: str) -> Iterator[float]:
+        """Hold a slot for *tool* while the block runs; yields the wait in seconds."""
+
+        slots, memory = self._limits(tool)
+        if not slots and not memory:
+            yield 0.0
+            return
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        delay = self.poll_s
+        while True:
+            held = self._try_acquire(tool, slots, memory)
+            if held is not None:
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_poll_s)
+        waited = time.perf_counter() - start
+        if waited > self.max_poll_s:
+            logger.debug("Waited %.2f s for a %s slot", waited, tool)
+        try:
+            yield waited
+        finally:
+            _release(held)
+
+    @asynccontextmanager
+    async def acquire_async(self, tool: str) -> AsyncIterator[float]:
+        """Like :meth:`acquire`, but waits without blocking the event loop."""
+
+        import asyncio
+
+        slots, memory = self._limits(tool)
+        if not slots and not memory:
+            yield 0.0
+            return
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        delay = self.poll_s
+        while True:
+            held = self._try_acquire(tool, slots, memory)
+            if held is not None:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_s)
+        waited = time.perf_counter() - start
+        if waited > self.max_poll_s:
+            logger.debug("Waited %.2f s for a %s slot", waited, tool)
+        try:
+            yield waited
+        finally:
+            _release(held)
+
+    def _try_acquire(self, tool: str, slots: int, memory: int) -> Optional[List[int]]:
+        # All or nothing under one mutex, so two processes each holding half
+        # of what they need cannot block each other.
+        mutex = os.open(self.lock_dir / _MUTEX_NAME, os.O_RDWR | os.O_CREAT, 0o600)
+        held: List[int] = []
+        try:
+            fcntl.flock(mutex, fcntl.LOCK_EX)
+            if slots and not self._grab(f"tool-{tool}", slots, 1, held):
+                _release(held)
+                return None
+            if memory and not self._grab("memory", self.memory_slots, memory, held):
+                _release(held)
+                return None
+            return held
+        finally:
+            os.close(mutex)
+
+    def _grab(self, name: str, total: int, count: int, held: List[int]) -> bool:
+        taken = 0
+        for index in range(total):
+            fd = os.open(self.lock_dir / f"{name}.{index}.slot", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            held.append(fd)
+            taken += 1
+            if taken == count:
+                return True
+        return False
+
+
+def _release(fds: List[int]) -> None:
+    for fd in fds:
+        os.close(fd)  # closing the descriptor drops its flock
+    fds.clear()
+
+
+_governor: Optional[ResourceGovernor] = None
+
+
+def configure_governor(resources: Optional[Dict]) -> ResourceGovernor:
+    """Install the process-wide governor from a ``resources`` config section.
+
+    Also used as a process-pool initializer so batch workers share the
+    parent's limits.
+    """
+
+    global _governor
+    _governor = ResourceGovernor.from_config(resources)
+    return _governor
+
+
+def get_governor() -> ResourceGovernor:
+    if _governor is None:
+        return configure_governor(None)
+    return _governor
+
+
+__all__ = ["DEFAULT_RESOURCES", "LOCK_DIR_ENV", "ResourceGovernor", "configure_governor", "get_governor"]
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+try:  # pragma: no cover - resource is POSIX only
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .profiling import StageProfiler
+
+logger = logging.getLogger(__name__)
+
+# One JSON object per finished stage; attach a handler with a bare
+# "%(message)s" format to get a JSON-lines stream.
+stage_logger = logging.getLogger("pipeline.stages")
+
+
+@dataclass
+class StageTiming:
+    stage: str
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_delta_kb: int = 0
+    queue_wait_s: float = 0.0
+    items: Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict:
+        return {
+            "stage": self.stage,
+            "wall_s": round(self.wall_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+            "peak_rss_delta_kb": self.peak_rss_delta_kb,
+            "queue_wait_s": round(self.queue_wait_s, 6),
+            "items": dict(self.items),
+        }
+
+
+ProgressCallback = Callable[[str, StageTiming], None]
+
+_current_stage: ContextVar[Optional[StageTiming]] = ContextVar("current_stage", default=None)
+_cpu_lock = threading.Lock()
+T = TypeVar("T")
+
+
+def record_queue_wait(seconds: float) -> None:
+    """Charge time spent waiting for a resource slot to the running stage."""
+
+    timing = _current_stage.get()
+    if timing is not None:
+        timing.queue_wait_s += seconds
+
+
+def record_cpu_time(seconds: float) -> None:
+    """Charge CPU time used by a worker thread or child process to the running stage."""
+
+    timing = _current_stage.get()
+    if timing is not None:
+        with _cpu_lock:
+            timing.cpu_s += seconds
+
+
+def charge_cpu(func: Callable[..., T], *args: Any) -> T:
+    """Call ``func(*args)`` and charge this thread's CPU time in it to the running stage.
+
+    For work a stage hands to other threads; run it in a copy of the stage's
+    context so the stage is visible there.
+    """
+
+    start = time.thread_time()
+    try:
+        return func(*args)
+    finally:
+        record_cpu_time(time.thread_time() - start)
+
+
+def _peak_rss_kb() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux but bytes on macOS.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class StageRecorder:
+    """Record wall time, CPU time, peak-RSS growth and item counts per stage.
+
+    CPU time is per conversion: the CPU of the thread that runs the stage,
+    plus whatever its worker threads and external tools report through
+    :func:`record_cpu_time`, so conversions running side by side do not
+    charge each other.  With *thread_cpu* off the stage's own thread is not
+    counted; the async pipelines enter stages on the shared event loop
+    thread and charge their executor steps instead.  The RSS figure is how
+    far the process high-water mark rose during the stage.  It is
+    process-wide and includes anything running concurrently, and a stage
+    that stays below an earlier peak reports zero.
+
+    With a *profiler* each stage is also run under cProfile; without one no
+    profiling code is imported or executed.  *progress* is called with
+    ``("start", timing)`` when a stage begins and ``("finish", timing)`` once
+    its figures are final, including when the stage fails.
+    """
+
+    def __init__(
+        self,
+        source: str = "",
+        *,
+        profiler: Optional["StageProfiler"] = None,
+        progress: Optional[ProgressCallback] = None,
+        thread_cpu: bool = True,
+    ) -> None:
+        self.source = source
+        self.profiler = profiler
+        self.progress = progress
+        self.thread_cpu = thread_cpu
+        self.stages: List[StageTiming] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageTiming]:
+        """Time the enclosed block; set counts on the yielded ``items`` dict."""
+
+        timing = StageTiming(name)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        rss_start = _peak_rss_kb()
+        token = _current_stage.set(timing)
+        if self.progress is not None:
+            self.progress("start", timing)
+        try:
+            if self.profiler is None:
+                yield timing
+            else:
+                with self.profiler.profile(name):
+                    yield timing
+        finally:
+            _current_stage.reset(token)
+            timing.wall_s = time.perf_counter() - wall_start
+            if self.thread_cpu:
+                with _cpu_lock:
+                    timing.cpu_s += time.thread_time() - cpu_start
+            timing.peak_rss_delta_kb = max(_peak_rss_kb() - rss_start, 0)
+            self.stages.append(timing)
+            if stage_logger.isEnabledFor(logging.INFO):
+                stage_logger.info(json.dumps({"source": self.source, **timing.as_dict()}))
+            if self.progress is not None:
+                self.progress("finish", timing)
+
+    def as_metrics(self) -> List[Dict]:
+        return [timing.as_dict() for timing in self.stages]
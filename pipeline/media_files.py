@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import io
+import logging
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import IO, Callable, Dict, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MediaStream:
+    """A media payload opened on demand instead of held in memory.
+
+    Fetchers hand these out for large assets.  Consumers read them in chunks,
+    so peak memory does not grow with image size.  *opener* may be called
+    more than once and from several threads.
+
+    *copy_raw*, when set, writes the payload into a ZIP under the given entry
+    name exactly as it is stored in its source archive, without inflating or
+    deflating it again.
+    """
+
+    opener: Callable[[], IO[bytes]]
+    size: int
+    copy_raw: Optional[Callable[[zipfile.ZipFile, str], object]] = None
+
+    def open(self) -> IO[bytes]:
+        return self.opener()
+
+
+MediaPayload = Union[bytes, MediaStream]
+
+
+def payload_size(payload: MediaPayload) -> int:
+    if isinstance(payload, MediaStream):
+        return payload.size
+    return len(payload)
+
+
+class FileMediaFetcher:
+    """Media fetcher over a fixed list of search directories.
+
+    Each directory is listed once, on first use, and later lookups are plain
+    dictionary hits instead of ``exists()`` probes.  The listing is a snapshot:
+    files created after a directory was first consulted are not seen, which
+    suits pdftohtml output that is complete before packaging starts.
+
+    Small files are served from a size-bounded LRU so images referenced from
+    several places are read from disk once.  Files of at least
+    *stream_threshold* bytes are returned as a :class:`MediaStream` and never
+    loaded whole.  ``bytes_read`` counts what was actually read from disk,
+    including every pass a consumer makes over a stream.
+    """
+
+    def __init__(
+        self,
+        search_paths: Sequence[Union[str, Path]],
+        *,
+        cache_bytes: int = 64 * 1024 * 1024,
+        max_cached_file: int = 4 * 1024 * 1024,
+        stream_threshold: int = 4 * 1024 * 1024,
+    ) -> None:
+        self._paths = [Path(p) for p in search_paths]
+        self._listings: Dict[Path, Dict[str, Path]] = {}
+        self._cache: "OrderedDict[Path, bytes]" = OrderedDict()
+        self._cache_size = 0
+        self._cache_bytes = cache_bytes
+        self._max_cached_file = max_cached_file
+        self._stream_threshold = stream_threshold
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+
+    def __call__(self, name: str) -> Optional[MediaPayload]:
+        path = self.resolve(name)
+        if path is None:
+            return None
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None:
+                self._cache.move_to_end(path)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        try:
+            data = self._read(path)
+        except OSError as exc:
+            logger.warning("Failed reading media %s: %s", path, exc)
+            return None
+        if isinstance(data, bytes):
+            self._count(len(data))
+        if isinstance(data, bytes) and len(data) <= self._max_cached_file:
+            self._remember(path, data)
+        return data
+
+    def resolve(self, name: str) -> Optional[Path]:
+        """Return the file *name* refers to, or ``None`` if no search path has it."""
+
+        ref = Path(name)
+        candidates = [ref] if ref.is_absolute() else []
+        candidates.extend(base / name for base in self._paths)
+        for candidate in candidates:
+            found = self._listing(candidate.parent).get(candidate.name)
+            if found is not None:
+                return found
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for the conversion metrics."""
+
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes_read": self.bytes_read}
+
+    def _listing(self, directory: Path) -> Dict[str, Path]:
+        with self._lock:
+            listing = self._listings.get(directory)
+        if listing is not None:
+            return listing
+        listing = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        listing[entry.name] = directory / entry.name
+        except OSError:
+            pass
+        with self._lock:
+            return self._listings.setdefault(directory, listing)
+
+    def _read(self, path: Path) -> MediaPayload:
+        size = path.stat().st_size
+        if size >= self._stream_threshold:
+            return MediaStream(partial(self._open_counted, path), size)
+        return path.read_bytes()
+
+    def _open_counted(self, path: Path) -> IO[bytes]:
+        # Streams are read as they are consumed, possibly more than once
+        # (hashing, then packaging), so their bytes are counted at the file.
+        return io.BufferedReader(_CountingFileIO(path, self._count))
+
+    def _count(self, size: int) -> None:
+        with self._lock:
+            self.bytes_read += size
+
+    def _remember(self, path: Path, data: bytes) -> None:
+        with self._lock:
+            if path in self._cache:
+                return
+            self._cache[path] = data
+            self._cache_size += len(data)
+            while self._cache and self._cache_size > self._cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted)
+
+
+class _CountingFileIO(io.FileIO):
+    """Read-only raw file that reports the size of every read to *count*."""
+
+    def __init__(self, path: Path, count: Callable[[int], None]) -> None:
+        super().__init__(path, "r")
+        self._count_read = count
+
+    def readinto(self, buffer) -> Optional[int]:
+        size = super().readinto(buffer)
+        if size:
+            self._count_read(size)
+        return size
+
+    def read(self, size: int = -1) -> bytes:
+        data = super().read(size)
+        self._count_read(len(data))
+        return data
+
+    def readall(self) -> bytes:
+        data = super().readall()
+        self._count_read(len(data))
+        return data
@@ -4,7 +4,7 @@ import logging
 from pathlib import Path
 from typing import Iterable, List
 
-from ..common import run_cmd
+from ..common import arun_cmd, run_cmd
 
 logger = logging.getLogger(__name__)
 
@@ -33,13 +33,12 @@ def _collapse_ranges(pages: Iterable[int]) -> str:
     return ",".join(ranges)
 
 
-def ocr_pages(pdf_path: str, pages: List[int], out_path: str) -> str:
-    if not pages:
-        return pdf_path
+def _ocrmypdf_args(pdf_path: str, pages: List[int], out_path: str) -> List[str]:
     page_spec = _collapse_ranges(pages)
     output = Path(out_path)
     output.parent.mkdir(parents=True, exist_ok=True)
-    args = [
+    logger.info("Running OCRmyPDF on %s pages %s", pdf_path, page_spec)
+    return [
         "ocrmypdf",
         "--force-ocr",
         "--skip-text",
@@ -48,6 +47,17 @@ def ocr_pages(pdf_path: str, pages: List[int], out_path: str) -> str:
         pdf_path,
         str(output),
     ]
-    logger.info("Running OCRmyPDF on %s pages %s", pdf_path, page_spec)
-    run_cmd(args)
-    return str(output)
+
+
+def ocr_pages(pdf_path: str, pages: List[int], out_path: str) -> str:
+    if not pages:
+        return pdf_path
+    run_cmd(_ocrmypdf_args(pdf_path, pages, out_path))
+    return str(Path(out_path))
+
+
+async def ocr_pages_async(pdf_path: str, pages: List[int], out_path: str) -> str:
+    if not pages:
+        return pdf_path
+    await arun_cmd(_ocrmypdf_args(pdf_path, pages, out_path))
+    return str(Path(out_path))
@@ -1,22 +1,56 @@
 from __future__ import annotations
 
+import contextvars
 import csv
+import hashlib
+import io
 import logging
 import re
+import shutil
 import string
-import tempfile
+import threading
+import time
 import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from copy import deepcopy
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from typing import (
+    IO,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
 
 from lxml import etree
 
+from .instrumentation import charge_cpu
+from .media_files import FileMediaFetcher, MediaPayload, MediaStream, payload_size
+
 logger = logging.getLogger(__name__)
 
 
-MediaFetcher = Callable[[str], Optional[bytes]]
+MediaFetcher = Callable[[str], Optional[MediaPayload]]
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+MEDIA_DIR = "media"
+BOOK_IMAGES_DIR = f"{MEDIA_DIR}/Book_Images"
+CHAPTERS_DIR = f"{BOOK_IMAGES_DIR}/Chapters"
+SHARED_DIR = f"{BOOK_IMAGES_DIR}/Shared"
+METADATA_DIR = f"{BOOK_IMAGES_DIR}/Metadata"
 
 
 @dataclass
@@ -46,6 +80,8 @@ class ImageMetadata:
     height: int
     file_size: str
     format: str
+    sha256: str = ""
+    alias_of: str = ""
 
 
 
@@ -112,15 +148,39 @@ def _extract_title_text(element: etree._Element) -> str:
     return ""
 
 
-def _split_root(root: etree._Element) -> Tuple[etree._Element, List[ChapterFragment]]:
+def _detach_subtree(element: etree._Element) -> etree._Element:
+    """Move the content of *element* under a fresh root in its own document.
+
+    Children are moved rather than copied, leaving an empty husk behind.  The
+    new root owns its document, so fragments never share a tree afterwards.
+    """
+
+    moved = etree.Element(element.tag, attrib=dict(element.attrib), nsmap=element.nsmap)
+    moved.text = element.text
+    moved.tail = element.tail
+    moved.extend(list(element))
+    return moved
+
+
+def _split_root(
+    root: etree._Element, *, detach: bool = False
+) -> Tuple[etree._Element, List[ChapterFragment]]:
+    """Split *root* into a book skeleton plus chapter fragments.
+
+    By default every extracted node is deep-copied and *root* is left intact.
+    With ``detach=True`` subtrees are moved out of *root* instead, so the book
+    never exists twice in memory; *root* must not be used afterwards.
+    """
+
+    take = _detach_subtree if detach else deepcopy
     root_copy = etree.Element(root.tag, attrib=dict(root.attrib), nsmap=root.nsmap)
     root_copy.text = root.text
     fragments: List[ChapterFragment] = []
     chapter_index = 0
 
-    for child in root:
+    for child in list(root):
         if not isinstance(child.tag, str):
-            root_copy.append(deepcopy(child))
+            root_copy.append(child if detach else deepcopy(child))
             continue
 
         if _is_toc_node(child):
@@ -131,7 +191,7 @@ def _split_root(root: etree._Element) -> Tuple[etree._Element, List[ChapterFragm
                 ChapterFragment(
                     entity_id,
                     filename,
-                    deepcopy(child),
+                    take(child),
                     kind="toc",
                     title=title,
                     section_type="toc",
@@ -171,7 +231,7 @@ def _split_root(root: etree._Element) -> Tuple[etree._Element, List[ChapterFragm
                 ChapterFragment(
                     entity_id,
                     filename,
-                    deepcopy(child),
+                    take(child),
                     kind="chapter",
                     title=title,
                     section_type=section_type,
@@ -182,35 +242,25 @@ def _split_root(root: etree._Element) -> Tuple[etree._Element, List[ChapterFragm
             root_copy.append(entity_node)
             continue
 
-        root_copy.append(deepcopy(child))
+        root_copy.append(child if detach else deepcopy(child))
 
     if not fragments:
         # Fallback: treat non-metadata children as a single chapter to ensure
-        # downstream consumers receive at least one fragment.
-        preserved = []
-        extracted = []
-        for child in root:
-            if not isinstance(child.tag, str):
-                preserved.append(deepcopy(child))
-                continue
-            if _local_name(child) in {"bookinfo", "info"}:
-                preserved.append(deepcopy(child))
-            else:
-                extracted.append(deepcopy(child))
-
+        # downstream consumers receive at least one fragment.  Every child has
+        # already been carried over to root_copy, so the content is moved from
+        # there in both modes.
         entity_id = "Ch001"
         filename = f"{entity_id}.xml"
         wrapper = etree.Element("chapter")
-        for node in extracted:
-            wrapper.append(node)
+        for child in list(root_copy):
+            if not isinstance(child.tag, str):
+                continue
+            if _local_name(child) not in {"bookinfo", "info"}:
+                wrapper.append(child)
         fragments.append(
             ChapterFragment(entity_id, filename, wrapper, title="", section_type="chapter")
         )
 
-        root_copy[:] = []
-        root_copy.text = root.text
-        for node in preserved:
-            root_copy.append(node)
         entity_node = etree.Entity(entity_id)
         root_copy.append(entity_node)
 
@@ -241,13 +291,6 @@ def _populate_toc_fragment(
         para.text = f"{chapter_title} ({fragment.filename})"
 
 
-def _iter_imagedata(element: etree._Element) -> Iterable[etree._Element]:
-    for node in element.iter():
-        if isinstance(node.tag, str) and _local_name(node) in {"imagedata", "graphic"}:
-            if node.get("fileref"):
-                yield node
-
-
 def _extract_caption_text(figure: Optional[etree._Element]) -> str:
     if figure is None:
         return ""
@@ -264,26 +307,24 @@ def _extract_caption_text(figure: Optional[etree._Element]) -> str:
     return ""
 
 
-def _has_caption_or_label(
-    figure: Optional[etree._Element], image_node: etree._Element
-) -> bool:
-    if figure is not None:
-        if _extract_caption_text(figure):
+def _figure_is_labelled(figure: etree._Element, caption_text: str) -> bool:
+    if caption_text:
+        return True
+    for attr in ("label", "id"):
+        value = (figure.get(attr) or "").strip()
+        if value:
             return True
-        for attr in ("label", "id"):
-            value = (figure.get(attr) or "").strip()
-            if value:
-                return True
-        label_node = figure.find("label")
-        if label_node is not None:
-            text = "".join(label_node.itertext()).strip()
-            if text:
-                return True
+    label_node = figure.find("label")
+    if label_node is not None:
+        text = "".join(label_node.itertext()).strip()
+        if text:
+            return True
+    return False
 
-    mediaobject = next(
-        (ancestor for ancestor in image_node.iterancestors() if _local_name(ancestor) == "mediaobject"),
-        None,
-    )
+
+def _image_is_labelled(
+    image_node: etree._Element, mediaobject: Optional[etree._Element]
+) -> bool:
     if mediaobject is not None:
         caption_node = mediaobject.find("caption")
         if caption_node is not None:
@@ -299,15 +340,13 @@ def _has_caption_or_label(
     return False
 
 
-def _extract_alt_text(image_node: etree._Element) -> str:
+def _extract_alt_text(
+    image_node: etree._Element, mediaobject: Optional[etree._Element]
+) -> str:
     alt = image_node.get("alt") or image_node.get("xlink:title")
     if alt:
         return alt.strip()
 
-    mediaobject = next(
-        (ancestor for ancestor in image_node.iterancestors() if _local_name(ancestor) == "mediaobject"),
-        None,
-    )
     if mediaobject is not None:
         for textobject in mediaobject.findall("textobject"):
             text = "".join(textobject.itertext()).strip()
@@ -319,16 +358,107 @@ def _extract_alt_text(image_node: etree._Element) -> str:
 DECORATIVE_KEYWORDS = {"logo", "watermark", "copyright", "trademark", "tm", "brand"}
 BACKGROUND_KEYWORDS = {"background", "texture", "gradient", "border", "pattern"}
 BOOKINFO_NODES = {"bookinfo", "info", "titlepage"}
+IMAGE_NODES = {"imagedata", "graphic"}
+
+
+@dataclass
+class _FigureEntry:
+    element: etree._Element
+    caption: str
+    labelled: bool
+    images: List["_ImageEntry"] = field(default_factory=list)
+
 
+@dataclass
+class _ImageEntry:
+    node: etree._Element
+    figure: Optional[_FigureEntry]
+    in_bookinfo: bool
+    labelled: bool
+    alt_text: str
+
+
+@dataclass
+class _ImageIndex:
+    """Image references of one tree, grouped the way packaging walks them."""
+
+    figures: List[_FigureEntry]
+    loose: List[_ImageEntry]
+    images: List[_ImageEntry]
+
+
+def _index_images(element: etree._Element) -> _ImageIndex:
+    """Index every image reference under *element* in one document walk.
+
+    Each ``imagedata``/``graphic`` with a ``fileref`` is recorded with its
+    outermost enclosing ``figure``, its nearest ``mediaobject`` and whether it
+    sits inside book metadata, together with the caption, label and alt text
+    packaging decisions need.  Figures, loose images and all images come out
+    in document order.
+    """
+
+    figures: List[_FigureEntry] = []
+    loose: List[_ImageEntry] = []
+    images: List[_ImageEntry] = []
+    figure: Optional[_FigureEntry] = None
+    mediaobjects: List[etree._Element] = []
+    bookinfo_depth = sum(
+        1 for ancestor in element.iterancestors() if _local_name(ancestor) in BOOKINFO_NODES
+    )
+    for event, node in etree.iterwalk(element, events=("start", "end")):
+        name = _local_name(node)
+        if event == "end":
+            if figure is not None and node is figure.element:
+                figure = None
+            elif name == "mediaobject":
+                mediaobjects.pop()
+            if name in BOOKINFO_NODES:
+                bookinfo_depth -= 1
+            continue
 
-def _classify_image(image_node: etree._Element, figure: Optional[etree._Element]) -> str:
+        if name in BOOKINFO_NODES:
+            bookinfo_depth += 1
+        # Only un-namespaced figures below the root count, as with the
+        # ``findall(".//figure")`` this replaces.
+        if node.tag == "figure" and node is not element and figure is None:
+            caption = _extract_caption_text(node)
+            figure = _FigureEntry(node, caption, _figure_is_labelled(node, caption))
+            figures.append(figure)
+        elif name == "mediaobject":
+            mediaobjects.append(node)
+        elif name in IMAGE_NODES and node.get("fileref"):
+            mediaobject = mediaobjects[-1] if mediaobjects else None
+            image = _ImageEntry(
+                node=node,
+                figure=figure,
+                in_bookinfo=bookinfo_depth > 0,
+                labelled=(figure is not None and figure.labelled)
+                or _image_is_labelled(node, mediaobject),
+                alt_text=_extract_alt_text(node, mediaobject),
+            )
+            images.append(image)
+            if figure is not None:
+                figure.images.append(image)
+            else:
+                loose.append(image)
+    return _ImageIndex(figures, loose, images)
+
+
+def count_images(element: etree._Element) -> int:
+    """Return the number of image references under *element*."""
+
+    return sum(1 for node in element.iter("{*}imagedata", "{*}graphic") if node.get("fileref"))
+
+
+def _classify_image(
+    image_node: etree._Element, figure: Optional[etree._Element], in_bookinfo: bool
+) -> str:
     original = image_node.get("fileref", "")
     name = Path(original).name.lower()
     if figure is not None:
         return "content"
 
-    ancestors = {_local_name(ancestor) for ancestor in image_node.iterancestors()}
-    if ancestors & BOOKINFO_NODES:
+    if in_bookinfo:
         return "decorative"
 
     if any(keyword in name for keyword in DECORATIVE_KEYWORDS):
@@ -351,43 +481,121 @@ def _format_file_size(size_bytes: int) -> str:
     return f"{size_bytes}B"
 
 
-def _inspect_image_bytes(data: bytes, fallback_suffix: str) -> Tuple[int, int, str]:
-    if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 24:
-        width = int.from_bytes(data[16:20], "big", signed=False)
-        height = int.from_bytes(data[20:24], "big", signed=False)
+def _inspect_image_stream(handle: IO[bytes], fallback_suffix: str) -> Tuple[int, int, str]:
+    """Read image dimensions from the start of a seekable stream.
+
+    Only the header is read: 24 bytes for PNG and GIF, and the segment
+    markers for JPEG, seeking over segment bodies.
+    """
+
+    head = handle.read(24)
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and len(head) >= 24:
+        width = int.from_bytes(head[16:20], "big", signed=False)
+        height = int.from_bytes(head[20:24], "big", signed=False)
         return width, height, "PNG"
 
-    if data.startswith(b"GIF87a") or data.startswith(b"GIF89a"):
-        if len(data) >= 10:
-            width = int.from_bytes(data[6:8], "little", signed=False)
-            height = int.from_bytes(data[8:10], "little", signed=False)
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        if len(head) >= 10:
+            width = int.from_bytes(head[6:8], "little", signed=False)
+            height = int.from_bytes(head[8:10], "little", signed=False)
             return width, height, "GIF"
 
-    if data.startswith(b"\xff\xd8"):
-        offset = 2
-        length = len(data)
-        while offset + 1 < length:
-            if data[offset] != 0xFF:
+    if head[:2] == b"\xff\xd8":
+        handle.seek(2)
+        while True:
+            marker_bytes = handle.read(2)
+            if len(marker_bytes) < 2 or marker_bytes[0] != 0xFF:
                 break
-            marker = data[offset + 1]
-            offset += 2
+            marker = marker_bytes[1]
             if marker in {0xD8, 0xD9}:  # SOI/EOI
                 continue
-            if offset + 1 >= length:
+            length_bytes = handle.read(2)
+            if len(length_bytes) < 2:
                 break
-            block_length = int.from_bytes(data[offset : offset + 2], "big", signed=False)
+            block_length = int.from_bytes(length_bytes, "big", signed=False)
             if marker in {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}:
-                if offset + 7 <= length:
-                    height = int.from_bytes(data[offset + 3 : offset + 5], "big", signed=False)
-                    width = int.from_bytes(data[offset + 5 : offset + 7], "big", signed=False)
+                segment = handle.read(5)
+                if len(segment) == 5:
+                    height = int.from_bytes(segment[1:3], "big", signed=False)
+                    width = int.from_bytes(segment[3:5], "big", signed=False)
                     return width, height, "JPEG"
                 break
-            offset += block_length
+            handle.seek(block_length - 2, io.SEEK_CUR)
 
     suffix = fallback_suffix.lstrip(".")
     return 0, 0, suffix.upper() if suffix else ""
 
 
+def _inspect_image_bytes(data: bytes, fallback_suffix: str) -> Tuple[int, int, str]:
+    return _inspect_image_stream(io.BytesIO(data), fallback_suffix)
+
+
+class _HashingReader:
+    """Seekable reader over *handle* that feeds each byte to *digest* once, in order.
+
+    Forward seeks read through the bytes they skip, so a stream that is
+    expensive to rewind, such as a deflated ZIP member, is inflated once
+    for both the header inspection and the hash.
+    """
+
+    def __init__(self, handle: IO[bytes], digest) -> None:
+        self._handle = handle
+        self._digest = digest
+        self._pos = 0
+        self._hashed = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._handle.read(size)
+        unhashed = self._pos + len(data) - self._hashed
+        if unhashed > 0:
+            self._digest.update(data[len(data) - unhashed :])
+            self._hashed += unhashed
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        target = self._pos + offset if whence == io.SEEK_CUR else offset
+        if whence not in (io.SEEK_SET, io.SEEK_CUR) or target < 0:
+            raise io.UnsupportedOperation("only absolute and relative seeks are supported")
+        if target <= self._hashed:
+            # Already hashed; a short rewind re-reads the header at most.
+            self._pos = self._handle.seek(target)
+            return self._pos
+        if self._pos < self._hashed:
+            self._pos = self._handle.seek(self._hashed)
+        while self._pos < target and self.read(min(target - self._pos, _COPY_CHUNK_SIZE)):
+            pass
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def finish(self) -> None:
+        """Hash the rest of the stream."""
+
+        self.seek(self._hashed)
+        for _ in iter(partial(self.read, _COPY_CHUNK_SIZE), b""):
+            pass
+
+
+def _scan_media(payload: MediaPayload, fallback_suffix: str) -> Tuple[int, int, str, str]:
+    """Return width, height, format and SHA-256 of *payload*.
+
+    Streamed payloads are read once, in chunks, for both the header and the
+    hash, and are never held in memory whole.
+    """
+
+    if not isinstance(payload, MediaStream):
+        width, height, fmt = _inspect_image_bytes(payload, fallback_suffix)
+        return width, height, fmt, hashlib.sha256(payload).hexdigest()
+    digest = hashlib.sha256()
+    with payload.open() as handle:
+        reader = _HashingReader(handle, digest)
+        width, height, fmt = _inspect_image_stream(reader, fallback_suffix)
+        reader.finish()
+    return width, height, fmt, digest.hexdigest()
+
+
 def _chapter_code(fragment: ChapterFragment) -> Tuple[str, str]:
     entity = fragment.entity
     if entity.lower() == "toc":
@@ -410,10 +618,116 @@ def _chapter_code(fragment: ChapterFragment) -> Tuple[str, str]:
     return "Ch0001", "1"
 
 
-def _write_metadata_files(metadata_dir: Path, entries: List[ImageMetadata]) -> None:
-    metadata_dir.mkdir(parents=True, exist_ok=True)
+COMPRESSED_IMAGE_FORMATS = {"JPEG", "PNG", "GIF"}
+DEFAULT_XML_COMPRESSLEVEL = 6
+_COPY_CHUNK_SIZE = 1024 * 1024
+# Regular file, rw-r--r--.
+_FILE_ATTR = 0o100644 << 16
+# ZipInfo.compress_level is public from Python 3.13.
+_ZIPINFO_HAS_LEVEL = hasattr(zipfile.ZipInfo, "compress_level")
+
 
-    catalog_path = metadata_dir / "image_catalog.xml"
+def _is_default_level(zf: zipfile.ZipFile) -> bool:
+    # An entry without a level is deflated at zlib's default, level 6.
+    return zf.compresslevel is None or (
+        zf.compression == zipfile.ZIP_DEFLATED and zf.compresslevel in (6, zlib.Z_DEFAULT_COMPRESSION)
+    )
+
+
+class _PackageWriter:
+    """Stream package entries straight into the output ZIP.
+
+    Entries are serialised into ``ZipFile.open(..., "w")`` handles instead of
+    being staged on disk first, so every output byte is written exactly once.
+    Media already compressed by its own format is stored rather than deflated;
+    everything else uses the archive's deflate level.  Payloads that can be
+    copied raw (images from an EPUB) keep their source compression instead.
+    """
+
+    def __init__(self, zf: zipfile.ZipFile, *, store_compressed_media: bool = True) -> None:
+        self._zf = zf
+        self._store_compressed_media = store_compressed_media
+        self._names: Set[str] = set()
+
+    def __contains__(self, arcname: str) -> bool:
+        return arcname in self._names
+
+    def _claim(self, arcname: str) -> bool:
+        if arcname in self._names:
+            logger.warning("Duplicate package entry %s; keeping the first copy", arcname)
+            return False
+        self._names.add(arcname)
+        return True
+
+    @contextmanager
+    def _open(self, arcname: str, *, store: bool = False, size: int = 0) -> Iterator[IO[bytes]]:
+        force_zip64 = size > zipfile.ZIP64_LIMIT
+        # Same timestamp and permissions as the files zf.write() used to add.
+        info = zipfile.ZipInfo(arcname, date_time=time.localtime(time.time())[:6])
+        info.external_attr = _FILE_ATTR
+        if store:
+            info.compress_type = zipfile.ZIP_STORED
+        else:
+            info.compress_type = self._zf.compression
+            if _ZIPINFO_HAS_LEVEL:
+                info.compress_level = self._zf.compresslevel
+            elif not _is_default_level(self._zf):
+                # Only an entry opened by name takes the archive's level here.
+                # Its local header keeps zipfile's 1980 timestamp; the central
+                # directory, which readers list and extract from, gets ours.
+                with self._zf.open(arcname, "w", force_zip64=force_zip64) as handle:
+                    yield handle
+                written = self._zf.getinfo(arcname)
+                written.date_time = info.date_time
+                written.external_attr = _FILE_ATTR
+                return
+        with self._zf.open(info, "w", force_zip64=force_zip64) as handle:
+            yield handle
+
+    def directory(self, arcname: str) -> None:
+        if self._claim(arcname):
+            self._zf.writestr(arcname, "")
+
+    def write_bytes(self, arcname: str, data: bytes) -> None:
+        if not self._claim(arcname):
+            return
+        with self._open(arcname) as handle:
+            handle.write(data)
+
+    def write_media(self, arcname: str, payload: MediaPayload, fmt: str) -> None:
+        if not self._claim(arcname):
+            return
+        if isinstance(payload, MediaStream) and payload.copy_raw is not None:
+            payload.copy_raw(self._zf, arcname)
+            self._zf.getinfo(arcname).external_attr = _FILE_ATTR
+            return
+        size = payload_size(payload)
+        store = not size or (self._store_compressed_media and fmt in COMPRESSED_IMAGE_FORMATS)
+        with self._open(arcname, store=store, size=size) as handle:
+            if isinstance(payload, MediaStream):
+                with payload.open() as source:
+                    shutil.copyfileobj(source, handle, _COPY_CHUNK_SIZE)
+            else:
+                handle.write(payload)
+
+    def write_file(self, arcname: str, source: Path) -> None:
+        if arcname in self._names:
+            logger.warning("Duplicate package entry %s; keeping the first copy", arcname)
+            return
+        self._zf.write(source, arcname)
+        self._names.add(arcname)
+
+    def write_xml(self, arcname: str, header: str, element: etree._Element) -> None:
+        if not self._claim(arcname):
+            return
+        with self._open(arcname) as handle:
+            handle.write(header.encode("utf-8"))
+            etree.ElementTree(element).write(
+                handle, encoding="UTF-8", pretty_print=True, xml_declaration=False
+            )
+
+
+def _write_metadata_files(writer: _PackageWriter, entries: List[ImageMetadata]) -> None:
     root = etree.Element("images")
     for entry in entries:
         image_el = etree.SubElement(root, "image")
@@ -428,39 +742,46 @@ def _write_metadata_files(metadata_dir: Path, entries: List[ImageMetadata]) -> N
         etree.SubElement(image_el, "height").text = str(entry.height)
         etree.SubElement(image_el, "file_size").text = entry.file_size
         etree.SubElement(image_el, "format").text = entry.format
+        etree.SubElement(image_el, "sha256").text = entry.sha256
+        etree.SubElement(image_el, "alias_of").text = entry.alias_of
 
-    catalog_path.write_bytes(
-        etree.tostring(root, encoding="UTF-8", pretty_print=True, xml_declaration=True)
+    writer.write_bytes(
+        f"{METADATA_DIR}/image_catalog.xml",
+        etree.tostring(root, encoding="UTF-8", pretty_print=True, xml_declaration=True),
     )
 
-    manifest_path = metadata_dir / "image_manifest.csv"
-    with manifest_path.open("w", encoding="utf-8", newline="") as handle:
-        writer = csv.writer(handle)
-        writer.writerow(
+    handle = io.StringIO(newline="")
+    csv_writer = csv.writer(handle)
+    csv_writer.writerow(
+        [
+            "Filename",
+            "Chapter",
+            "Figure",
+            "Caption",
+            "Alt-Text",
+            "Original_Name",
+            "File_Size",
+            "Format",
+            "SHA256",
+            "Alias_Of",
+        ]
+    )
+    for entry in entries:
+        csv_writer.writerow(
             [
-                "Filename",
-                "Chapter",
-                "Figure",
-                "Caption",
-                "Alt-Text",
-                "Original_Name",
-                "File_Size",
-                "Format",
+                entry.filename,
+                entry.chapter,
+                entry.figure_number,
+                entry.caption,
+                entry.alt_text,
+                entry.original_filename,
+                entry.file_size,
+                entry.format,
+                entry.sha256,
+                entry.alias_of,
             ]
         )
-        for entry in entries:
-            writer.writerow(
-                [
-                    entry.filename,
-                    entry.chapter,
-                    entry.figure_number,
-                    entry.caption,
-                    entry.alt_text,
-                    entry.original_filename,
-                    entry.file_size,
-                    entry.format,
-                ]
-            )
+    writer.write_bytes(f"{METADATA_DIR}/image_manifest.csv", handle.getvalue().encode("utf-8"))
 
 
 def _remove_image_node(image_node: etree._Element) -> None:
@@ -469,43 +790,137 @@ def _remove_image_node(image_node: etree._Element) -> None:
         parent.remove(image_node)
 
 
+class _SharedMediaCache:
+    """Thread-safe memo of decorative image fetches.
+
+    Decorative assets such as logos are referenced from many fragments; each
+    reference is fetched, inspected and hashed once however many workers ask
+    for it.
+    """
+
+    def __init__(self, media_fetcher: Optional[MediaFetcher]) -> None:
+        self._media_fetcher = media_fetcher
+        self._lock = threading.Lock()
+        self._resolved: Dict[str, Optional[Tuple[MediaPayload, str, str]]] = {}
+
+    def fetch(self, original: str) -> Optional[Tuple[MediaPayload, str, str]]:
+        """Return ``(data, format, sha256)`` for *original*, or None if it is empty.
+
+        Missing assets resolve to an empty placeholder with an empty digest.
+        """
+
+        with self._lock:
+            if original in self._resolved:
+                return self._resolved[original]
+            data = self._media_fetcher(original) if self._media_fetcher else None
+            if data is None:
+                logger.warning("Missing decorative media asset for %s; creating placeholder", original)
+                resolved: Optional[Tuple[MediaPayload, str, str]] = (b"", "", "")
+            elif payload_size(data) == 0:
+                logger.warning("Skipping decorative image %s because it is empty", original)
+                resolved = None
+            else:
+                filename = Path(original).name or original
+                _, _, fmt, digest = _scan_media(data, Path(filename).suffix)
+                resolved = (data, fmt, digest)
+            self._resolved[original] = resolved
+            return resolved
+
+
+@dataclass
+class _MediaRef:
+    """An image reference resolved by a worker, awaiting its archive name."""
+
+    node: etree._Element
+    arcname: str
+    payload: MediaPayload
+    fmt: str
+    sha256: str
+    entry: Optional[ImageMetadata] = None
+
+
 def _handle_decorative_image(
     image_node: etree._Element,
-    shared_dir: Path,
-    shared_cache: Dict[str, Path],
-    media_fetcher: Optional[MediaFetcher],
+    shared: _SharedMediaCache,
+    media: List[_MediaRef],
 ) -> None:
     original = image_node.get("fileref", "")
     if not original:
         return
+    resolved = shared.fetch(original)
+    if resolved is None:
+        _remove_image_node(image_node)
+        return
+    data, fmt, digest = resolved
     filename = Path(original).name or original
-    shared_dir.mkdir(parents=True, exist_ok=True)
-    target_path = shared_cache.get(filename)
-    if target_path is None:
-        target_path = shared_dir / filename
-        data = media_fetcher(original) if media_fetcher else None
-        if data is None:
-            logger.warning("Missing decorative media asset for %s; creating placeholder", original)
-            target_path.touch(exist_ok=True)
-            shared_cache[filename] = target_path
-        elif len(data) == 0:
-            logger.warning("Skipping decorative image %s because it is empty", original)
-            _remove_image_node(image_node)
-            return
-        else:
-            target_path.write_bytes(data)
-            shared_cache[filename] = target_path
-    image_node.set("fileref", f"media/Book_Images/Shared/{filename}")
+    media.append(_MediaRef(image_node, f"{SHARED_DIR}/{filename}", data, fmt, digest))
+
+
+class _MediaStore:
+    """Assigns archive names by content so each unique image is stored once.
+
+    Chapter images keep their ``ChNNNNfNN`` name unless identical bytes were
+    already stored, in which case the reference is pointed at that copy and
+    the metadata entry records it in ``alias_of``.  Decorative images are
+    keyed by content too; a different image that happens to share a basename
+    gets a digest suffix instead of silently replacing the first one.
+
+    Placement runs on the packaging thread in fragment order, which keeps
+    the chosen names deterministic however fragments were scheduled.
+    """
+
+    def __init__(self) -> None:
+        self._chapter: Dict[str, str] = {}
+        self._shared: Dict[str, str] = {}
+        self._shared_names: Set[str] = set()
+
+    def place(self, ref: _MediaRef) -> bool:
+        """Point *ref* at its stored copy; return True if it must be written."""
+
+        if ref.entry is not None:
+            canonical = self._chapter.setdefault(ref.sha256, ref.arcname)
+            ref.node.set("fileref", canonical)
+            if canonical != ref.arcname:
+                ref.entry.alias_of = canonical.rsplit("/", 1)[-1]
+                return False
+            return True
+
+        # Missing assets have no content to key on; they keep the old
+        # one-placeholder-per-basename behaviour.
+        key = ref.sha256 or f"missing:{ref.arcname}"
+        arcname = self._shared.get(key)
+        if arcname is not None:
+            ref.node.set("fileref", arcname)
+            return False
+        arcname = ref.arcname
+        if arcname in self._shared_names:
+            stem, dot, suffix = arcname.rpartition(".")
+            tag = ref.sha256[:12] or "missing"
+            arcname = f"{stem}-{tag}.{suffix}" if dot else f"{arcname}-{tag}"
+        self._shared[key] = arcname
+        self._shared_names.add(arcname)
+        ref.arcname = arcname
+        ref.node.set("fileref", arcname)
+        return True
+
+
+@dataclass
+class _FragmentResult:
+    """Resolved media, metadata and (optionally) serialised XML for one fragment."""
 
-def _write_book_xml(
-    target: Path,
-    root_element: etree._Element,
+    fragment: ChapterFragment
+    media: List[_MediaRef]
+    metadata: List[ImageMetadata]
+    xml: Optional[bytes] = None
+
+
+def _book_xml_header(
     root_name: str,
     dtd_system: str,
     fragments: Sequence[ChapterFragment],
     *,
     processing_instructions: Sequence[Tuple[str, str]] = (),
-) -> None:
+) -> str:
     header = ["<?xml version=\"1.0\" encoding=\"UTF-8\"?>"]
     for target_name, data in processing_instructions:
         header.append(f"<?{target_name} {data}?>")
@@ -513,19 +928,15 @@ def _write_book_xml(
     for fragment in fragments:
         header.append(f"        <!ENTITY {fragment.entity} SYSTEM \"{fragment.filename}\">")
     header.append("]>")
-    header_text = "\n".join(header) + "\n\n"
-
-    body = etree.tostring(root_element, encoding="UTF-8", pretty_print=True, xml_declaration=False)
-    target.write_text(header_text + body.decode("utf-8"), encoding="utf-8")
+    return "\n".join(header) + "\n\n"
 
 
-def _write_fragment_xml(
-    target: Path,
+def _fragment_xml_header(
     element: etree._Element,
     dtd_system: str,
     *,
     processing_instructions: Sequence[Tuple[str, str]] = (),
-) -> None:
+) -> str:
     root_tag = _local_name(element) or (
         element.tag if isinstance(element.tag, str) else "chapter"
     )
@@ -533,9 +944,208 @@ def _write_fragment_xml(
     for target_name, data in processing_instructions:
         header_lines.append(f"<?{target_name} {data}?>")
     header_lines.append(f"<!DOCTYPE {root_tag} SYSTEM \"{dtd_system}\">")
-    header = "\n".join(header_lines) + "\n\n"
-    body = etree.tostring(element, encoding="UTF-8", pretty_print=True, xml_declaration=False)
-    target.write_text(header + body.decode("utf-8"), encoding="utf-8")
+    return "\n".join(header_lines) + "\n\n"
+
+
+def _process_fragment(
+    fragment: ChapterFragment,
+    media_fetcher: Optional[MediaFetcher],
+    shared: _SharedMediaCache,
+) -> _FragmentResult:
+    """Fetch, inspect and hash the media of one fragment.
+
+    Fragments own their element trees, so this is safe to run on worker
+    threads.  Chapter images get their provisional ``ChNNNNfNN`` reference;
+    final archive names are assigned later by :class:`_MediaStore`.
+    """
+
+    media: List[_MediaRef] = []
+    metadata: List[ImageMetadata] = []
+    chapter_code, chapter_label = _chapter_code(fragment)
+    figure_counter = 1
+    index = _index_images(fragment.element)
+    for figure in index.figures:
+        caption_text = figure.caption
+        images = figure.images
+        if not images:
+            continue
+        if len(images) == 1:
+            suffixes = [""]
+        else:
+            suffixes = [
+                string.ascii_lowercase[idx]
+                if idx < len(string.ascii_lowercase)
+                else f"_{idx}"
+                for idx in range(len(images))
+            ]
+        current_index = figure_counter
+        saved_any = False
+        for idx, image in enumerate(images):
+            image_node = image.node
+            original = image_node.get("fileref")
+            if not original:
+                continue
+            classification = _classify_image(image_node, figure.element, image.in_bookinfo)
+            if classification == "background":
+                parent = image_node.getparent()
+                if parent is not None:
+                    parent.remove(image_node)
+                continue
+            if classification == "decorative":
+                _handle_decorative_image(image_node, shared, media)
+                continue
+            if not image.labelled:
+                logger.warning(
+                    "Skipping media asset for %s because it lacks caption or label", original
+                )
+                _remove_image_node(image_node)
+                continue
+
+            suffix = Path(original).suffix or ".jpg"
+            letter = suffixes[idx]
+            new_filename = f"{chapter_code}f{current_index:02d}{letter}{suffix}"
+            data = media_fetcher(original) if media_fetcher else None
+            if data is None:
+                logger.warning("Missing media asset for %s; skipping", original)
+                _remove_image_node(image_node)
+                continue
+            else:
+                if payload_size(data) == 0:
+                    logger.warning("Skipping media asset for %s because it is empty", original)
+                    _remove_image_node(image_node)
+                    continue
+                width, height, fmt, digest = _scan_media(data, suffix)
+                file_size = _format_file_size(payload_size(data))
+                if width and height and (width < 72 or height < 72):
+                    logger.warning(
+                        "Low resolution image %s detected (%dx%d)", original, width, height
+                    )
+            alt_text = image.alt_text
+            if not alt_text:
+                logger.warning("Missing alt text for image %s", original)
+            referenced = bool((figure.element.get("id") or "").strip())
+            if not referenced and caption_text:
+                if re.search(r"figure\s+\d", caption_text, re.IGNORECASE):
+                    referenced = True
+            entry = ImageMetadata(
+                filename=new_filename,
+                original_filename=Path(original).name or original,
+                chapter=chapter_label,
+                figure_number=f"{current_index}{letter}",
+                caption=caption_text or "",
+                alt_text=alt_text,
+                referenced_in_text=referenced,
+                width=width,
+                height=height,
+                file_size=file_size,
+                format=fmt,
+                sha256=digest,
+            )
+            metadata.append(entry)
+            media.append(
+                _MediaRef(
+                    image_node, f"{CHAPTERS_DIR}/{new_filename}", data, fmt, entry.sha256, entry
+                )
+            )
+            saved_any = True
+        if saved_any:
+            figure_counter += 1
+
+    for image in index.loose:
+        image_node = image.node
+        original = image_node.get("fileref")
+        if not original:
+            continue
+        classification = _classify_image(image_node, None, image.in_bookinfo)
+        if classification == "background":
+            parent = image_node.getparent()
+            if parent is not None:
+                parent.remove(image_node)
+            continue
+        if classification == "decorative":
+            _handle_decorative_image(image_node, shared, media)
+            continue
+        if not image.labelled:
+            logger.warning(
+                "Skipping media asset for %s because it lacks caption or label", original
+            )
+            _remove_image_node(image_node)
+            continue
+
+        suffix = Path(original).suffix or ".jpg"
+        current_index = figure_counter
+        new_filename = f"{chapter_code}f{current_index:02d}{suffix}"
+        data = media_fetcher(original) if media_fetcher else None
+        if data is None:
+            logger.warning("Missing media asset for %s; skipping", original)
+            _remove_image_node(image_node)
+            continue
+        else:
+            if payload_size(data) == 0:
+                logger.warning("Skipping media asset for %s because it is empty", original)
+                _remove_image_node(image_node)
+                continue
+            width, height, fmt, digest = _scan_media(data, suffix)
+            file_size = _format_file_size(payload_size(data))
+            if width and height and (width < 72 or height < 72):
+                logger.warning(
+                    "Low resolution image %s detected (%dx%d)", original, width, height
+                )
+        alt_text = image.alt_text
+        if not alt_text:
+            logger.warning("Missing alt text for image %s", original)
+        placeholder_caption = f"Figure {chapter_label}.{current_index:02d} (Unlabeled)"
+        entry = ImageMetadata(
+            filename=new_filename,
+            original_filename=Path(original).name or original,
+            chapter=chapter_label,
+            figure_number=str(current_index),
+            caption=placeholder_caption,
+            alt_text=alt_text,
+            referenced_in_text=False,
+            width=width,
+            height=height,
+            file_size=file_size,
+            format=fmt,
+            sha256=digest,
+        )
+        metadata.append(entry)
+        media.append(
+            _MediaRef(image_node, f"{CHAPTERS_DIR}/{new_filename}", data, fmt, entry.sha256, entry)
+        )
+        figure_counter += 1
+
+    return _FragmentResult(fragment, media, metadata)
+
+
+def _map_ordered(
+    func: Callable[[_T], _R],
+    items: Iterable[_T],
+    pool: Optional[Executor],
+    window: int,
+) -> Iterator[_R]:
+    """Yield ``func(item)`` in input order, running it on *pool* if given.
+
+    At most *window* results are in flight so finished fragments do not pile
+    up in memory ahead of the ZIP writer.  *items* is consumed lazily, so the
+    output of one ``_map_ordered`` stage can feed the next.
+    """
+
+    if pool is None:
+        yield from map(func, items)
+        return
+    pending: Deque[Future] = deque()
+    try:
+        for item in items:
+            # Worker CPU time is charged to the stage that is packaging.
+            pending.append(pool.submit(contextvars.copy_context().run, charge_cpu, func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
 
 
 def package_docbook(
@@ -547,276 +1157,156 @@ def package_docbook(
     processing_instructions: Sequence[Tuple[str, str]] = (),
     assets: Sequence[Tuple[str, Path]] = (),
     media_fetcher: Optional[MediaFetcher] = None,
+    xml_compresslevel: int = DEFAULT_XML_COMPRESSLEVEL,
+    store_compressed_media: bool = True,
+    consume_root: bool = False,
+    workers: int = 1,
 ) -> Path:
-    """Package the DocBook tree into a chapterised ZIP bundle."""
+    """Package the DocBook tree into a chapterised ZIP bundle.
 
-    book_root, fragments = _split_root(root)
-    isbn = _extract_isbn(root)
-    base = _sanitise_basename(isbn or Path(out_path).stem or "book")
-    zip_path = Path(out_path).with_name(f"{base}.zip")
+    XML and other text entries are deflated at *xml_compresslevel*; JPEG, PNG
+    and GIF media are stored as-is unless *store_compressed_media* is False.
+    Pass *consume_root* when the caller is done with *root*: chapters are then
+    moved out of it instead of copied.  With *workers* > 1 fragments are
+    processed on a thread pool; the archive content does not depend on it.
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        tmp_path = Path(tmpdir)
-        book_path = tmp_path / "Book.xml"
+    Media is de-duplicated by SHA-256: identical images are stored once and
+    the metadata of every further reference names the stored copy.
 
-        media_dir = tmp_path / "media"
-        book_images_dir = media_dir / "Book_Images"
-        chapters_dir = book_images_dir / "Chapters"
-        shared_dir = book_images_dir / "Shared"
-        metadata_dir = book_images_dir / "Metadata"
-        chapters_dir.mkdir(parents=True, exist_ok=True)
-        shared_dir.mkdir(parents=True, exist_ok=True)
-        metadata_dir.mkdir(parents=True, exist_ok=True)
+    Entries are streamed in this order: shared images referenced from the
+    root document, ``Book.xml``, the media directories, then each fragment
+    preceded by the images it introduces, the metadata files and finally the
+    stylesheet assets.  Files are written ``rw-r--r--``.
+    """
 
-        asset_paths: List[Tuple[str, Path]] = []
-        for href, source in assets:
-            try:
-                data = Path(source).read_bytes()
-            except OSError as exc:
-                logger.warning("Failed to read stylesheet asset %s: %s", source, exc)
-                continue
-            target_path = (tmp_path / href).resolve()
-            try:
-                target_path.parent.mkdir(parents=True, exist_ok=True)
-            except OSError as exc:
-                logger.warning("Failed to create directory for stylesheet %s: %s", href, exc)
-                continue
-            target_path.write_bytes(data)
-            asset_paths.append((href, target_path))
-
-        chapter_paths: List[Tuple[ChapterFragment, Path]] = []
-        toc_fragment = next((fragment for fragment in fragments if fragment.kind == "toc"), None)
-        chapter_fragments = [fragment for fragment in fragments if fragment.kind == "chapter"]
-        if toc_fragment is not None:
-            _populate_toc_fragment(toc_fragment, chapter_fragments)
-        metadata_entries: List[ImageMetadata] = []
-        shared_cache: Dict[str, Path] = {}
-        for fragment in fragments:
-            chapter_path = tmp_path / fragment.filename
-            chapter_code, chapter_label = _chapter_code(fragment)
-            figure_counter = 1
-            processed_nodes: Set[int] = set()
-            for figure in fragment.element.findall(".//figure"):
-                caption_text = _extract_caption_text(figure)
-                images = list(_iter_imagedata(figure))
-                if not images:
-                    continue
-                if len(images) == 1:
-                    suffixes = [""]
-                else:
-                    suffixes = [
-                        string.ascii_lowercase[idx]
-                        if idx < len(string.ascii_lowercase)
-                        else f"_{idx}"
-                        for idx in range(len(images))
-                    ]
-                current_index = figure_counter
-                saved_any = False
-                for idx, image_node in enumerate(images):
-                    processed_nodes.add(id(image_node))
-                    original = image_node.get("fileref")
-                    if not original:
-                        continue
-                    classification = _classify_image(image_node, figure)
-                    if classification == "background":
-                        parent = image_node.getparent()
-                        if parent is not None:
-                            parent.remove(image_node)
-                        continue
-                    if classification == "decorative":
-                        _handle_decorative_image(image_node, shared_dir, shared_cache, media_fetcher)
-                        continue
-                    if not _has_caption_or_label(figure, image_node):
-                        logger.warning(
-                            "Skipping media asset for %s because it lacks caption or label", original
-                        )
-                        _remove_image_node(image_node)
-                        continue
-
-                    suffix = Path(original).suffix or ".jpg"
-                    letter = suffixes[idx]
-                    new_filename = f"{chapter_code}f{current_index:02d}{letter}{suffix}"
-                    target_path = chapters_dir / new_filename
-                    data = media_fetcher(original) if media_fetcher else None
-                    if data is None:
-                        logger.warning("Missing media asset for %s; skipping", original)
-                        _remove_image_node(image_node)
-                        continue
-                    else:
-                        if len(data) == 0:
-                            logger.warning("Skipping media asset for %s because it is empty", original)
-                            _remove_image_node(image_node)
-                            continue
-                        target_path.write_bytes(data)
-                        width, height, fmt = _inspect_image_bytes(data, suffix)
-                        file_size = _format_file_size(len(data))
-                        if width and height and (width < 72 or height < 72):
-                            logger.warning(
-                                "Low resolution image %s detected (%dx%d)", original, width, height
-                            )
-                    alt_text = _extract_alt_text(image_node)
-                    if not alt_text:
-                        logger.warning("Missing alt text for image %s", original)
-                    referenced = bool((figure.get("id") or "").strip())
-                    if not referenced and caption_text:
-                        if re.search(r"figure\s+\d", caption_text, re.IGNORECASE):
-                            referenced = True
-                    metadata_entries.append(
-                        ImageMetadata(
-                            filename=new_filename,
-                            original_filename=Path(original).name or original,
-                            chapter=chapter_label,
-                            figure_number=f"{current_index}{letter}",
-                            caption=caption_text or "",
-                            alt_text=alt_text,
-                            referenced_in_text=referenced,
-                            width=width,
-                            height=height,
-                            file_size=file_size,
-                            format=fmt,
-                        )
-                    )
-                    image_node.set(
-                        "fileref", f"media/Book_Images/Chapters/{new_filename}"
-                    )
-                    saved_any = True
-                if saved_any:
-                    figure_counter += 1
-
-            for image_node in _iter_imagedata(fragment.element):
-                if id(image_node) in processed_nodes:
-                    continue
-                original = image_node.get("fileref")
-                if not original:
-                    continue
-                classification = _classify_image(image_node, None)
-                if classification == "background":
-                    parent = image_node.getparent()
-                    if parent is not None:
-                        parent.remove(image_node)
-                    continue
-                if classification == "decorative":
-                    _handle_decorative_image(image_node, shared_dir, shared_cache, media_fetcher)
-                    continue
-                if not _has_caption_or_label(None, image_node):
-                    logger.warning(
-                        "Skipping media asset for %s because it lacks caption or label", original
-                    )
-                    _remove_image_node(image_node)
-                    continue
-
-                suffix = Path(original).suffix or ".jpg"
-                current_index = figure_counter
-                new_filename = f"{chapter_code}f{current_index:02d}{suffix}"
-                target_path = chapters_dir / new_filename
-                data = media_fetcher(original) if media_fetcher else None
-                if data is None:
-                    logger.warning("Missing media asset for %s; skipping", original)
-                    _remove_image_node(image_node)
-                    continue
-                else:
-                    if len(data) == 0:
-                        logger.warning("Skipping media asset for %s because it is empty", original)
-                        _remove_image_node(image_node)
-                        continue
-                    target_path.write_bytes(data)
-                    width, height, fmt = _inspect_image_bytes(data, suffix)
-                    file_size = _format_file_size(len(data))
-                    if width and height and (width < 72 or height < 72):
-                        logger.warning(
-                            "Low resolution image %s detected (%dx%d)", original, width, height
-                        )
-                alt_text = _extract_alt_text(image_node)
-                if not alt_text:
-                    logger.warning("Missing alt text for image %s", original)
-                placeholder_caption = f"Figure {chapter_label}.{current_index:02d} (Unlabeled)"
-                metadata_entries.append(
-                    ImageMetadata(
-                        filename=new_filename,
-                        original_filename=Path(original).name or original,
-                        chapter=chapter_label,
-                        figure_number=str(current_index),
-                        caption=placeholder_caption,
-                        alt_text=alt_text,
-                        referenced_in_text=False,
-                        width=width,
-                        height=height,
-                        file_size=file_size,
-                        format=fmt,
-                    )
-                )
-                image_node.set("fileref", f"media/Book_Images/Chapters/{new_filename}")
-                figure_counter += 1
-
-            _write_fragment_xml(
-                chapter_path,
-                fragment.element,
-                dtd_system,
-                processing_instructions=processing_instructions,
-            )
-            chapter_paths.append((fragment, chapter_path))
+    isbn = _extract_isbn(root)
+    book_root, fragments = _split_root(root, detach=consume_root)
+    base = _sanitise_basename(isbn or Path(out_path).stem or "book")
+    zip_path = Path(out_path).with_name(f"{base}.zip")
 
-        for image_node in _iter_imagedata(book_root):
+    toc_fragment = next((fragment for fragment in fragments if fragment.kind == "toc"), None)
+    chapter_fragments = [fragment for fragment in fragments if fragment.kind == "chapter"]
+    if toc_fragment is not None:
+        _populate_toc_fragment(toc_fragment, chapter_fragments)
+
+    zip_path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(
+        zip_path, "w", zipfile.ZIP_DEFLATED, compresslevel=xml_compresslevel
+    ) as zf:
+        writer = _PackageWriter(zf, store_compressed_media=store_compressed_media)
+        shared = _SharedMediaCache(media_fetcher)
+        store = _MediaStore()
+
+        # Root-level images only ever land in the shared directory, so they are
+        # resolved up front and Book.xml can be written before any fragment.
+        root_media: List[_MediaRef] = []
+        for image in _index_images(book_root).images:
+            image_node = image.node
             original = image_node.get("fileref")
             if not original:
                 continue
-            classification = _classify_image(image_node, None)
+            classification = _classify_image(image_node, None, image.in_bookinfo)
             if classification == "background":
                 parent = image_node.getparent()
                 if parent is not None:
                     parent.remove(image_node)
                 continue
-            if classification == "decorative":
-                _handle_decorative_image(image_node, shared_dir, shared_cache, media_fetcher)
-            else:
+            if classification != "decorative":
                 logger.warning(
                     "Unexpected content image in root document: %s; treating as decorative",
                     original,
                 )
-                _handle_decorative_image(image_node, shared_dir, shared_cache, media_fetcher)
-
-        _write_metadata_files(metadata_dir, metadata_entries)
-        _write_book_xml(
-            book_path,
+            _handle_decorative_image(image_node, shared, root_media)
+        for ref in root_media:
+            if store.place(ref):
+                writer.write_media(ref.arcname, ref.payload, ref.fmt)
+
+        writer.write_xml(
+            "Book.xml",
+            _book_xml_header(
+                root_name,
+                dtd_system,
+                fragments,
+                processing_instructions=processing_instructions,
+            ),
             book_root,
-            root_name,
-            dtd_system,
-            fragments,
-            processing_instructions=processing_instructions,
         )
+        for directory in [MEDIA_DIR, BOOK_IMAGES_DIR, CHAPTERS_DIR, SHARED_DIR, METADATA_DIR]:
+            writer.directory(directory + "/")
+
+        # Fragments flow through three stages: media is fetched and hashed on
+        # the pool, archive names are assigned here in fragment order, then
+        # the rewritten fragment is serialised back on the pool.  A single
+        # worker skips the pool and streams each fragment straight into the
+        # archive.
+        pool = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="package")
+            if workers > 1
+            else None
+        )
+        window = 2 * max(workers, 1)
+
+        def resolve(fragment: ChapterFragment) -> _FragmentResult:
+            return _process_fragment(fragment, media_fetcher, shared)
+
+        def place(results: Iterable[_FragmentResult]) -> Iterator[_FragmentResult]:
+            for result in results:
+                result.media = [ref for ref in result.media if store.place(ref)]
+                yield result
+
+        def serialise(result: _FragmentResult) -> _FragmentResult:
+            if pool is not None:
+                result.xml = _fragment_xml_header(
+                    result.fragment.element,
+                    dtd_system,
+                    processing_instructions=processing_instructions,
+                ).encode("utf-8") + etree.tostring(
+                    result.fragment.element,
+                    encoding="UTF-8",
+                    pretty_print=True,
+                    xml_declaration=False,
+                )
+            return result
 
-        zip_path.parent.mkdir(parents=True, exist_ok=True)
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-            zf.write(book_path, "Book.xml")
-            for fragment, chapter_path in chapter_paths:
-                zf.write(chapter_path, fragment.filename)
-            for directory in [media_dir, book_images_dir, chapters_dir, shared_dir, metadata_dir]:
-                zf.writestr(str(directory.relative_to(tmp_path)).rstrip("/") + "/", "")
-            for media_file in sorted(media_dir.rglob("*")):
-                if media_file.is_dir():
-                    continue
-                rel_path = media_file.relative_to(tmp_path)
-                zf.write(media_file, str(rel_path))
-            for href, asset_path in asset_paths:
-                arcname = Path(href).as_posix()
-                zf.write(asset_path, arcname)
-
-    return zip_path
+        metadata_entries: List[ImageMetadata] = []
+        try:
+            resolved = _map_ordered(resolve, fragments, pool, window)
+            for result in _map_ordered(serialise, place(resolved), pool, window):
+                for ref in result.media:
+                    writer.write_media(ref.arcname, ref.payload, ref.fmt)
+                if result.xml is not None:
+                    writer.write_bytes(result.fragment.filename, result.xml)
+                else:
+                    writer.write_xml(
+                        result.fragment.filename,
+                        _fragment_xml_header(
+                            result.fragment.element,
+                            dtd_system,
+                            processing_instructions=processing_instructions,
+                        ),
+                        result.fragment.element,
+                    )
+                metadata_entries.extend(result.metadata)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
 
+        _write_metadata_files(writer, metadata_entries)
+        for href, source in assets:
+            try:
+                writer.write_file(Path(href).as_posix(), Path(source))
+            except OSError as exc:
+                logger.warning("Failed to read stylesheet asset %s: %s", source, exc)
 
-def make_file_fetcher(search_paths: Sequence[Path]) -> MediaFetcher:
-    paths = [Path(p) for p in search_paths]
+    return zip_path
 
-    def _fetch(name: str) -> Optional[bytes]:
-        candidates = [Path(name)] if Path(name).is_absolute() else []
-        for base in paths:
-            candidates.append(base / name)
-        for candidate in candidates:
-            if candidate.exists():
-                try:
-                    return candidate.read_bytes()
-                except OSError as exc:
-                    logger.warning("Failed reading media %s: %s", candidate, exc)
-        return None
 
-    return _fetch
+def make_file_fetcher(
+    search_paths: Sequence[Path],
+    *,
+    cache_bytes: int = 64 * 1024 * 1024,
+    stream_threshold: int = 4 * 1024 * 1024,
+) -> FileMediaFetcher:
+    return FileMediaFetcher(
+        search_paths, cache_bytes=cache_bytes, stream_threshold=stream_threshold
+    )
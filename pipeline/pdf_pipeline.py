@@ -2,17 +2,16 @@ from __future__ import annotations
 
 import logging
 import tempfile
+from concurrent.futures import Executor
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Sequence, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from lxml import etree
 
 from .common import PageText, checksum, load_mapping, normalize_text
-from .extractors.pdfminer_text import pdfminer_pages
-from .extractors.poppler_pdfxml import pdftohtml_xml
-from .extractors.poppler_text import pdftotext_pages
-from .ocr.ocrmypdf_runner import ocr_pages
-from .package import make_file_fetcher, package_docbook
+from .instrumentation import ProgressCallback, StageRecorder
+from .steps import Steps, arun_steps, cpu_step, run_steps, tool_step
 from .structure.classifier import classify_blocks
 from .structure.docbook import build_docbook_tree
 from .structure.heuristics import label_blocks
@@ -79,16 +78,70 @@ def _write_docbook(
     out_path.write_text(header + xml_bytes.decode("utf-8"), encoding="utf-8")
 
 
-def convert_pdf(
+def _classify(blocks: List[Dict], classifier_cfg: Dict) -> List[Dict]:
+    if classifier_cfg.get("enabled"):
+        return classify_blocks(
+            blocks,
+            threshold=classifier_cfg.get("threshold", 0.85),
+            abstain_label=classifier_cfg.get("abstain_label", "abstain"),
+        )
+    return [
+        {
+            **block,
+            "classifier_label": block.get("label", "para"),
+            "classifier_confidence": 1.0,
+        }
+        for block in blocks
+    ]
+
+
+def _page_metrics(pages: List[PageText]) -> Dict:
+    post_pages = [
+        PageText(
+            page_num=page.page_num,
+            raw_text=page.norm_text,
+            norm_text=page.norm_text,
+            checksum=page.checksum,
+            has_ocr=page.has_ocr,
+        )
+        for page in pages
+    ]
+    return compute_metrics(pages, post_pages)
+
+
+def load_pdf_steps() -> None:
+    """Import the modules :func:`_pdf_steps` loads on first use, pdfminer included.
+
+    Long-running processes call this up front so the first conversion does
+    not pay for the imports.
+    """
+
+    from . import package  # noqa: F401
+    from .extractors import poppler_pdfxml, poppler_text  # noqa: F401
+    from .extractors.pdfminer_text import load_pdfminer
+    from .ocr import ocrmypdf_runner  # noqa: F401
+
+    load_pdfminer()
+
+
+def _pdf_steps(
     pdf_path: str,
     out_path: str,
     publisher: str,
     *,
-    config_dir: str = "config",
-    ocr_on_image_only: bool = False,
-    strict: bool = False,
-    catalog: str = "validation/catalog.xml",
-) -> Dict:
+    config_dir: str,
+    ocr_on_image_only: bool,
+    strict: bool,
+    recorder: StageRecorder,
+) -> Steps[Dict]:
+    # The extractors, OCR runner and packager are only needed once a PDF is
+    # converted; importing them here keeps them out of the CLI start-up path.
+    from .extractors.pdfminer_text import pdfminer_pages
+    from .extractors.poppler_pdfxml import pdftohtml_xml, pdftohtml_xml_async
+    from .extractors.poppler_text import pdftotext_pages, pdftotext_pages_async
+    from .ocr.ocrmypdf_runner import ocr_pages, ocr_pages_async
+    from .package import DEFAULT_XML_COMPRESSLEVEL, count_images, make_file_fetcher, package_docbook
+
     config = load_mapping(Path(config_dir), publisher)
     tolerances = config.get("tolerances", {})
     pdf_path_obj = Path(pdf_path)
@@ -99,92 +152,160 @@ def convert_pdf(
         tmp = Path(tmpdir)
         working_pdf = pdf_path_obj
 
-        poppler_pages = pdftotext_pages(str(working_pdf))
-        pdfminer_pages_list = pdfminer_pages(str(working_pdf))
-        _normalize_pages(poppler_pages, config)
-        _normalize_pages(pdfminer_pages_list, config)
+        with recorder.stage("pdftotext") as stage:
+            poppler_pages = yield tool_step(pdftotext_pages, pdftotext_pages_async, str(working_pdf))
+            stage.items["pages"] = len(poppler_pages)
+        with recorder.stage("pdfminer") as stage:
+            pdfminer_pages_list = yield cpu_step(pdfminer_pages, str(working_pdf))
+            stage.items["pages"] = len(pdfminer_pages_list)
+        with recorder.stage("normalize") as stage:
+            yield cpu_step(_normalize_pages, poppler_pages, config)
+            yield cpu_step(_normalize_pages, pdfminer_pages_list, config)
+            stage.items["pages"] = len(poppler_pages) + len(pdfminer_pages_list)
 
         mismatches = _detect_mismatches(poppler_pages, pdfminer_pages_list, tolerances)
         image_pages = _image_only_pages(poppler_pages, pdfminer_pages_list)
 
         if ocr_on_image_only and image_pages:
-            ocr_pdf_path = tmp / "ocr.pdf"
-            working_pdf = Path(ocr_pages(str(working_pdf), image_pages, str(ocr_pdf_path)))
-            poppler_pages = pdftotext_pages(str(working_pdf))
-            pdfminer_pages_list = pdfminer_pages(str(working_pdf))
-            _normalize_pages(poppler_pages, config)
-            _normalize_pages(pdfminer_pages_list, config)
-            for page in poppler_pages:
-                if page.page_num in image_pages:
-                    page.has_ocr = True
+            with recorder.stage("ocr") as stage:
+                ocr_pdf_path = tmp / "ocr.pdf"
+                working_pdf = Path(
+                    (yield tool_step(ocr_pages, ocr_pages_async, str(working_pdf), image_pages, str(ocr_pdf_path)))
+                )
+                poppler_pages = yield tool_step(pdftotext_pages, pdftotext_pages_async, str(working_pdf))
+                pdfminer_pages_list = yield cpu_step(pdfminer_pages, str(working_pdf))
+                yield cpu_step(_normalize_pages, poppler_pages, config)
+                yield cpu_step(_normalize_pages, pdfminer_pages_list, config)
+                for page in poppler_pages:
+                    if page.page_num in image_pages:
+                        page.has_ocr = True
+                stage.items["pages"] = len(image_pages)
 
         if strict and mismatches:
             raise ValueError(f"Extractor mismatch on pages: {mismatches}")
 
         pdfxml_path = tmp / "pdfxml.xml"
-        pdftohtml_xml(str(working_pdf), str(pdfxml_path))
-
-        blocks = label_blocks(str(pdfxml_path), config)
-        classifier_cfg = config.get("classifier", {})
-        if classifier_cfg.get("enabled"):
-            blocks = classify_blocks(
-                blocks,
-                threshold=classifier_cfg.get("threshold", 0.85),
-                abstain_label=classifier_cfg.get("abstain_label", "abstain"),
-            )
-        else:
-            blocks = [
-                {
-                    **block,
-                    "classifier_label": block.get("label", "para"),
-                    "classifier_confidence": 1.0,
-                }
-                for block in blocks
-            ]
+        with recorder.stage("pdftohtml"):
+            yield tool_step(pdftohtml_xml, pdftohtml_xml_async, str(working_pdf), str(pdfxml_path))
+
+        with recorder.stage("label_blocks") as stage:
+            blocks = yield cpu_step(label_blocks, str(pdfxml_path), config)
+            stage.items["blocks"] = len(blocks)
+        with recorder.stage("classify") as stage:
+            blocks = yield cpu_step(_classify, blocks, config.get("classifier", {}))
+            stage.items["blocks"] = len(blocks)
 
         root_name = config.get("docbook", {}).get("root", "book")
-        docbook_tree = build_docbook_tree(blocks, root_name)
-        rittdoc: RittDocTransformResult = transform_docbook_to_rittdoc(docbook_tree)
-        rittdoc_tree = etree.ElementTree(rittdoc.root)
+        with recorder.stage("build_docbook") as stage:
+            docbook_tree = yield cpu_step(build_docbook_tree, blocks, root_name)
+            stage.items["blocks"] = len(blocks)
+        with recorder.stage("transform"):
+            rittdoc: RittDocTransformResult = yield cpu_step(transform_docbook_to_rittdoc, docbook_tree)
+            rittdoc_tree = etree.ElementTree(rittdoc.root)
 
         tmp_doc = tmp / "full_book.xml"
         dtd_system = config.get("docbook", {}).get(
             "dtd_system", "RITTDOCdtd/v1.1/RittDocBook.dtd"
         )
-        _write_docbook(
-            rittdoc_tree,
-            root_name,
-            dtd_system,
-            tmp_doc,
-            processing_instructions=rittdoc.processing_instructions,
-        )
+        with recorder.stage("write_docbook"):
+            yield cpu_step(
+                partial(_write_docbook, processing_instructions=rittdoc.processing_instructions),
+                rittdoc_tree,
+                root_name,
+                dtd_system,
+                tmp_doc,
+            )
 
         # Temporarily skip DTD validation to inspect raw conversion output.
         # validate_dtd(str(tmp_doc), dtd_system, catalog)
 
-        media_fetcher = make_file_fetcher([tmp, pdf_path_obj.parent])
-        zip_path = package_docbook(
-            rittdoc.root,
-            root_name,
-            dtd_system,
-            out_path,
-            processing_instructions=rittdoc.processing_instructions,
-            assets=rittdoc.assets,
-            media_fetcher=media_fetcher,
+        packaging_cfg = config.get("packaging", {})
+        media_fetcher = make_file_fetcher(
+            [tmp, pdf_path_obj.parent],
+            cache_bytes=int(packaging_cfg.get("media_cache_mb", 64) * 1024 * 1024),
+            stream_threshold=int(packaging_cfg.get("media_stream_threshold_mb", 4) * 1024 * 1024),
         )
-
-        post_pages = [
-            PageText(
-                page_num=page.page_num,
-                raw_text=page.norm_text,
-                norm_text=page.norm_text,
-                checksum=page.checksum,
-                has_ocr=page.has_ocr,
+        with recorder.stage("package") as stage:
+            stage.items["images"] = count_images(rittdoc.root)
+            zip_path = yield cpu_step(
+                partial(
+                    package_docbook,
+                    processing_instructions=rittdoc.processing_instructions,
+                    assets=rittdoc.assets,
+                    media_fetcher=media_fetcher,
+                    xml_compresslevel=packaging_cfg.get("xml_compresslevel", DEFAULT_XML_COMPRESSLEVEL),
+                    store_compressed_media=packaging_cfg.get("store_compressed_media", True),
+                    workers=packaging_cfg.get("workers", 1),
+                    consume_root=True,
+                ),
+                rittdoc.root,
+                root_name,
+                dtd_system,
+                out_path,
             )
-            for page in poppler_pages
-        ]
-        metrics = compute_metrics(poppler_pages, post_pages)
+
+        with recorder.stage("metrics") as stage:
+            metrics = yield cpu_step(_page_metrics, poppler_pages)
+            stage.items["pages"] = len(poppler_pages)
         metrics["mismatches"] = mismatches
         metrics["image_only_pages"] = image_pages
         metrics["output_path"] = str(zip_path)
+        metrics["media_fetch"] = media_fetcher.stats()
+        metrics["stages"] = recorder.as_metrics()
         return metrics
+
+
+def convert_pdf(
+    pdf_path: str,
+    out_path: str,
+    publisher: str,
+    *,
+    config_dir: str = "config",
+    ocr_on_image_only: bool = False,
+    strict: bool = False,
+    catalog: str = "validation/catalog.xml",
+    recorder: Optional[StageRecorder] = None,
+) -> Dict:
+    return run_steps(
+        _pdf_steps(
+            pdf_path,
+            out_path,
+            publisher,
+            config_dir=config_dir,
+            ocr_on_image_only=ocr_on_image_only,
+            strict=strict,
+            recorder=recorder if recorder is not None else StageRecorder(pdf_path),
+        )
+    )
+
+
+async def convert_pdf_async(
+    pdf_path: str,
+    out_path: str,
+    publisher: str,
+    *,
+    config_dir: str = "config",
+    ocr_on_image_only: bool = False,
+    strict: bool = False,
+    executor: Optional[Executor] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict:
+    """Asynchronous :func:`convert_pdf` for running many conversions on one event loop.
+
+    Poppler and OCRmyPDF run as asyncio subprocesses; the other stages run
+    on *executor* (see :func:`pipeline.steps.arun_steps`).  *progress* is
+    called on the event loop as each stage starts and finishes.
+    """
+
+    return await arun_steps(
+        _pdf_steps(
+            pdf_path,
+            out_path,
+            publisher,
+            config_dir=config_dir,
+            ocr_on_image_only=ocr_on_image_only,
+            strict=strict,
+            recorder=StageRecorder(pdf_path, progress=progress, thread_cpu=False),
+        ),
+        executor=executor,
+    )
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import cProfile
+import logging
+import pstats
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+_Func = Tuple[str, int, str]
+_MAX_STACK_DEPTH = 64
+
+
+def _frame_name(func: _Func) -> str:
+    filename, line, name = func
+    if filename == "~":  # built-ins are reported as ("~", 0, "<built-in ...>")
+        return name
+    return f"{name} ({Path(filename).name}:{line})"
+
+
+class _RawStats:
+    # pstats.Stats accepts any object with ``create_stats()`` and ``stats``.
+    def __init__(self, stats: Dict) -> None:
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+class StageProfiler:
+    """Deterministic cProfile capture per pipeline stage.
+
+    Stages of the same name are merged, so one profiler shared by several
+    conversions (e.g. a batch run) aggregates them all.  Only the thread
+    that runs the stage is profiled; packaging worker threads are not.
+    """
+
+    def __init__(self) -> None:
+        self._stats: Dict[str, pstats.Stats] = {}
+
+    @contextmanager
+    def profile(self, stage: str) -> Iterator[None]:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._add(stage, profile)
+
+    @property
+    def stages(self) -> List[str]:
+        return list(self._stats)
+
+    def _add(self, stage: str, profile: Union[cProfile.Profile, "_RawStats"]) -> None:
+        existing = self._stats.get(stage)
+        if existing is None:
+            self._stats[stage] = pstats.Stats(profile)
+        else:
+            existing.add(profile)
+
+    def export(self) -> Dict[str, Dict]:
+        """Return the raw per-stage statistics in a picklable form."""
+
+        return {stage: stats.stats for stage, stats in self._stats.items()}  # type: ignore[attr-defined]
+
+    def merge(self, exported: Dict[str, Dict]) -> None:
+        """Add statistics from :meth:`export`, e.g. from a worker process."""
+
+        for stage, raw in exported.items():
+            self._add(stage, _RawStats(raw))
+
+    def combined(self) -> Optional[pstats.Stats]:
+        if not self._stats:
+            return None
+        combined = pstats.Stats()
+        for stats in self._stats.values():
+            combined.add(stats)
+        return combined
+
+    def write(self, directory: Path, prefix: str) -> List[Path]:
+        """Write ``<prefix>_profile.pstats`` and ``<prefix>_profile.folded``.
+
+        The ``.folded`` file holds collapsed stacks (``stage;frame;frame N``
+        with N in microseconds) for flamegraph.pl, speedscope and similar.
+        """
+
+        combined = self.combined()
+        if combined is None:
+            return []
+        directory.mkdir(parents=True, exist_ok=True)
+        pstats_path = directory / f"{prefix}_profile.pstats"
+        folded_path = directory / f"{prefix}_profile.folded"
+        combined.dump_stats(str(pstats_path))
+        with folded_path.open("w", encoding="utf-8") as handle:
+            for stage, stats in self._stats.items():
+                for stack, micros in collapse_stacks(stats):
+                    handle.write(f"{';'.join([stage, *stack])} {micros}\n")
+        logger.info("Wrote profile to %s and %s", pstats_path, folded_path)
+        return [pstats_path, folded_path]
+
+
+def collapse_stacks(stats: pstats.Stats) -> Iterator[Tuple[List[str], int]]:
+    """Approximate collapsed stacks from a cProfile caller graph.
+
+    cProfile records caller/callee edges rather than whole stacks, so each
+    function's time is split across its callers in proportion to the time
+    spent through each edge.  Recursive cycles are cut at the first repeat.
+    """
+
+    raw = stats.stats  # type: ignore[attr-defined]
+    callees: Dict[_Func, List[_Func]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller in callers:
+            callees.setdefault(caller, []).append(func)
+
+    def walk(
+        func: _Func, path: List[_Func], self_time: float, total_time: float
+    ) -> Iterator[Tuple[List[str], int]]:
+        micros = int(round(self_time * 1_000_000))
+        names = [_frame_name(frame) for frame in path]
+        if micros > 0:
+            yield names, micros
+        if len(path) >= _MAX_STACK_DEPTH:
+            return
+        func_total = raw[func][3]
+        share = total_time / func_total if func_total else 0.0
+        for callee in callees.get(func, ()):
+            if callee in path:
+                continue
+            _, _, edge_tt, edge_ct = raw[callee][4][func][:4]
+            yield from walk(callee, path + [callee], edge_tt * share, edge_ct * share)
+
+    for func, (_, _, tt, ct, callers) in raw.items():
+        if not callers:
+            yield from walk(func, [func], tt, ct)
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import csv
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = Path(__file__).resolve().parents[1] / "reports" / "templates"
+TEMPLATE_NAME = "qa_report.html.j2"
+BATCH_TEMPLATE_NAME = "batch_report.html.j2"
+
+PAGE_COLUMNS = [
+    "file",
+    "page",
+    "chars_in",
+    "chars_out",
+    "words_in",
+    "words_out",
+    "checksum_in",
+    "checksum_out",
+    "flags",
+    "has_ocr",
+    "status",
+]
+STAGE_COLUMNS = ["file", "stage", "wall_s", "cpu_s", "queue_wait_s", "peak_rss_delta_kb", "items"]
+
+
+def format_stage_items(stage: Dict) -> str:
+    return ";".join(f"{name}={count}" for name, count in sorted(stage.get("items", {}).items()))
+
+
+def _page_row(source: str, page: Dict) -> List:
+    flags = page.get("flags", [])
+    return [
+        source,
+        page["page"],
+        page["chars_in"],
+        page["chars_out"],
+        page["words_in"],
+        page["words_out"],
+        page["checksum_in"],
+        page["checksum_out"],
+        ";".join(flags),
+        "yes" if page.get("has_ocr") else "no",
+        "discrepancy" if flags else "ok",
+    ]
+
+
+def _stage_view(stage: Dict) -> Dict[str, str]:
+    return {
+        "stage": stage["stage"],
+        "wall_s": f"{stage['wall_s']:.3f}",
+        "cpu_s": f"{stage['cpu_s']:.3f}",
+        "queue_wait_s": f"{stage.get('queue_wait_s', 0.0):.3f}",
+        "peak_rss_delta_kb": str(stage["peak_rss_delta_kb"]),
+        "items": format_stage_items(stage),
+    }
+
+
+@lru_cache(maxsize=None)
+def _load_template(name: str = TEMPLATE_NAME):
+    """Return the Jinja2 report template *name* from :data:`TEMPLATE_DIR`."""
+
+    try:
+        import jinja2
+    except ImportError as exc:
+        raise ImportError(
+            "QA reports need Jinja2. Install it via `pip install -r tools/requirements.txt`."
+        ) from exc
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(TEMPLATE_DIR)),
+        autoescape=True,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=True,
+    )
+    return env.get_template(name)
+
+
+def render_html(source: str, pages: Iterable[Dict], stages: Sequence[Dict] = ()) -> Iterator[str]:
+    """Yield the HTML QA report in chunks, pulling *pages* lazily.
+
+    Renders ``reports/templates/qa_report.html.j2`` through Jinja2's
+    streaming ``Template.generate``.
+    """
+
+    stage_rows = [_stage_view(stage) for stage in stages]
+    return _load_template().generate(source=source, pages=pages, stages=stage_rows)
+
+
+def write_reports(
+    pages: Iterable[Dict], source: str, report_dir: Path, *, stages: Sequence[Dict] = ()
+) -> Dict[str, Path]:
+    """Write ``<stem>_qa.csv``, ``<stem>_qa.html`` and ``<stem>_stages.csv``.
+
+    *pages* is iterated once and may be a generator, such as
+    :func:`~pipeline.validators.counters.iter_page_metrics`.  Each page's CSV
+    row and HTML row are written as it is produced, so memory use does not
+    grow with the page count.
+    """
+
+    report_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(source).stem
+    paths = {"csv": report_dir / f"{stem}_qa.csv", "html": report_dir / f"{stem}_qa.html"}
+
+    with paths["csv"].open("w", newline="", encoding="utf-8") as csv_file, paths["html"].open(
+        "w", encoding="utf-8"
+    ) as html_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(PAGE_COLUMNS)
+
+        def pages_with_csv() -> Iterator[Dict]:
+            for page in pages:
+                writer.writerow(_page_row(source, page))
+                yield page
+
+        for chunk in render_html(source, pages_with_csv(), stages):
+            html_file.write(chunk)
+
+    if stages:
+        paths["stages"] = report_dir / f"{stem}_stages.csv"
+        with paths["stages"].open("w", newline="", encoding="utf-8") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(STAGE_COLUMNS)
+            for stage in stages:
+                view = _stage_view(stage)
+                writer.writerow(
+                    [
+                        source,
+                        view["stage"],
+                        view["wall_s"],
+                        view["cpu_s"],
+                        view["queue_wait_s"],
+                        stage["peak_rss_delta_kb"],
+                        view["items"],
+                    ]
+                )
+    logger.debug("Wrote QA reports for %s to %s", source, report_dir)
+    return paths
+
+
+@dataclass
+class JobSummary:
+    """One row of the batch dashboard."""
+
+    source: str
+    job_type: str
+    status: str
+    wall_s: float
+    pages: int = 0
+    flagged_pages: int = 0
+    mismatch_pages: int = 0
+    ocr_pages: int = 0
+    error: str = ""
+    estimate_s: Optional[float] = None
+
+    @classmethod
+    def from_metrics(cls, source: str, job_type: str, metrics: Dict, wall_s: float) -> "JobSummary":
+        # Extractor disagreements (PDF) and pages whose output text differs.
+        mismatched = set(metrics.get("mismatches", []))
+        summary = cls(source, job_type, "ok", wall_s)
+        # One pass over the page rows.
+        for page in metrics.get("pages", []):
+            flags = page.get("flags", [])
+            summary.pages += 1
+            summary.flagged_pages += bool(flags)
+            summary.ocr_pages += bool(page.get("has_ocr"))
+            if {"text_mismatch", "missing_output_page"}.intersection(flags):
+                mismatched.add(page["page"])
+        summary.mismatch_pages = len(mismatched)
+        return summary
+
+    @classmethod
+    def failed(cls, source: str, job_type: str, wall_s: float, error: BaseException) -> "JobSummary":
+        return cls(source, job_type, "failed", wall_s, error=f"{type(error).__name__}: {error}")
+
+    @property
+    def pages_per_s(self) -> float:
+        return self.pages / self.wall_s if self.wall_s > 0 else 0.0
+
+    @property
+    def mismatch_rate(self) -> float:
+        return self.mismatch_pages / self.pages if self.pages else 0.0
+
+    def row(self) -> List[str]:
+        return [
+            self.source,
+            self.job_type,
+            self.status,
+            f"{self.wall_s:.3f}",
+            "" if self.estimate_s is None else f"{self.estimate_s:.3f}",
+            str(self.pages),
+            f"{self.pages_per_s:.2f}",
+            str(self.flagged_pages),
+            str(self.mismatch_pages),
+            f"{self.mismatch_rate:.4f}",
+            str(self.ocr_pages),
+            self.error,
+        ]
+
+
+BATCH_COLUMNS = [
+    "file",
+    "type",
+    "status",
+    "wall_s",
+    "estimate_s",
+    "pages",
+    "pages_per_s",
+    "flagged_pages",
+    "mismatch_pages",
+    "mismatch_rate",
+    "ocr_pages",
+    "error",
+]
+# Seconds between reloads of the dashboard while the batch is still running.
+BATCH_REFRESH_S = 30
+
+
+class BatchReport:
+    """Consolidated QA dashboard for a batch run, rewritten as jobs finish.
+
+    ``<name>_batch.csv`` and ``<name>_batch.html`` list one row per finished
+    job, slowest first, under a running total.  Both files are replaced
+    atomically after every job, so they can be watched during a long run;
+    the HTML page reloads itself until :meth:`finish` is called.
+    """
+
+    def __init__(self, report_dir: Path, name: str, *, total_jobs: int) -> None:
+        self.report_dir = report_dir
+        self.total_jobs = total_jobs
+        self.jobs: List[JobSummary] = []
+        self.finished = False
+        self.paths = {"csv": report_dir / f"{name}_batch.csv", "html": report_dir / f"{name}_batch.html"}
+
+    def add(self, summary: JobSummary) -> None:
+        self.jobs.append(summary)
+        self.write()
+
+    def finish(self) -> Dict[str, Path]:
+        self.finished = True
+        self.write()
+        return self.paths
+
+    def ranked(self) -> List[JobSummary]:
+        return sorted(self.jobs, key=lambda job: job.wall_s, reverse=True)
+
+    def totals(self) -> Dict[str, float]:
+        # Skipped jobs were converted by an earlier run; their rows carry
+        # that run's figures.
+        done = [job for job in self.jobs if job.status != "failed"]
+        wall = sum(job.wall_s for job in self.jobs)
+        pages = sum(job.pages for job in done)
+        converting = sum(job.wall_s for job in done)
+        return {
+            "jobs": len(self.jobs),
+            "failed": len(self.jobs) - len(done),
+            "skipped": sum(1 for job in self.jobs if job.status == "skipped"),
+            "wall_s": wall,
+            "pages": pages,
+            "pages_per_s": pages / converting if converting > 0 else 0.0,
+            "flagged_pages": sum(job.flagged_pages for job in done),
+            "ocr_pages": sum(job.ocr_pages for job in done),
+            "estimate_error": _estimate_error(done),
+        }
+
+    def write(self) -> None:
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+        ranked = self.ranked()
+
+        def write_csv(fh) -> None:
+            writer = csv.writer(fh)
+            writer.writerow(BATCH_COLUMNS)
+            for job in ranked:
+                writer.writerow(job.row())
+
+        _replace_atomically(self.paths["csv"], write_csv, newline="")
+        _replace_atomically(self.paths["html"], lambda fh: fh.writelines(self._render_html(ranked)))
+
+    def _render_html(self, ranked: Sequence[JobSummary]) -> Iterator[str]:
+        return _load_template(BATCH_TEMPLATE_NAME).generate(
+            jobs=ranked,
+            totals=self.totals(),
+            total_jobs=self.total_jobs,
+            state="finished" if self.finished else "running",
+            refresh_s=None if self.finished else BATCH_REFRESH_S,
+        )
+
+
+def _estimate_error(jobs: Sequence[JobSummary]) -> float:
+    """Mean absolute error of the cost estimates, relative to the actual times."""
+
+    errors = [
+        abs(job.estimate_s - job.wall_s) / job.wall_s
+        for job in jobs
+        if job.status == "ok" and job.estimate_s is not None and job.wall_s > 0
+    ]
+    return sum(errors) / len(errors) if errors else 0.0
+
+
+def _replace_atomically(path: Path, write: Callable, **open_kwargs) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8", **open_kwargs) as fh:
+        write(fh)
+    os.replace(tmp_path, path)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Union
+
+from .common import load_mapping
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict], Dict]
+
+# Requests and responses are single JSON objects terminated by a newline.
+_ENCODING = "utf-8"
+
+
+class ServiceError(RuntimeError):
+    """Raised by :func:`submit` when the service reports a failed request."""
+
+
+def warm_up(config_dir: Union[str, Path], *, pdf: bool = True) -> Dict[str, float]:
+    """Load everything a conversion would otherwise pay for on first use.
+
+    Imports both pipelines, compiles their XSLT stylesheets and loads the
+    default and per-publisher mappings into the :func:`load_mapping` cache.
+    PDF support is skipped with a warning when pdfminer is not installed.
+    """
+
+    from time import perf_counter
+
+    from . import epub_pipeline
+    from .transform import rittdoc
+
+    timings: Dict[str, float] = {}
+    start = perf_counter()
+    epub_pipeline._load_transform()
+    rittdoc._load_transform()
+    timings["xslt"] = perf_counter() - start
+
+    if pdf:
+        start = perf_counter()
+        try:
+            from .pdf_pipeline import load_pdf_steps
+
+            load_pdf_steps()
+        except ImportError as exc:
+            logger.warning("PDF conversions unavailable in service: %s", exc)
+        timings["pdf_pipeline"] = perf_counter() - start
+
+    start = perf_counter()
+    config_path = Path(config_dir)
+    load_mapping(config_path)
+    for publisher in _publishers(config_path):
+        load_mapping(config_path, publisher)
+    timings["configs"] = perf_counter() - start
+    return timings
+
+
+def _publishers(config_dir: Path) -> Iterable[str]:
+    publishers_dir = config_dir / "publishers"
+    if not publishers_dir.is_dir():
+        return []
+    return sorted(path.stem for path in publishers_dir.glob("*.json"))
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: "ConversionServer"
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line.decode(_ENCODING))
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as exc:
+            self._reply({"ok": False, "error": f"Malformed request: {exc}"})
+            return
+
+        command = request.get("command")
+        if command == "ping":
+            self._reply({"ok": True, "pid": os.getpid(), "jobs": self.server.jobs_handled})
+            return
+        if command == "shutdown":
+            self._reply({"ok": True})
+            # shutdown() waits for serve_forever() to return, which cannot
+            # happen while this handler is still running on its thread.
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+
+        with self.server.job_lock:
+            self.server.jobs_handled += 1
+            try:
+                response = {"ok": True, **self.server.job_handler(request)}
+            except Exception as exc:  # noqa: BLE001 - reported to the client
+                logger.exception("Service job failed: %s", request)
+                response = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        self._reply(response)
+
+    def _reply(self, payload: Dict) -> None:
+        data = json.dumps(payload, default=str).encode(_ENCODING) + b"\n"
+        self.wfile.write(data)
+
+
+class ConversionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Long-lived conversion service listening on a Unix socket.
+
+    Each connection carries one JSON request and receives one JSON response.
+    ``ping`` and ``shutdown`` are answered directly and everything else goes
+    to *job_handler*.  Jobs run one at a time because conversions share the
+    process-wide caches.  Connections are still accepted while a job runs,
+    so a ``ping`` is answered even when the service is busy.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Union[str, Path], job_handler: JobHandler) -> None:
+        self.socket_path = Path(socket_path)
+        self.job_handler = job_handler
+        self.job_lock = threading.Lock()
+        self.jobs_handled = 0
+        _claim_socket_path(self.socket_path)
+        super().__init__(str(self.socket_path), _RequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _claim_socket_path(path: Path) -> None:
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except OSError:
+        logger.info("Removing stale service socket %s", path)
+        path.unlink()
+        return
+    finally:
+        probe.close()
+    raise ServiceError(f"A conversion service is already listening on {path}")
+
+
+def submit(socket_path: Union[str, Path], request: Dict, *, timeout: Optional[float] = None) -> Dict:
+    """Send *request* to the service at *socket_path* and return its response.
+
+    Raises :class:`ServiceError` when the service answers with ``ok: false``
+    and :class:`OSError` when it cannot be reached.
+    """
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        conn.connect(str(socket_path))
+        conn.sendall(json.dumps(request).encode(_ENCODING) + b"\n")
+        conn.shutdown(socket.SHUT_WR)
+        with conn.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise ServiceError("Conversion service closed the connection without a response")
+    response = json.loads(line.decode(_ENCODING))
+    if not response.get("ok"):
+        raise ServiceError(response.get("error", "Conversion service request failed"))
+    return response
+
+
+__all__ = ["ConversionServer", "ServiceError", "submit", "warm_up"]
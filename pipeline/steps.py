@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Awaitable, Callable, Generator, Optional, Tuple, TypeVar
+
+from .instrumentation import charge_cpu
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class Step:
+    """One unit of pipeline work, yielded by a step generator.
+
+    ``func`` runs the step synchronously.  Steps that only wait on an
+    external tool also carry ``async_func``, a coroutine function taking the
+    same arguments; steps without one are CPU work.
+    """
+
+    func: Callable[..., Any]
+    args: Tuple[Any, ...]
+    async_func: Optional[Callable[..., Awaitable[Any]]] = None
+
+
+Steps = Generator[Step, Any, T]
+
+
+def cpu_step(func: Callable[..., Any], *args: Any) -> Step:
+    return Step(func, args)
+
+
+def tool_step(func: Callable[..., Any], async_func: Callable[..., Awaitable[Any]], *args: Any) -> Step:
+    return Step(func, args, async_func)
+
+
+def run_steps(steps: Steps[T]) -> T:
+    """Run every step of *steps* in this thread and return the generator's result.
+
+    A failing step's exception is raised inside the generator, so its stage
+    records and temporary directories unwind as in straight-line code.
+    """
+
+    try:
+        step = next(steps)
+        while True:
+            try:
+                result = step.func(*step.args)
+            except BaseException as exc:
+                step = steps.throw(exc)
+            else:
+                step = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def arun_steps(steps: Steps[T], *, executor: Optional[Executor] = None) -> T:
+    """Drive *steps* from the event loop.
+
+    Tool steps await their ``async_func``; CPU steps run on *executor* (the
+    loop's default executor when ``None``).  Stage inputs are in-memory lxml
+    trees, so the executor has to be a thread pool.  Cancelling the task
+    kills a running tool at once; a running CPU step cannot be interrupted,
+    so cancellation waits for it and then unwinds the generator without
+    starting another step.
+    """
+
+    loop = asyncio.get_running_loop()
+    try:
+        step = next(steps)
+        while True:
+            try:
+                if step.async_func is not None:
+                    result = await step.async_func(*step.args)
+                else:
+                    # Run in a copy of this task's context so the step sees the
+                    # running stage, as it would on the synchronous path, and
+                    # charge the executor thread's CPU time to that stage.
+                    context = contextvars.copy_context()
+                    future = loop.run_in_executor(
+                        executor, partial(context.run, charge_cpu, step.func, *step.args)
+                    )
+                    try:
+                        result = await asyncio.shield(future)
+                    except asyncio.CancelledError:
+                        # Do not remove temporary files from under the thread.
+                        await asyncio.wait([future])
+                        raise
+            except BaseException as exc:
+                step = steps.throw(exc)
+            else:
+                step = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+
+__all__ = ["Step", "arun_steps", "cpu_step", "run_steps", "tool_step"]
@@ -326,13 +326,17 @@ def _should_merge(prev_line: Line, next_line: Line, body_size: float) -> bool:
     return True
 
 
-def _finalize_paragraph(lines: Sequence[Line]) -> dict:
-    text = "\n".join(line.text.strip() for line in lines).strip()
-    left = min(line.left for line in lines)
+def _lines_bbox(lines: Sequence[Line]) -> dict:
     top = lines[0].top
+    left = min(line.left for line in lines)
     right = max(line.right for line in lines)
     bottom = max(line.top + line.height for line in lines)
-    bbox = {"top": top, "left": left, "width": right - left, "height": bottom - top}
+    return {"top": top, "left": left, "width": right - left, "height": bottom - top}
+
+
+def _finalize_paragraph(lines: Sequence[Line]) -> dict:
+    text = "\n".join(line.text.strip() for line in lines).strip()
+    bbox = _lines_bbox(lines)
     font_size = max(line.font_size for line in lines if line.font_size)
     return {
         "label": "para",
@@ -446,7 +450,14 @@ def label_blocks(pdfxml_path: str, mapping: dict) -> List[dict]:
             )
         )
 
-    lines = [item["line"] for item in entries if item["kind"] == "line"]
+    lines: List[Line] = []
+    # line_index[i] is the position in ``lines`` of the first line at or
+    # after entries[i], so table detection can slice without rebuilding.
+    line_index: List[int] = []
+    for item in entries:
+        line_index.append(len(lines))
+        if item["kind"] == "line":
+            lines.append(item["line"])
     body_size = _body_font_size(lines)
     logger.debug("Estimated body font size: %.2f", body_size)
 
@@ -509,13 +520,10 @@ def label_blocks(pdfxml_path: str, mapping: dict) -> List[dict]:
             continue
 
         # Table detection works on the contiguous run of lines
-        remaining_lines = [item["line"] for item in entries[idx:] if item["kind"] == "line"]
-        if remaining_lines:
-            table_candidate = _extract_table(remaining_lines, 0)
-        else:
-            table_candidate = None
+        table_candidate = _extract_table(lines, line_index[idx])
         if table_candidate:
-            table_block, consumed = table_candidate
+            table_block, table_end = table_candidate
+            consumed = table_end - line_index[idx]
             if current_para:
                 blocks.append(_finalize_paragraph(current_para))
                 current_para = []
@@ -543,23 +551,12 @@ def label_blocks(pdfxml_path: str, mapping: dict) -> List[dict]:
                 for heading_line in heading_lines
                 if heading_line.text.strip()
             )
-            left = min(heading_line.left for heading_line in heading_lines)
-            right = max(heading_line.right for heading_line in heading_lines)
-            top = heading_lines[0].top
-            bottom = max(
-                heading_line.top + heading_line.height for heading_line in heading_lines
-            )
             blocks.append(
                 {
                     "label": "chapter",
                     "text": combined_text,
                     "page_num": heading_lines[0].page_num,
-                    "bbox": {
-                        "top": top,
-                        "left": left,
-                        "width": right - left,
-                        "height": bottom - top,
-                    },
+                    "bbox": _lines_bbox(heading_lines),
                     "font_size": max(
                         heading_line.font_size for heading_line in heading_lines if heading_line.font_size
                     ),
@@ -581,23 +578,12 @@ def label_blocks(pdfxml_path: str, mapping: dict) -> List[dict]:
                 for heading_line in heading_lines
                 if heading_line.text.strip()
             )
-            left = min(heading_line.left for heading_line in heading_lines)
-            right = max(heading_line.right for heading_line in heading_lines)
-            top = heading_lines[0].top
-            bottom = max(
-                heading_line.top + heading_line.height for heading_line in heading_lines
-            )
             blocks.append(
                 {
                     "label": "toc",
                     "text": combined_text,
                     "page_num": heading_lines[0].page_num,
-                    "bbox": {
-                        "top": top,
-                        "left": left,
-                        "width": right - left,
-                        "height": bottom - top,
-                    },
+                    "bbox": _lines_bbox(heading_lines),
                     "font_size": max(
                         heading_line.font_size
                         for heading_line in heading_lines
@@ -621,23 +607,12 @@ def label_blocks(pdfxml_path: str, mapping: dict) -> List[dict]:
                 for heading_line in heading_lines
                 if heading_line.text.strip()
             )
-            left = min(heading_line.left for heading_line in heading_lines)
-            right = max(heading_line.right for heading_line in heading_lines)
-            top = heading_lines[0].top
-            bottom = max(
-                heading_line.top + heading_line.height for heading_line in heading_lines
-            )
             blocks.append(
                 {
                     "label": "book_title",
                     "text": combined_text,
                     "page_num": heading_lines[0].page_num,
-                    "bbox": {
-                        "top": top,
-                        "left": left,
-                        "width": right - left,
-                        "height": bottom - top,
-                    },
+                    "bbox": _lines_bbox(heading_lines),
                     "font_size": max(
                         heading_line.font_size
                         for heading_line in heading_lines
@@ -699,16 +674,7 @@ def label_blocks(pdfxml_path: str, mapping: dict) -> List[dict]:
                         "label": "section",
                         "text": combined_text,
                         "page_num": heading_lines[0].page_num,
-                        "bbox": {
-                            "top": heading_lines[0].top,
-                            "left": min(heading_line.left for heading_line in heading_lines),
-                            "width": max(heading_line.right for heading_line in heading_lines)
-                            - min(heading_line.left for heading_line in heading_lines),
-                            "height": max(
-                                heading_line.top + heading_line.height for heading_line in heading_lines
-                            )
-                            - heading_lines[0].top,
-                        },
+                        "bbox": _lines_bbox(heading_lines),
                         "font_size": max(
                             heading_line.font_size for heading_line in heading_lines if heading_line.font_size
                         ),
@@ -717,21 +683,12 @@ def label_blocks(pdfxml_path: str, mapping: dict) -> List[dict]:
                 idx = lookahead_idx
                 continue
 
-            left = min(heading_line.left for heading_line in heading_lines)
-            right = max(heading_line.right for heading_line in heading_lines)
-            top = heading_lines[0].top
-            bottom = max(heading_line.top + heading_line.height for heading_line in heading_lines)
             blocks.append(
                 {
                     "label": "chapter",
                     "text": combined_text,
                     "page_num": heading_lines[0].page_num,
-                    "bbox": {
-                        "top": top,
-                        "left": left,
-                        "width": right - left,
-                        "height": bottom - top,
-                    },
+                    "bbox": _lines_bbox(heading_lines),
                     "font_size": max(heading_line.font_size for heading_line in heading_lines),
                 }
             )
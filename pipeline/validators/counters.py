@@ -1,60 +1,223 @@
 from __future__ import annotations
 
 import logging
+import re
 from collections import Counter
-from typing import Dict, List
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 from ..common import PageText
 
 logger = logging.getLogger(__name__)
 
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]")
+_NO_SPECIAL_CHARS: Counter = Counter()
 
-def _word_count(text: str) -> int:
-    return len([token for token in text.strip().split() if token])
 
+@dataclass(frozen=True)
+class _TextStats:
+    chars: int
+    words: int
+    special: Counter
 
-def _special_chars(text: str) -> Counter:
-    return Counter(ch for ch in text if ord(ch) > 127)
 
+def _text_stats(text: str) -> _TextStats:
+    # Each figure is one C-level scan; pure-ASCII text (the common case)
+    # skips the histogram entirely.
+    if text.isascii():
+        special = _NO_SPECIAL_CHARS
+    else:
+        special = Counter(_NON_ASCII_RE.findall(text))
+    return _TextStats(len(text), len(text.split()), special)
 
-def compute_metrics(pre: List[PageText], post: List[PageText]) -> Dict:
-    post_map = {p.page_num: p for p in post}
-    pages = []
-    overall_special = Counter()
-    overall_flags: List[str] = []
 
-    for page in pre:
-        target = post_map.get(page.page_num)
-        flags: List[str] = []
-        chars_in = len(page.norm_text)
-        words_in = _word_count(page.norm_text)
-        chars_out = len(target.norm_text) if target else 0
-        words_out = _word_count(target.norm_text) if target else 0
-        if target is None:
-            flags.append("missing_output_page")
-        else:
-            if page.norm_text != target.norm_text:
-                flags.append("text_mismatch")
-            if chars_in != chars_out:
-                flags.append("char_count_diff")
-        page_special_in = _special_chars(page.norm_text)
-        page_special_out = _special_chars(target.norm_text if target else "")
-        overall_special.update(page_special_in)
-        overall_special.update(page_special_out)
-        pages.append(
-            {
+# numpy only beats the regex scan on long pages where non-ASCII characters
+# are common (Greek, CJK, heavy diacritics); elsewhere its set-up dominates.
+NUMPY_MIN_CHARS = 2048
+_DENSITY_SAMPLE = 1024
+METRICS_BACKENDS = ("auto", "python", "numpy")
+
+
+@lru_cache(maxsize=1)
+def _numpy():
+    """Return the numpy module, or ``None`` when it is not installed.
+
+    Imported on first use so that pipelines which never see a large
+    non-ASCII page do not pay numpy's import time.
+    """
+
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+# Exactly the code points str.split() treats as separators (str.isspace()).
+_WHITESPACE_CODES = (
+    *range(0x09, 0x0E),  # tab, line feed, vertical tab, form feed, carriage return
+    *range(0x1C, 0x21),  # file/group/record/unit separators, space
+    0x85,
+    0xA0,
+    0x1680,
+    *range(0x2000, 0x200B),
+    0x2028,
+    0x2029,
+    0x202F,
+    0x205F,
+    0x3000,
+)
+
+
+@lru_cache(maxsize=1)
+def _whitespace_codes():
+    np = _numpy()
+    return np.array(_WHITESPACE_CODES, dtype=np.uint32)
+
+
+def _text_stats_numpy(text: str) -> _TextStats:
+    np = _numpy()
+    codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    in_word = ~np.isin(codes, _whitespace_codes())
+    # A word starts at every non-space character whose predecessor is a space.
+    words = int(np.count_nonzero(in_word[1:] & ~in_word[:-1])) + int(in_word[:1].sum())
+
+    special: Counter = _NO_SPECIAL_CHARS
+    non_ascii = codes[codes > 127]
+    if non_ascii.size:
+        values, first_seen, counts = np.unique(non_ascii, return_index=True, return_counts=True)
+        # Counter(findall) lists characters in order of first appearance.
+        order = np.argsort(first_seen, kind="stable")
+        special = Counter({chr(values[i]): int(counts[i]) for i in order})
+    return _TextStats(int(codes.size), words, special)
+
+
+def _dense_non_ascii(text: str) -> bool:
+    sample = text[:_DENSITY_SAMPLE]
+    # Every non-ASCII character takes at least one extra UTF-8 byte.
+    extra = len(sample.encode("utf-8", "surrogatepass")) - len(sample)
+    return extra * 8 >= len(sample)
+
+
+def _stats_function(backend: str, text: str):
+    if backend == "python" or text.isascii():
+        return _text_stats
+    if backend == "numpy":
+        return _text_stats_numpy
+    if len(text) >= NUMPY_MIN_CHARS and _dense_non_ascii(text):
+        return _text_stats_numpy
+    return _text_stats
+
+
+def _resolve_backend(backend: Optional[str]) -> str:
+    backend = backend or "auto"
+    if backend not in METRICS_BACKENDS:
+        raise ValueError(f"Unknown metrics backend {backend!r}; expected one of {METRICS_BACKENDS}")
+    if backend == "numpy" and _numpy() is None:
+        raise ValueError("The numpy metrics backend was requested but numpy is not installed")
+    if backend == "auto" and _numpy() is None:
+        return "python"
+    return backend
+
+
+# Pages are scanned in batches of this many; within a batch each distinct
+# text is counted once, which keeps the memo bounded on long books.
+BATCH_PAGES = 64
+
+
+def _same_text(page: PageText, target: PageText) -> bool:
+    # Both pipelines checksum norm_text already; compare the text itself only
+    # when a page came without one.
+    if page.checksum and target.checksum:
+        return page.checksum == target.checksum
+    return page.norm_text == target.norm_text
+
+
+def _batch_stats(texts: Iterable[str], backend: str) -> Dict[str, _TextStats]:
+    """Stats per distinct text, so repeated pages are not rescanned."""
+
+    stats: Dict[str, _TextStats] = {}
+    for text in texts:
+        if text not in stats:
+            stats[text] = _stats_function(backend, text)(text)
+    return stats
+
+
+def _page_rows(
+    pre: Sequence[PageText], post: Sequence[PageText], backend: str
+) -> Iterator[Tuple[Dict, _TextStats, _TextStats]]:
+    post_map = {p.page_num: p for p in post}
+    empty = _text_stats("")
+    for start in range(0, len(pre), BATCH_PAGES):
+        batch = []
+        for page in pre[start : start + BATCH_PAGES]:
+            target = post_map.get(page.page_num)
+            batch.append((page, target, target is not None and _same_text(page, target)))
+        # Unchanged output pages, the common case, reuse the input page's stats.
+        stats = _batch_stats(
+            [page.norm_text for page, _, _ in batch]
+            + [target.norm_text for _, target, same in batch if target is not None and not same],
+            backend,
+        )
+        for page, target, same in batch:
+            flags: List[str] = []
+            stats_in = stats[page.norm_text]
+            if target is None:
+                stats_out = empty
+                flags.append("missing_output_page")
+            else:
+                stats_out = stats_in if same else stats[target.norm_text]
+                if not same:
+                    flags.append("text_mismatch")
+                if stats_in.chars != stats_out.chars:
+                    flags.append("char_count_diff")
+            row = {
                 "page": page.page_num,
-                "chars_in": chars_in,
-                "chars_out": chars_out,
-                "words_in": words_in,
-                "words_out": words_out,
+                "chars_in": stats_in.chars,
+                "chars_out": stats_out.chars,
+                "words_in": stats_in.words,
+                "words_out": stats_out.words,
                 "checksum_in": page.checksum,
                 "checksum_out": target.checksum if target else "",
                 "flags": flags,
                 "has_ocr": target.has_ocr if target else False,
             }
-        )
-        overall_flags.extend(flags)
+            yield row, stats_in, stats_out
+
+
+def iter_page_metrics(
+    pre: Sequence[PageText], post: Sequence[PageText], *, backend: Optional[str] = "auto"
+) -> Iterator[Dict]:
+    """Yield the page rows of :func:`compute_metrics` one page at a time.
+
+    Pages are scanned a batch at a time and nothing is kept once a batch has
+    been yielded, so a report writer fed from this generator needs constant
+    memory whatever the page count.
+    """
+
+    backend = _resolve_backend(backend)
+    return (row for row, _, _ in _page_rows(pre, post, backend))
+
+
+def compute_metrics(
+    pre: Sequence[PageText], post: Sequence[PageText], *, backend: Optional[str] = "auto"
+) -> Dict:
+    """Per-page counts and flags, plus a summary over all pages.
+
+    *backend* selects how character statistics are computed: ``"python"``,
+    ``"numpy"``, or ``"auto"``, which uses numpy for long non-ASCII pages
+    when it is installed.  All backends produce identical results.
+    """
+
+    pages = []
+    overall_special: Counter = Counter()
+    overall_flags: List[str] = []
+    for row, stats_in, stats_out in _page_rows(pre, post, _resolve_backend(backend)):
+        overall_special.update(stats_in.special)
+        overall_special.update(stats_out.special)
+        overall_flags.extend(row["flags"])
+        pages.append(row)
 
     summary = {
         "total_pages": len(pre),
@@ -0,0 +1,11 @@
+import pytest
+
+from pipeline import governor
+
+
+@pytest.fixture(autouse=True)
+def isolated_governor(tmp_path_factory, monkeypatch):
+    """Keep tool slots taken by tests apart from real conversions of the same user."""
+
+    monkeypatch.setenv(governor.LOCK_DIR_ENV, str(tmp_path_factory.mktemp("governor")))
+    monkeypatch.setattr(governor, "_governor", None)
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from pipeline.batch import BatchJournal, config_fingerprint, input_stamp, job_key, retry_transient
+from pipeline.common import ToolError, run_cmd
+
+
+def test_run_cmd_marks_signal_deaths_transient():
+    with pytest.raises(ToolError) as killed:
+        run_cmd(["sh", "-c", "kill -9 $$"])
+    assert killed.value.transient and killed.value.returncode == -9
+
+    with pytest.raises(ToolError) as failed:
+        run_cmd(["sh", "-c", "echo bad >&2; exit 3"])
+    assert not failed.value.transient and "bad" in str(failed.value)
+
+
+def test_retry_transient_backs_off_and_gives_up_on_permanent_errors():
+    delays = []
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ToolError("killed", returncode=-9, transient=True)
+        return "ok"
+
+    assert retry_transient(flaky, retries=2, backoff_s=1.0, sleep=delays.append) == ("ok", 3)
+    assert delays == [1.0, 2.0]
+
+    def broken():
+        raise ToolError("bad input", returncode=1)
+
+    with pytest.raises(ToolError, match="bad input"):
+        retry_transient(broken, retries=5, backoff_s=1.0, sleep=delays.append)
+    assert delays == [1.0, 2.0]
+
+
+def test_journal_reuses_done_jobs_only_while_unchanged(tmp_path):
+    source = tmp_path / "book.epub"
+    source.write_bytes(b"v1")
+    output = tmp_path / "book.zip"
+    output.write_bytes(b"zip")
+    config = tmp_path / "config"
+    config.mkdir()
+    (config / "mapping.default.json").write_text("{}", encoding="utf-8")
+    job = {"type": "epub", "input": str(source), "out": str(tmp_path / "book.xml"), "publisher": "p"}
+    key, fingerprint = job_key(job), config_fingerprint(config, job)
+
+    with BatchJournal(tmp_path / "jobs.journal.jsonl") as journal:
+        journal.append("done", job=key, input=input_stamp(source), config=fingerprint, output_path=str(output))
+    # A crash mid-write leaves a truncated line behind.
+    with (tmp_path / "jobs.journal.jsonl").open("a", encoding="utf-8") as fh:
+        fh.write('{"event": "star')
+
+    journal = BatchJournal(tmp_path / "jobs.journal.jsonl")
+    assert journal.completed(key, fingerprint=fingerprint, input_path=source) is not None
+
+    (config / "publishers").mkdir()
+    (config / "publishers" / "p.json").write_text('{"docbook": {}}', encoding="utf-8")
+    assert config_fingerprint(config, job) != fingerprint
+    assert config_fingerprint(config, job, strict=True) != config_fingerprint(config, job)
+
+    source.write_bytes(b"v2")
+    assert journal.completed(key, fingerprint=fingerprint, input_path=source) is None
+    source.write_bytes(b"v1")
+    assert journal.completed(key, fingerprint=fingerprint, input_path=source) is not None
+    output.unlink()
+    assert journal.completed(key, fingerprint=fingerprint, input_path=source) is None
+    journal.close()
+
+    lines = (tmp_path / "jobs.journal.jsonl").read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[0])["event"] == "done"
+
+
+def test_cost_model_reads_pages_and_spine_and_learns_rates(tmp_path):
+    from benchmarks.generators import make_synthetic_epub
+    from pipeline.batch import CostModel, job_units
+
+    epub = make_synthetic_epub(tmp_path / "book.epub", chapters=4, paragraphs=2)
+    pdf_job = {"type": "pdf", "input": "DCT_Schema_Overview.pdf", "out": "x.xml"}
+    epub_job = {"type": "epub", "input": str(epub), "out": "y.xml"}
+    assert job_units(pdf_job) == (10.0, "pages")
+    assert job_units(epub_job) == (4.0, "spine")
+    assert job_units({"type": "pdf", "input": str(epub)})[1] == "size"
+
+    history = [
+        {"event": "done", "job": "other", "estimate": {"units": 100}, "summary": {"job_type": "pdf", "wall_s": 20.0}},
+        {
+            "event": "done",
+            "job": job_key(epub_job),
+            "input": input_stamp(epub),
+            "estimate": {"units": 4},
+            "summary": {"job_type": "epub", "wall_s": 3.0},
+        },
+    ]
+    model = CostModel.from_journal(history)
+    assert model.rates["pdf"] == pytest.approx(0.2)
+    assert model.estimate(pdf_job).seconds == pytest.approx(2.0)
+    estimate = model.estimate(epub_job)
+    assert (estimate.basis, estimate.seconds) == ("history", 3.0)
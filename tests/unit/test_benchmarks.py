@@ -0,0 +1,60 @@
+import pytest
+
+from benchmarks.generators import make_synthetic_pdfxml
+from benchmarks.scaling import fit_exponent
+from benchmarks.suite import compare_results
+from pipeline.structure.heuristics import label_blocks
+
+
+def test_synthetic_pdfxml_exercises_tables_chapters_and_index(tmp_path):
+    path = make_synthetic_pdfxml(tmp_path / "book.xml", pages=12, lines_per_page=20, chapter_every=5)
+
+    blocks = label_blocks(str(path), {})
+
+    labels = [block["label"] for block in blocks]
+    assert labels[0] == "book_title"
+    assert [block["text"] for block in blocks if block["label"] == "chapter"] == [
+        "Chapter 1",
+        "Chapter 2",
+        "Index",
+    ]
+    tables = [block for block in blocks if block["label"] == "table"]
+    assert tables and tables[0]["rows"][0] == ["Heading 1", "Heading 2", "Heading 3"]
+
+
+def test_compare_results_flags_regressions_above_threshold_and_noise():
+    baseline = {
+        "results": {
+            "a[small]": {"best_s": 0.090, "median_s": 0.100},
+            "b[small]": {"best_s": 0.090, "median_s": 0.100},
+            "c[small]": {"best_s": 0.001, "median_s": 0.001},
+            "d[small]": {"best_s": 0.006, "median_s": 0.007},
+            "gone[small]": {"best_s": 1.0, "median_s": 1.0},
+        }
+    }
+    current = {
+        "results": {
+            "a[small]": {"best_s": 0.060, "median_s": 0.120},
+            "b[small]": {"best_s": 0.090, "median_s": 0.140},
+            "c[small]": {"best_s": 0.002, "median_s": 0.002},
+            "d[small]": {"best_s": 0.009, "median_s": 0.010},
+            "new[small]": {"best_s": 1.0, "median_s": 1.0},
+        }
+    }
+
+    rows = {row["key"]: row for row in compare_results(current, baseline, threshold=0.25)}
+
+    assert set(rows) == {"a[small]", "b[small]", "c[small]", "d[small]"}
+    assert not rows["a[small]"]["regression"]
+    assert rows["b[small]"]["regression"]
+    assert not rows["c[small]"]["regression"]  # doubled, but within the noise floor
+    assert not rows["d[small]"]["regression"]  # typical jitter of a few-ms benchmark
+
+
+def test_fit_exponent_recovers_power_law():
+    sizes = [1_000, 10_000, 100_000]
+
+    assert fit_exponent(sizes, [n * 2e-6 for n in sizes]) == pytest.approx(1.0)
+    assert fit_exponent(sizes, [n * n * 1e-9 for n in sizes]) == pytest.approx(2.0)
+    with pytest.raises(ValueError):
+        fit_exponent([10], [1.0])
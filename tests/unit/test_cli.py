@@ -0,0 +1,157 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import cli
+from benchmarks.generators import make_synthetic_epub
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def _loaded_modules(statement, prefixes):
+    code = (
+        f"import sys; {statement}; "
+        f"print('\\n'.join(sorted(m for m in sys.modules if m.startswith({prefixes!r}))))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True
+    )
+    return result.stdout.split()
+
+
+def test_cli_import_defers_pipeline_and_third_party_modules():
+    assert _loaded_modules("import cli", ("lxml", "pdfminer", "pipeline")) == []
+
+
+def test_pdf_pipeline_import_defers_pdfminer_and_step_modules():
+    deferred = ("pdfminer", "pipeline.extractors", "pipeline.ocr", "pipeline.package")
+    assert _loaded_modules("import pipeline.pdf_pipeline", deferred) == []
+
+
+def test_validator_import_defers_asyncio():
+    assert _loaded_modules("import pipeline.validators.dtd_validator", ("asyncio",)) == []
+
+
+def test_module_available_handles_missing_parent_package():
+    assert cli._module_available("lxml.etree")
+    assert not cli._module_available("definitely_not_installed_pkg.sub")
+
+
+def test_missing_dependency_exits_with_install_hint(monkeypatch):
+    monkeypatch.setitem(cli._DEPENDENCY_HINTS, "definitely_not_installed_pkg", "Install it.")
+    with pytest.raises(SystemExit, match="definitely_not_installed_pkg: Install it."):
+        cli._verify_runtime_dependencies({"definitely_not_installed_pkg"})
+
+
+def test_batch_writes_per_job_and_consolidated_reports(tmp_path):
+    pytest.importorskip("jinja2")  # QA reports
+    epub = make_synthetic_epub(tmp_path / "book.epub", chapters=2, paragraphs=3)
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(
+        json.dumps(
+            [
+                {
+                    "type": "epub",
+                    "input": str(epub),
+                    "out": str(tmp_path / "out" / "book.xml"),
+                    "publisher": "publisher_A",
+                },
+                {"type": "mobi", "input": "book.mobi", "out": "x", "publisher": "publisher_A"},
+            ]
+        ),
+        encoding="utf-8",
+    )
+    reports = tmp_path / "reports"
+
+    assert cli.main(["--report-dir", str(reports), "batch", "--manifest", str(manifest)]) == 1
+
+    assert (reports / "book_qa.csv").exists() and (reports / "book_qa.html").exists()
+    rows = (reports / "jobs_batch.csv").read_text(encoding="utf-8").splitlines()
+    assert len(rows) == 3
+    assert "2 of 2 jobs done (finished), 1 failed, 0 skipped" in (reports / "jobs_batch.html").read_text(encoding="utf-8")
+
+
+def test_batch_resume_skips_unchanged_jobs(tmp_path):
+    pytest.importorskip("jinja2")  # QA reports
+    epub = make_synthetic_epub(tmp_path / "book.epub", chapters=2, paragraphs=3)
+    manifest = tmp_path / "jobs.csv"
+    manifest.write_text(
+        f"type,input,out,publisher\nepub,{epub},{tmp_path / 'out' / 'book.xml'},publisher_A\n", encoding="utf-8"
+    )
+    argv = ["--report-dir", str(tmp_path / "reports"), "batch", "--manifest", str(manifest)]
+
+    assert cli.main(argv) == 0
+    assert cli.main(argv + ["--resume"]) == 0
+
+    entries = [json.loads(line) for line in (tmp_path / "jobs.journal.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [entry["event"] for entry in entries] == ["run", "started", "done", "run"]
+    # Sequential runs are estimated too, so later runs can fit their rates.
+    assert entries[1]["estimate"] == entries[2]["estimate"] and entries[2]["estimate"]["units"] > 0
+    with (tmp_path / "reports" / "jobs_batch.csv").open(encoding="utf-8", newline="") as fh:
+        assert [row["status"] for row in csv.DictReader(fh)] == ["skipped"]
+
+    make_synthetic_epub(epub, chapters=3, paragraphs=3)
+    assert cli.main(argv + ["--resume"]) == 0
+    assert (tmp_path / "jobs.journal.jsonl").read_text(encoding="utf-8").count('"event": "done"') == 2
+
+
+def test_parallel_batch_dispatches_longest_estimate_first(tmp_path):
+    pytest.importorskip("jinja2")  # QA reports
+    jobs = []
+    for name, chapters in (("short", 1), ("long", 6), ("medium", 3)):
+        epub = make_synthetic_epub(tmp_path / f"{name}.epub", chapters=chapters, paragraphs=2)
+        out = str(tmp_path / name / "book.xml")
+        jobs.append({"type": "epub", "input": str(epub), "out": out, "publisher": "publisher_A"})
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(json.dumps(jobs), encoding="utf-8")
+    reports = tmp_path / "reports"
+
+    argv = ["--report-dir", str(reports), "batch", "--manifest", str(manifest), "--parallel", "2"]
+    assert cli.main(argv) == 0
+
+    journal = (tmp_path / "jobs.journal.jsonl").read_text(encoding="utf-8")
+    entries = [json.loads(line) for line in journal.splitlines()]
+    started = [entry for entry in entries if entry["event"] == "started"]
+    # The two longest jobs take both workers; the shortest waits for one.
+    expected = [f"epub:{job['input']}->{job['out']}" for job in (jobs[1], jobs[2], jobs[0])]
+    assert {entry["job"] for entry in started[:2]} == set(expected[:2])
+    assert started[2]["job"] == expected[2]
+    assert sorted(entry["estimate"]["units"] for entry in started) == [1.0, 3.0, 6.0]
+    for entry in started:
+        done = next(e for e in entries if e["event"] == "done" and e["job"] == entry["job"])
+        assert entries.index(entry) < entries.index(done)
+    assert sum(entry["event"] == "done" for entry in entries) == 3
+    with (reports / "jobs_batch.csv").open(encoding="utf-8", newline="") as fh:
+        assert all(row["estimate_s"] for row in csv.DictReader(fh))
+    assert (reports / "long_qa.html").exists()
+
+
+def _kill_worker(job, *args, **kwargs):
+    os._exit(1)
+
+
+def test_parallel_batch_records_jobs_of_a_dead_worker_as_failed(tmp_path, monkeypatch):
+    pytest.importorskip("jinja2")  # checked before any batch runs
+    # Forked workers inherit the patched job runner.
+    monkeypatch.setattr(cli, "_run_batch_job", _kill_worker)
+    jobs = []
+    for name in ("one", "two"):
+        epub = make_synthetic_epub(tmp_path / f"{name}.epub", chapters=1, paragraphs=2)
+        out = str(tmp_path / name / "book.xml")
+        jobs.append({"type": "epub", "input": str(epub), "out": out, "publisher": "publisher_A"})
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(json.dumps(jobs), encoding="utf-8")
+    reports = tmp_path / "reports"
+
+    argv = ["--report-dir", str(reports), "batch", "--manifest", str(manifest), "--parallel", "2"]
+    assert cli.main(argv) == 1
+
+    journal = (tmp_path / "jobs.journal.jsonl").read_text(encoding="utf-8")
+    failed = [json.loads(line) for line in journal.splitlines() if '"failed"' in line]
+    assert len(failed) == 2 and all("BrokenProcessPool" in entry["error"] for entry in failed)
+    assert "2 of 2 jobs done (finished), 2 failed" in (reports / "jobs_batch.html").read_text(encoding="utf-8")
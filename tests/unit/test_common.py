@@ -31,3 +31,15 @@ def test_load_mapping(tmp_path: Path):
     json.dump({"docbook": {"root": "article"}}, (publishers / "pub.json").open("w", encoding="utf-8"))
     mapping = load_mapping(tmp_path, "pub")
     assert mapping["docbook"]["root"] == "article"
+
+
+def test_load_mapping_returns_private_copies_and_sees_edits(tmp_path: Path):
+    default = tmp_path / "mapping.default.json"
+    default.write_text(json.dumps({"pdf": {"list_markers": ["•"]}}), encoding="utf-8")
+
+    first = load_mapping(tmp_path)
+    first["pdf"]["list_markers"].append("-")
+    assert load_mapping(tmp_path)["pdf"]["list_markers"] == ["•"]
+
+    default.write_text(json.dumps({"pdf": {"list_markers": ["*", "+"]}}), encoding="utf-8")
+    assert load_mapping(tmp_path)["pdf"]["list_markers"] == ["*", "+"]
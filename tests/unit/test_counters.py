@@ -1,5 +1,7 @@
+import pytest
+
 from pipeline.common import PageText, checksum
-from pipeline.validators.counters import compute_metrics
+from pipeline.validators.counters import compute_metrics, iter_page_metrics
 
 
 def make_page(num: int, text: str) -> PageText:
@@ -20,3 +22,146 @@ def test_compute_metrics_mismatch():
     metrics = compute_metrics(pre, post)
     flagged = [page for page in metrics["pages"] if page["flags"]]
     assert flagged and flagged[0]["flags"][0] == "text_mismatch"
+
+
+def _legacy_metrics(pre, post):
+    # The multi-pass implementation the fused kernel replaced.
+    from collections import Counter
+
+    def words(text):
+        return len([token for token in text.strip().split() if token])
+
+    def special(text):
+        return Counter(ch for ch in text if ord(ch) > 127)
+
+    post_map = {p.page_num: p for p in post}
+    pages, overall, flags_all = [], Counter(), []
+    for page in pre:
+        target = post_map.get(page.page_num)
+        out_text = target.norm_text if target else ""
+        flags = []
+        if target is None:
+            flags.append("missing_output_page")
+        else:
+            if page.norm_text != target.norm_text:
+                flags.append("text_mismatch")
+            if len(page.norm_text) != len(target.norm_text):
+                flags.append("char_count_diff")
+        overall.update(special(page.norm_text))
+        overall.update(special(out_text))
+        pages.append(
+            (page.page_num, len(page.norm_text), len(out_text) if target else 0,
+             words(page.norm_text), words(out_text) if target else 0, flags)
+        )
+        flags_all.extend(flags)
+    return pages, flags_all, overall
+
+
+def test_compute_metrics_matches_multi_pass_reference():
+    import random
+
+    rng = random.Random(7)
+    alphabet = ["a", "B", " ", "  ", "\t", "\n", "é", "ß", "—", "µ", " ", "　", "\x1f", "日", "😀"]
+    pre, post = [], []
+    for num in range(1, 120):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 80)))
+        pre.append(make_page(num, text))
+        choice = num % 4
+        if choice == 0:
+            continue  # missing output page
+        out = text if choice == 1 else text.replace("a", "á") if choice == 2 else text + "x"
+        post.append(make_page(num, out))
+
+    metrics = compute_metrics(pre, post)
+
+    pages, flags, special = _legacy_metrics(pre, post)
+    assert [
+        (p["page"], p["chars_in"], p["chars_out"], p["words_in"], p["words_out"], p["flags"])
+        for p in metrics["pages"]
+    ] == pages
+    assert metrics["summary"]["flags"] == flags
+    assert metrics["summary"]["special_chars"] == special
+    assert list(metrics["summary"]["special_chars"]) == list(special)
+
+
+def _random_texts(seed, count, max_len, *, surrogates=True):
+    import random
+
+    rng = random.Random(seed)
+    alphabet = ["a", "B", " ", "\t", "\n", "é", "ß", "—", "µ", "\xa0", "　", "\x1f", "\x85",
+                "α", "β", "日", "😀"]
+    if surrogates:  # a lone surrogate cannot be UTF-8 encoded for a checksum
+        alphabet.append("\ud800")
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len))) for _ in range(count)]
+
+
+def test_numpy_backend_matches_python_backend():
+    pytest.importorskip("numpy")
+    from pipeline.validators.counters import _text_stats, _text_stats_numpy
+
+    for text in _random_texts(3, 500, 80) + _random_texts(4, 5, 5000):
+        expected = _text_stats(text)
+        actual = _text_stats_numpy(text)
+        assert (actual.chars, actual.words) == (expected.chars, expected.words)
+        assert list(actual.special.items()) == list(expected.special.items())
+
+
+def test_compute_metrics_backends_agree():
+    pytest.importorskip("numpy")
+    texts = _random_texts(5, 40, 4000, surrogates=False)
+    pre = [make_page(num, text) for num, text in enumerate(texts, start=1)]
+    post = [make_page(num, text.replace("a", "α")) for num, text in enumerate(texts, start=1)]
+
+    results = [compute_metrics(pre, post, backend=backend) for backend in ("python", "numpy", "auto")]
+
+    assert results[0] == results[1] == results[2]
+
+
+def test_compute_metrics_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        compute_metrics([], [], backend="gpu")
+
+
+def test_whitespace_codes_match_str_isspace():
+    import sys
+
+    from pipeline.validators.counters import _WHITESPACE_CODES
+
+    assert sorted(_WHITESPACE_CODES) == [code for code in range(sys.maxunicode + 1) if chr(code).isspace()]
+
+
+def test_iter_page_metrics_scans_one_batch_at_a_time(monkeypatch):
+    from pipeline.validators import counters
+
+    scanned = []
+    text_stats = counters._text_stats
+    monkeypatch.setattr(counters, "_text_stats", lambda text: scanned.append(text) or text_stats(text))
+    monkeypatch.setattr(counters, "BATCH_PAGES", 2)
+    pre = [make_page(1, "one"), make_page(2, "one"), make_page(3, "two")]
+    post = [make_page(1, "one"), make_page(2, "one"), make_page(3, "2")]
+
+    rows = iter_page_metrics(pre, post, backend="python")
+    assert scanned == []
+    assert next(rows)["flags"] == []
+    # Repeated and unchanged texts in the batch are scanned once.
+    assert scanned == ["", "one"]
+    assert list(rows) == compute_metrics(pre, post, backend="python")["pages"][1:]
+    assert scanned[2:] == ["two", "2", "", "one", "two", "2"]
+
+
+def test_compute_metrics_compares_checksums_and_falls_back_to_text():
+    pre = [make_page(1, "same"), make_page(2, "same"), make_page(3, "same")]
+    post = [
+        make_page(1, "same"),
+        PageText(page_num=2, raw_text="same", norm_text="same", checksum=""),
+        PageText(page_num=3, raw_text="same", norm_text="same", checksum="stale"),
+    ]
+
+    flags = [page["flags"] for page in compute_metrics(pre, post)["pages"]]
+
+    assert flags == [[], [], ["text_mismatch"]]
+
+
+def test_iter_page_metrics_rejects_unknown_backend_up_front():
+    with pytest.raises(ValueError, match="gpu"):
+        iter_page_metrics([], [], backend="gpu")
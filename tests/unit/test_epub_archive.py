@@ -0,0 +1,123 @@
+import zipfile
+
+import pytest
+
+from pipeline import epub_archive
+from pipeline.epub_archive import EpubArchive, normalise_member_path
+from pipeline.media_files import MediaStream
+
+
+def _make_epub(path):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        zf.writestr("OEBPS/text/ch 1.xhtml", "<html/>")
+        zf.writestr("OEBPS/images/fig1.png", b"\x89PNG\r\n\x1a\n" + b"\x00" * 64, compress_type=zipfile.ZIP_STORED)
+        zf.writestr("OEBPS/styles/book.css", "body { margin: 0; }")
+    return path
+
+
+def test_normalise_member_path_folds_reference_variants():
+    assert normalise_member_path("/OEBPS/images/fig1.png") == "OEBPS/images/fig1.png"
+    assert normalise_member_path("OEBPS/text/../images/fig1.png#frag") == "OEBPS/images/fig1.png"
+    assert normalise_member_path("./OEBPS/text/ch%201.xhtml") == "OEBPS/text/ch 1.xhtml"
+
+
+def test_epub_archive_resolves_and_caches_members(tmp_path):
+    epub = _make_epub(tmp_path / "book.epub")
+    with EpubArchive(epub) as archive:
+        assert "/OEBPS/images/fig1.png" in archive
+        assert "OEBPS/missing.png" not in archive
+
+        first = archive.read("OEBPS/text/../images/fig1.png")
+        second = archive.read("/OEBPS/images/fig1.png")
+        assert first is second
+        assert (archive.hits, archive.misses) == (1, 1)
+
+        with archive.open("OEBPS/text/ch%201.xhtml") as fh:
+            assert fh.read() == b"<html/>"
+
+        assert archive.fetch("OEBPS/missing.png") is None
+
+
+def test_epub_archive_lru_evicts_oldest_entry(tmp_path):
+    epub = _make_epub(tmp_path / "book.epub")
+    with EpubArchive(epub, cache_entries=1) as archive:
+        archive.read("OEBPS/images/fig1.png")
+        archive.read("OEBPS/styles/book.css")
+        archive.read("OEBPS/images/fig1.png")
+        assert archive.hits == 0
+        assert archive.misses == 3
+
+
+def test_epub_archive_copy_to_copies_compressed_bytes_as_is(tmp_path):
+    epub = _make_epub(tmp_path / "book.epub")
+    photo = b"\xff\xd8\xff\xe0" + b"\x00" * 4096
+    with zipfile.ZipFile(epub, "a") as zf:
+        zf.writestr("OEBPS/images/photo.jpg", photo, compress_type=zipfile.ZIP_DEFLATED, compresslevel=1)
+    out = tmp_path / "out.zip"
+    with EpubArchive(epub) as archive, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as target:
+        if not epub_archive._can_append_raw(target):
+            pytest.skip("raw ZIP copies are not supported on this Python")
+        target.writestr("first.txt", "before")
+        archive.copy_to("OEBPS/images/fig1.png", target, "media/fig1.png")
+        archive.copy_to("/OEBPS/images/photo.jpg", target, "media/photo.jpg")
+        with target.open("open.txt", "w"):
+            with pytest.raises(ValueError, match="another write handle"):
+                archive.copy_to("OEBPS/images/fig1.png", target, "media/again.png")
+        target.writestr("last.txt", "after")
+        assert not archive.is_passthrough("OEBPS/styles/book.css")
+        with pytest.raises(ValueError):
+            archive.copy_to("OEBPS/styles/book.css", target, "book.css")
+
+    with zipfile.ZipFile(epub) as source, zipfile.ZipFile(out) as zf:
+        assert zf.testzip() is None
+        for name, arcname in [
+            ("OEBPS/images/fig1.png", "media/fig1.png"),
+            ("OEBPS/images/photo.jpg", "media/photo.jpg"),
+        ]:
+            original, copied = source.getinfo(name), zf.getinfo(arcname)
+            assert (copied.compress_type, copied.CRC, copied.compress_size) == (
+                original.compress_type,
+                original.CRC,
+                original.compress_size,
+            )
+        assert zf.getinfo("media/photo.jpg").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.read("media/photo.jpg") == photo
+        assert zf.read("last.txt") == b"after"
+
+
+def test_epub_archive_copy_to_falls_back_to_storing_through_the_public_api(tmp_path, monkeypatch):
+    monkeypatch.setattr(epub_archive, "_can_append_raw", lambda target: False)
+    epub = _make_epub(tmp_path / "book.epub")
+    photo = b"\xff\xd8\xff\xe0" + b"\x00" * 4096
+    with zipfile.ZipFile(epub, "a") as zf:
+        zf.writestr("OEBPS/images/photo.jpg", photo, compress_type=zipfile.ZIP_DEFLATED)
+    out = tmp_path / "out.zip"
+    with EpubArchive(epub) as archive, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as target:
+        assert archive.copy_to("OEBPS/images/photo.jpg", target, "media/photo.jpg") == len(photo)
+        target.writestr("last.txt", "after")
+
+    with zipfile.ZipFile(out) as zf:
+        assert zf.testzip() is None
+        assert zf.getinfo("media/photo.jpg").compress_type == zipfile.ZIP_STORED
+        assert zf.read("media/photo.jpg") == photo
+        assert zf.read("last.txt") == b"after"
+
+
+def test_epub_archive_fetch_streams_large_members(tmp_path):
+    epub = _make_epub(tmp_path / "book.epub")
+    with zipfile.ZipFile(epub, "a") as zf:
+        zf.writestr("OEBPS/images/plate.svg", "<svg>" + " " * 2000 + "</svg>")
+    with EpubArchive(epub, stream_threshold=1024) as archive:
+        large = archive.fetch("OEBPS/images/plate.svg")
+        assert isinstance(large, MediaStream) and large.copy_raw is None
+        assert large.size == 2011
+        with large.open() as handle:
+            assert handle.read(5) == b"<svg>"
+        assert archive.fetch("OEBPS/styles/book.css") == b"body { margin: 0; }"
+        assert (archive.hits, archive.misses) == (0, 1)
+
+        image = archive.fetch("OEBPS/images/fig1.png")
+        assert isinstance(image, MediaStream) and image.copy_raw is not None
+        with image.open() as handle:
+            assert handle.read(8) == b"\x89PNG\r\n\x1a\n"
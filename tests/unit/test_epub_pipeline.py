@@ -0,0 +1,119 @@
+import asyncio
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from lxml import etree
+
+from pipeline.epub_pipeline import EPUB_NS, _iter_text_blocks, convert_epub, convert_epub_async
+
+CONFIG = {"normalization": {"collapse_internal_whitespace": True}}
+
+
+def _make_epub(path, chapters):
+    manifest = "".join(
+        f'<item id="c{idx}" href="text/ch{idx}.xhtml" media-type="application/xhtml+xml"/>'
+        for idx in range(len(chapters))
+    )
+    spine = "".join(f'<itemref idref="c{idx}"/>' for idx in range(len(chapters)))
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        zf.writestr(
+            "META-INF/container.xml",
+            '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+            '<rootfile full-path="OEBPS/content.opf"/></rootfiles></container>',
+        )
+        zf.writestr(
+            "OEBPS/content.opf",
+            '<package xmlns="http://www.idpf.org/2007/opf">'
+            f"<manifest>{manifest}</manifest><spine>{spine}</spine></package>",
+        )
+        for idx, body in enumerate(chapters):
+            zf.writestr(
+                f"OEBPS/text/ch{idx}.xhtml",
+                f'<html xmlns="http://www.w3.org/1999/xhtml"><body>{body}</body></html>',
+            )
+    return path
+
+
+def test_iter_text_blocks_matches_xpath_text_join():
+    doc = etree.fromstring(
+        '<html xmlns="http://www.w3.org/1999/xhtml"><body>'
+        "<p>Hello <b>bold</b><!-- note --> world</p>tail<div>  <span>x</span>\ty</div><p/>"
+        "</body></html>"
+    )
+    expected = [
+        " ".join(child.xpath(".//text()"))
+        for child in doc.xpath("//html:body/*", namespaces=EPUB_NS)
+    ]
+
+    pages = list(_iter_text_blocks(doc, CONFIG))
+
+    assert [page.raw_text for page in pages] == expected
+    assert [page.page_num for page in pages] == [1, 2, 3]
+    assert pages[1].norm_text == " x y"
+
+
+def test_iter_text_blocks_rejects_empty_block_in_strict_mode():
+    doc = etree.fromstring(
+        '<html xmlns="http://www.w3.org/1999/xhtml"><body><p>Text</p><p> </p></body></html>'
+    )
+    with pytest.raises(ValueError):
+        list(_iter_text_blocks(doc, CONFIG, strict=True))
+
+
+def test_convert_epub_reports_block_metrics(tmp_path):
+    epub = _make_epub(
+        tmp_path / "book.epub",
+        ["<h1>Chapter One</h1><p>First para</p>", "<h1>Chapter Two</h1><p>Second para</p>"],
+    )
+
+    metrics = convert_epub(str(epub), str(tmp_path / "out" / "book.xml"), "publisher_A")
+
+    assert [page["chars_in"] for page in metrics["pages"]] == [11, 10, 11, 11]
+    assert metrics["summary"]["flags"] == []
+    assert [stage["stage"] for stage in metrics["stages"]] == [
+        "read_epub",
+        "text_blocks",
+        "xslt",
+        "transform",
+        "write_docbook",
+        "package",
+        "metrics",
+    ]
+    assert metrics["stages"][1]["items"] == {"pages": 4}
+    with zipfile.ZipFile(metrics["output_path"]) as zf:
+        assert "Book.xml" in zf.namelist()
+
+
+def test_convert_epub_async_runs_concurrent_conversions(tmp_path):
+    epub = _make_epub(tmp_path / "book.epub", ["<h1>Chapter One</h1><p>First para</p>"])
+    expected = convert_epub(str(epub), str(tmp_path / "sync" / "book.xml"), "publisher_A")
+    events = []
+
+    async def main():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            return await asyncio.gather(
+                *(
+                    convert_epub_async(
+                        str(epub),
+                        str(tmp_path / f"out{idx}" / "book.xml"),
+                        "publisher_A",
+                        executor=executor,
+                        progress=lambda event, timing, idx=idx: events.append((idx, event, timing.stage)),
+                    )
+                    for idx in range(4)
+                )
+            )
+
+    results = asyncio.run(main())
+
+    stages = [stage["stage"] for stage in expected["stages"]]
+    for idx, metrics in enumerate(results):
+        assert metrics["pages"] == expected["pages"]
+        assert [stage["stage"] for stage in metrics["stages"]] == stages
+        assert [(event, stage) for job, event, stage in events if job == idx] == [
+            (event, stage) for stage in stages for event in ("start", "finish")
+        ]
+        with zipfile.ZipFile(metrics["output_path"]) as zf, zipfile.ZipFile(expected["output_path"]) as ref:
+            assert zf.read("Book.xml") == ref.read("Book.xml")
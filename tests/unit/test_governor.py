@@ -0,0 +1,134 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from pipeline import governor as governor_module
+from pipeline.common import run_cmd
+from pipeline.governor import ResourceGovernor
+from pipeline.instrumentation import StageRecorder
+
+ROOT = Path(__file__).resolve().parents[2]
+
+pytestmark = pytest.mark.skipif(governor_module.fcntl is None, reason="needs fcntl")
+
+
+def _max_concurrency(governor, tool, runs=4):
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def run():
+        with governor.acquire(tool):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=run) for _ in range(runs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return max(peak)
+
+
+def test_tool_slots_and_memory_budget_limit_concurrency(tmp_path):
+    governor = ResourceGovernor(
+        tool_slots={"pdftohtml": 2, "ocrmypdf": 4},
+        tool_memory_mb={"ocrmypdf": 1500},
+        memory_budget_mb=2048,
+        lock_dir=tmp_path,
+    )
+    assert _max_concurrency(governor, "pdftohtml") == 2
+    assert _max_concurrency(governor, "ocrmypdf") == 1  # two runs exceed the memory budget
+    assert _max_concurrency(governor, "unlisted", runs=3) == 3
+
+
+def test_slots_are_shared_with_other_processes(tmp_path):
+    holder = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "import time; from pipeline.governor import ResourceGovernor; "
+            f"g = ResourceGovernor(tool_slots={{'ocrmypdf': 1}}, tool_memory_mb={{}}, memory_budget_mb=0, "
+            f"lock_dir={str(tmp_path)!r})\n"
+            "with g.acquire('ocrmypdf'):\n    print('held', flush=True); time.sleep(0.4)",
+        ],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "held"
+        governor = ResourceGovernor(
+            tool_slots={"ocrmypdf": 1}, tool_memory_mb={}, memory_budget_mb=0, lock_dir=tmp_path
+        )
+        with governor.acquire("ocrmypdf") as waited:
+            assert waited > 0.1
+    finally:
+        holder.wait(timeout=5)
+
+
+def test_run_cmd_reports_queue_wait_in_stage_metrics(tmp_path, monkeypatch):
+    governor = ResourceGovernor(tool_slots={"sh": 1}, tool_memory_mb={}, memory_budget_mb=0, lock_dir=tmp_path)
+    monkeypatch.setattr(governor_module, "_governor", governor)
+    held = threading.Event()
+
+    def hold():
+        with governor.acquire("sh"):
+            held.set()
+            time.sleep(0.2)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    recorder = StageRecorder("book.pdf")
+    with recorder.stage("extract"):
+        run_cmd(["sh", "-c", "true"])
+    thread.join()
+
+    [stage] = recorder.as_metrics()
+    assert stage["queue_wait_s"] > 0.1
+
+
+def test_lock_dir_defaults_to_the_environment_override(tmp_path, monkeypatch):
+    monkeypatch.setenv(governor_module.LOCK_DIR_ENV, str(tmp_path / "env"))
+
+    assert ResourceGovernor.from_config(None).lock_dir == tmp_path / "env"
+    assert ResourceGovernor.from_config({"lock_dir": str(tmp_path / "cfg")}).lock_dir == tmp_path / "cfg"
+
+
+def test_disabled_governor_does_not_limit(tmp_path):
+    governor = ResourceGovernor.from_config(
+        {"enabled": False, "tool_slots": {"pdftohtml": 1}, "lock_dir": str(tmp_path)}
+    )
+
+    assert _max_concurrency(governor, "pdftohtml", runs=3) == 3
+    assert not list(tmp_path.iterdir())
+
+
+def test_cli_resource_settings_merge_publisher_overrides(tmp_path):
+    import json
+
+    import cli
+
+    (tmp_path / "publishers").mkdir()
+    (tmp_path / "mapping.default.json").write_text(
+        json.dumps({"resources": {"tool_slots": {"pdftotext": 4, "ocrmypdf": 1}, "memory_budget_mb": 4096}}),
+        encoding="utf-8",
+    )
+    (tmp_path / "publishers" / "big.json").write_text(
+        json.dumps({"resources": {"tool_slots": {"ocrmypdf": 2}}}), encoding="utf-8"
+    )
+
+    assert cli._resource_settings(tmp_path)["tool_slots"] == {"pdftotext": 4, "ocrmypdf": 1}
+    assert cli._resource_settings(tmp_path, "big") == {
+        "tool_slots": {"pdftotext": 4, "ocrmypdf": 2},
+        "memory_budget_mb": 4096,
+    }
@@ -0,0 +1,74 @@
+import contextvars
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline.common import run_cmd
+from pipeline.instrumentation import StageRecorder, charge_cpu
+
+
+def test_stage_recorder_records_stages_in_order():
+    recorder = StageRecorder("book.pdf")
+    with recorder.stage("extract") as stage:
+        stage.items["pages"] = 3
+    with recorder.stage("package"):
+        sum(range(10000))
+
+    stages = recorder.as_metrics()
+    assert [stage["stage"] for stage in stages] == ["extract", "package"]
+    assert stages[0]["items"] == {"pages": 3}
+    assert stages[1]["items"] == {}
+    for stage in stages:
+        assert stage["wall_s"] >= 0
+        assert stage["cpu_s"] >= 0
+        assert stage["peak_rss_delta_kb"] >= 0
+
+
+def test_stage_recorder_emits_json_lines_and_records_failures(caplog):
+    recorder = StageRecorder("book.epub")
+    with caplog.at_level(logging.INFO, logger="pipeline.stages"):
+        try:
+            with recorder.stage("xslt"):
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+
+    assert [stage.stage for stage in recorder.stages] == ["xslt"]
+    [record] = [r for r in caplog.records if r.name == "pipeline.stages"]
+    payload = json.loads(record.getMessage())
+    assert payload["source"] == "book.epub"
+    assert payload["stage"] == "xslt"
+
+
+def _burn(seconds):
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+def test_stage_cpu_excludes_other_threads_but_charges_its_workers_and_tools():
+    recorder = StageRecorder()
+    stop = threading.Event()
+    other = threading.Thread(target=lambda: [_burn(0.01) for _ in iter(stop.is_set, True)])
+    other.start()
+    try:
+        with recorder.stage("idle"):
+            time.sleep(0.3)
+    finally:
+        stop.set()
+        other.join()
+
+    with ThreadPoolExecutor(max_workers=1) as pool, recorder.stage("workers"):
+        pool.submit(contextvars.copy_context().run, charge_cpu, _burn, 0.2).result()
+
+    script = "import time\nend = time.process_time() + 0.2\nwhile time.process_time() < end: pass"
+    with recorder.stage("tool"):
+        run_cmd([sys.executable, "-c", script])
+
+    idle, workers, tool = recorder.stages
+    assert idle.cpu_s < 0.1
+    assert workers.cpu_s >= 0.2
+    assert tool.cpu_s >= 0.2
@@ -0,0 +1,52 @@
+from pipeline.media_files import FileMediaFetcher, MediaStream
+
+
+def test_file_media_fetcher_indexes_search_paths_in_order(tmp_path):
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    (first / "img").mkdir(parents=True)
+    (second / "img").mkdir(parents=True)
+    (first / "img" / "a.png").write_bytes(b"first")
+    (second / "img" / "a.png").write_bytes(b"second")
+    (second / "img" / "b.png").write_bytes(b"only-second")
+
+    fetcher = FileMediaFetcher([first, second])
+
+    assert fetcher("img/a.png") == b"first"
+    assert fetcher("img/b.png") == b"only-second"
+    assert fetcher(str(second / "img" / "a.png")) == b"second"
+    assert fetcher("img/missing.png") is None
+    assert fetcher("img") is None
+
+
+def test_file_media_fetcher_caches_and_counts(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"a" * 10)
+    (tmp_path / "b.png").write_bytes(b"b" * 10)
+    fetcher = FileMediaFetcher([tmp_path], cache_bytes=15)
+
+    fetcher("a.png")
+    fetcher("a.png")
+    assert fetcher.stats() == {"hits": 1, "misses": 1, "bytes_read": 10}
+
+    fetcher("b.png")
+    fetcher("a.png")
+    assert fetcher.stats() == {"hits": 1, "misses": 3, "bytes_read": 30}
+
+
+def test_file_media_fetcher_streams_large_files(tmp_path):
+    payload = b"\x89PNG\r\n\x1a\n" + b"\x00" * 4096
+    (tmp_path / "large.png").write_bytes(payload)
+    (tmp_path / "small.png").write_bytes(b"tiny")
+    fetcher = FileMediaFetcher([tmp_path], stream_threshold=1024)
+
+    large = fetcher("large.png")
+    assert isinstance(large, MediaStream)
+    assert large.size == len(payload)
+    assert fetcher.stats()["bytes_read"] == 0  # nothing is read until the stream is
+    with large.open() as handle:
+        assert handle.read() == payload
+    with large.open() as handle:
+        assert handle.read(8) == payload[:8]
+    assert fetcher("small.png") == b"tiny"
+    # Each pass over the stream counts what was actually read from disk.
+    assert len(payload) + 8 <= fetcher.stats()["bytes_read"] - 4 <= 2 * len(payload)
@@ -1,14 +1,18 @@
 import csv
+import hashlib
 import io
 import struct
 import zipfile
 import zlib
 
+from copy import deepcopy
 from pathlib import Path
 
 from lxml import etree
 
-from pipeline.package import package_docbook
+from pipeline.epub_archive import EpubArchive
+from pipeline.media_files import MediaStream
+from pipeline.package import _index_images, _scan_media, package_docbook
 
 
 def _make_png(width: int = 120, height: int = 120) -> bytes:
@@ -101,6 +105,28 @@ def test_package_docbook_creates_chapters_and_media(tmp_path):
             "media/Book_Images/Shared/logo.png",
         ]
 
+        # Streaming fixes the entry order: shared root media, Book.xml, the
+        # directories, then each fragment after its own media.
+        assert zf.namelist() == [
+            "media/Book_Images/Shared/logo.png",
+            "Book.xml",
+            "media/",
+            "media/Book_Images/",
+            "media/Book_Images/Chapters/",
+            "media/Book_Images/Shared/",
+            "media/Book_Images/Metadata/",
+            "TableOfContents.xml",
+            "media/Book_Images/Chapters/Ch0001f01.png",
+            "Ch001.xml",
+            "Ch002.xml",
+            "media/Book_Images/Metadata/image_catalog.xml",
+            "media/Book_Images/Metadata/image_manifest.csv",
+        ]
+        for info in zf.infolist():
+            expected_mode = 0o40775 if info.is_dir() else 0o100644
+            assert info.external_attr >> 16 == expected_mode, info.filename
+            assert info.date_time > (1980, 1, 1, 0, 0, 0), info.filename
+
         book_xml = zf.read("Book.xml").decode("utf-8")
         assert "<!ENTITY Ch001 SYSTEM \"Ch001.xml\">" in book_xml
         assert "<!ENTITY Ch002 SYSTEM \"Ch002.xml\">" in book_xml
@@ -153,6 +179,8 @@ def test_package_docbook_creates_chapters_and_media(tmp_path):
             "Original_Name",
             "File_Size",
             "Format",
+            "SHA256",
+            "Alias_Of",
         ]
         assert rows[1][0] == "Ch0001f01.png"
         assert rows[1][1] == "1"
@@ -160,7 +188,9 @@ def test_package_docbook_creates_chapters_and_media(tmp_path):
         assert rows[1][3] == "Figure 1.1: Sample Chart"
         assert rows[1][4] == "Chart showing quarterly performance"
         assert rows[1][5] == "figure1.png"
-        assert rows[1][-1] == "PNG"
+        assert rows[1][7] == "PNG"
+        assert rows[1][8] == hashlib.sha256(media_store["img/figure1.png"]).hexdigest()
+        assert rows[1][9] == ""
 
 
 def test_package_docbook_skips_images_without_caption_or_label(tmp_path):
@@ -208,6 +238,8 @@ def test_package_docbook_skips_images_without_caption_or_label(tmp_path):
                 "Original_Name",
                 "File_Size",
                 "Format",
+                "SHA256",
+                "Alias_Of",
             ]
         ]
 
@@ -257,6 +289,8 @@ def test_package_docbook_skips_zero_byte_images(tmp_path):
                 "Original_Name",
                 "File_Size",
                 "Format",
+                "SHA256",
+                "Alias_Of",
             ]
         ]
 
@@ -351,3 +385,351 @@ def test_package_docbook_includes_stylesheet_assets(tmp_path):
         assert "rittdoc.css" in zf.namelist()
         book_xml = zf.read("Book.xml").decode("utf-8")
         assert "xml-stylesheet" in book_xml
+
+
+def test_package_docbook_stores_compressed_images(tmp_path):
+    root = etree.Element("book")
+    chapter = etree.SubElement(root, "chapter")
+    etree.SubElement(chapter, "title").text = "Chapter"
+    figure = etree.SubElement(chapter, "figure", id="fig1")
+    etree.SubElement(figure, "title").text = "Figure 1"
+    media = etree.SubElement(figure, "mediaobject")
+    imageobject = etree.SubElement(media, "imageobject")
+    etree.SubElement(imageobject, "imagedata", fileref="img/figure1.png")
+
+    media_store = {"img/figure1.png": _make_png()}
+
+    def fetch_media(ref: str):
+        return media_store.get(ref)
+
+    stored = package_docbook(
+        deepcopy(root),
+        "book",
+        "RITTDOCdtd/v1.1/RittDocBook.dtd",
+        str(tmp_path / "stored" / "output.xml"),
+        media_fetcher=fetch_media,
+        xml_compresslevel=9,
+    )
+    deflated = package_docbook(
+        deepcopy(root),
+        "book",
+        "RITTDOCdtd/v1.1/RittDocBook.dtd",
+        str(tmp_path / "deflated" / "output.xml"),
+        media_fetcher=fetch_media,
+        store_compressed_media=False,
+    )
+
+    with zipfile.ZipFile(stored, "r") as zf:
+        image_info = zf.getinfo("media/Book_Images/Chapters/Ch0001f01.png")
+        assert image_info.compress_type == zipfile.ZIP_STORED
+        assert zf.read(image_info) == media_store["img/figure1.png"]
+        assert zf.getinfo("Ch001.xml").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.getinfo("Book.xml").compress_type == zipfile.ZIP_DEFLATED
+
+    with zipfile.ZipFile(deflated, "r") as zf:
+        image_info = zf.getinfo("media/Book_Images/Chapters/Ch0001f01.png")
+        assert image_info.compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_package_docbook_applies_xml_compresslevel(tmp_path):
+    root = etree.Element("book")
+    chapter = etree.SubElement(root, "chapter")
+    etree.SubElement(chapter, "title").text = "Chapter"
+    etree.SubElement(chapter, "para").text = " ".join(str(n * n) for n in range(3000))
+
+    sizes = {}
+    for level in (1, 9):
+        zip_path = package_docbook(
+            deepcopy(root),
+            "book",
+            "RITTDOCdtd/v1.1/RittDocBook.dtd",
+            str(tmp_path / str(level) / "output.xml"),
+            xml_compresslevel=level,
+        )
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            info = zf.getinfo("Ch001.xml")
+            assert info.external_attr >> 16 == 0o100644
+            assert info.date_time > (1980, 1, 1, 0, 0, 0)
+            sizes[level] = info.compress_size
+
+    assert sizes[9] < sizes[1]
+
+
+def _zip_entries(zip_path):
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+def test_package_docbook_consume_root_matches_copying_split(tmp_path):
+    root = etree.Element("book")
+    info = etree.SubElement(root, "bookinfo")
+    etree.SubElement(info, "isbn").text = "978-1-2345-6789-0"
+    root.append(etree.Comment("generated"))
+    for number in (1, 2):
+        chapter = etree.SubElement(root, "chapter")
+        etree.SubElement(chapter, "title").text = f"Chapter {number}"
+        etree.SubElement(chapter, "para").text = f"Body {number}"
+        chapter.tail = "\n"
+        figure = etree.SubElement(chapter, "figure", id=f"fig{number}")
+        etree.SubElement(figure, "title").text = f"Figure {number}"
+        imageobject = etree.SubElement(etree.SubElement(figure, "mediaobject"), "imageobject")
+        etree.SubElement(imageobject, "imagedata", fileref="img/figure1.png")
+    loose = etree.Element("book")
+    etree.SubElement(loose, "bookinfo")
+    etree.SubElement(loose, "para").text = "No chapters here"
+
+    media_store = {"img/figure1.png": _make_png()}
+
+    for label, tree in (("chapters", root), ("fallback", loose)):
+        copied = package_docbook(
+            tree,
+            "book",
+            "RITTDOCdtd/v1.1/RittDocBook.dtd",
+            str(tmp_path / label / "copied" / "output.xml"),
+            media_fetcher=media_store.get,
+        )
+        moved = package_docbook(
+            tree,
+            "book",
+            "RITTDOCdtd/v1.1/RittDocBook.dtd",
+            str(tmp_path / label / "moved" / "output.xml"),
+            media_fetcher=media_store.get,
+            consume_root=True,
+        )
+        assert _zip_entries(moved) == _zip_entries(copied)
+
+    assert root.find("chapter/title") is None
+
+
+def test_package_docbook_workers_produce_identical_archive(tmp_path):
+    def build():
+        root = etree.Element("book")
+        info = etree.SubElement(root, "bookinfo")
+        etree.SubElement(info, "isbn").text = "978-1-2345-6789-0"
+        for number in range(1, 7):
+            chapter = etree.SubElement(root, "chapter")
+            etree.SubElement(chapter, "title").text = f"Chapter {number}"
+            for index in range(1, 4):
+                figure = etree.SubElement(chapter, "figure", id=f"fig{number}_{index}")
+                etree.SubElement(figure, "title").text = f"Figure {number}.{index}"
+                imageobject = etree.SubElement(etree.SubElement(figure, "mediaobject"), "imageobject")
+                etree.SubElement(imageobject, "imagedata", fileref=f"img/figure{index}.png")
+            logo = etree.SubElement(etree.SubElement(chapter, "mediaobject"), "imageobject")
+            etree.SubElement(logo, "imagedata", fileref="img/logo.png")
+        return root
+
+    media_store = {f"img/figure{index}.png": _make_png(10 + index, 10) for index in range(1, 4)}
+    media_store["img/logo.png"] = _make_png(4, 4)
+
+    outputs = []
+    for workers in (1, 4):
+        zip_path = package_docbook(
+            build(),
+            "book",
+            "RITTDOCdtd/v1.1/RittDocBook.dtd",
+            str(tmp_path / f"w{workers}" / "output.xml"),
+            media_fetcher=media_store.get,
+            workers=workers,
+        )
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            outputs.append((zf.namelist(), _zip_entries(zip_path)))
+
+    assert outputs[0] == outputs[1]
+    names = outputs[0][0]
+    assert names.count("media/Book_Images/Shared/logo.png") == 1
+    assert names.index("media/Book_Images/Chapters/Ch0001f01.png") < names.index("Ch001.xml")
+
+
+def test_package_docbook_stores_identical_images_once(tmp_path):
+    root = etree.Element("book")
+    for number in (1, 2):
+        chapter = etree.SubElement(root, "chapter")
+        etree.SubElement(chapter, "title").text = f"Chapter {number}"
+        figure = etree.SubElement(chapter, "figure", id=f"fig{number}")
+        etree.SubElement(figure, "title").text = f"Figure {number}"
+        imageobject = etree.SubElement(etree.SubElement(figure, "mediaobject"), "imageobject")
+        etree.SubElement(imageobject, "imagedata", fileref=f"img/chart{number}.png")
+        for ref in ("a/logo.png", "b/logo.png"):
+            logo = etree.SubElement(etree.SubElement(chapter, "mediaobject"), "imageobject")
+            etree.SubElement(logo, "imagedata", fileref=ref)
+
+    chart = _make_png(100, 100)
+    media_store = {
+        "img/chart1.png": chart,
+        "img/chart2.png": chart,
+        "a/logo.png": _make_png(8, 8),
+        "b/logo.png": _make_png(9, 9),
+    }
+
+    zip_path = package_docbook(
+        root,
+        "book",
+        "RITTDOCdtd/v1.1/RittDocBook.dtd",
+        str(tmp_path / "output.xml"),
+        media_fetcher=media_store.get,
+    )
+
+    digest = hashlib.sha256(chart).hexdigest()
+    logo_b = "media/Book_Images/Shared/logo-" + hashlib.sha256(media_store["b/logo.png"]).hexdigest()[:12] + ".png"
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        names = zf.namelist()
+        assert "media/Book_Images/Chapters/Ch0001f01.png" in names
+        assert "media/Book_Images/Chapters/Ch0002f01.png" not in names
+        assert "media/Book_Images/Shared/logo.png" in names
+        assert logo_b in names
+        assert zf.read(logo_b) == media_store["b/logo.png"]
+
+        chapter_two = etree.fromstring(zf.read("Ch002.xml"))
+        refs = [node.get("fileref") for node in chapter_two.iter("imagedata")]
+        assert refs == [
+            "media/Book_Images/Chapters/Ch0001f01.png",
+            "media/Book_Images/Shared/logo.png",
+            logo_b,
+        ]
+
+        catalog = etree.fromstring(zf.read("media/Book_Images/Metadata/image_catalog.xml"))
+        images = catalog.findall("image")
+        assert [image.findtext("filename") for image in images] == ["Ch0001f01.png", "Ch0002f01.png"]
+        assert [image.findtext("sha256") for image in images] == [digest, digest]
+        assert [image.findtext("alias_of") for image in images] == ["", "Ch0001f01.png"]
+
+
+def test_package_docbook_streams_large_media(tmp_path):
+    # A JPEG whose SOF segment sits behind a large APP1 block.
+    app1 = b"\xff\xe1" + (2 + 60000).to_bytes(2, "big") + b"\x00" * 60000
+    sof = b"\xff\xc0" + (17).to_bytes(2, "big") + b"\x08" + (300).to_bytes(2, "big") + (400).to_bytes(2, "big")
+    jpeg = b"\xff\xd8" + app1 + sof + b"\x00" * 12 + b"\xff\xd9"
+    source = tmp_path / "plate.jpg"
+    source.write_bytes(jpeg)
+    opened = []
+
+    def fetch_media(ref: str):
+        def opener():
+            opened.append(ref)
+            return source.open("rb")
+
+        return MediaStream(opener, len(jpeg))
+
+    root = etree.Element("book")
+    chapter = etree.SubElement(root, "chapter")
+    etree.SubElement(chapter, "title").text = "Chapter"
+    figure = etree.SubElement(chapter, "figure", id="plate")
+    etree.SubElement(figure, "title").text = "Figure 1"
+    imageobject = etree.SubElement(etree.SubElement(figure, "mediaobject"), "imageobject")
+    etree.SubElement(imageobject, "imagedata", fileref="img/plate.jpg")
+
+    zip_path = package_docbook(
+        root,
+        "book",
+        "RITTDOCdtd/v1.1/RittDocBook.dtd",
+        str(tmp_path / "output.xml"),
+        media_fetcher=fetch_media,
+    )
+
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        assert zf.read("media/Book_Images/Chapters/Ch0001f01.jpg") == jpeg
+        catalog = etree.fromstring(zf.read("media/Book_Images/Metadata/image_catalog.xml"))
+        entry = catalog.find("image")
+        assert (entry.findtext("width"), entry.findtext("height")) == ("400", "300")
+        assert entry.findtext("format") == "JPEG"
+        assert entry.findtext("sha256") == hashlib.sha256(jpeg).hexdigest()
+    assert opened == ["img/plate.jpg", "img/plate.jpg"]
+
+
+def test_scan_media_reads_a_stream_once_for_header_and_hash():
+    app1 = b"\xff\xe1" + (2 + 60000).to_bytes(2, "big") + bytes(range(256)) * 234 + b"\x00" * 96
+    sof = b"\xff\xc0" + (17).to_bytes(2, "big") + b"\x08" + (300).to_bytes(2, "big") + (400).to_bytes(2, "big")
+    jpeg = b"\xff\xd8" + app1 + sof + b"\x00" * 12 + b"\xff\xd9"
+    consumed = []
+
+    class CountingStream(io.BytesIO):
+        def read(self, size=-1):
+            data = super().read(size)
+            consumed.append(len(data))
+            return data
+
+    width, height, fmt, digest = _scan_media(MediaStream(lambda: CountingStream(jpeg), len(jpeg)), ".jpg")
+
+    assert (width, height, fmt) == (400, 300, "JPEG")
+    assert digest == hashlib.sha256(jpeg).hexdigest()
+    # Only part of the 24-byte header probe is read a second time.
+    assert len(jpeg) <= sum(consumed) < len(jpeg) + 24
+
+
+def test_index_images_records_ancestry_in_one_pass():
+    root = etree.fromstring(
+        "<chapter><title>C</title>"
+        "<bookinfo><mediaobject><imageobject><imagedata fileref='logo.png'/></imageobject></mediaobject></bookinfo>"
+        "<figure id='outer'><title>Figure 1</title>"
+        "<mediaobject><imageobject><imagedata fileref='a.png'/></imageobject>"
+        "<textobject><phrase>Alt A</phrase></textobject></mediaobject>"
+        "<figure><mediaobject><imageobject><imagedata fileref='b.png'/></imageobject></mediaobject></figure>"
+        "</figure>"
+        "<mediaobject><imageobject><imagedata fileref='loose.png'/></imageobject>"
+        "<caption>Loose</caption></mediaobject>"
+        "<mediaobject><imageobject><graphic fileref='bare.png'/></imageobject></mediaobject>"
+        "<imagedata/>"
+        "</chapter>"
+    )
+
+    index = _index_images(root)
+
+    assert [figure.element.get("id") for figure in index.figures] == ["outer"]
+    outer = index.figures[0]
+    assert outer.caption == "Figure 1"
+    assert [image.node.get("fileref") for image in outer.images] == ["a.png", "b.png"]
+    assert [image.alt_text for image in outer.images] == ["Alt A", ""]
+    assert all(image.labelled for image in outer.images)
+    loose = {image.node.get("fileref"): image for image in index.loose}
+    assert list(loose) == ["logo.png", "loose.png", "bare.png"]
+    assert loose["logo.png"].in_bookinfo
+    assert not loose["loose.png"].in_bookinfo
+    assert loose["loose.png"].labelled
+    assert not loose["bare.png"].labelled
+    assert [image.node.get("fileref") for image in index.images] == [
+        "logo.png",
+        "a.png",
+        "b.png",
+        "loose.png",
+        "bare.png",
+    ]
+
+
+def test_package_docbook_copies_epub_images_raw(tmp_path):
+    epub = tmp_path / "book.epub"
+    with zipfile.ZipFile(epub, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("OEBPS/images/figure1.png", _make_png(), compress_type=zipfile.ZIP_STORED)
+        zf.writestr("OEBPS/images/logo.png", _make_png(60, 60), compresslevel=9)
+
+    root = etree.Element("book")
+    info = etree.SubElement(root, "bookinfo")
+    etree.SubElement(info, "imagedata", fileref="OEBPS/images/logo.png")
+    chapter = etree.SubElement(root, "chapter")
+    etree.SubElement(chapter, "title").text = "Chapter One"
+    fig = etree.SubElement(chapter, "figure", id="fig_1_1")
+    etree.SubElement(fig, "imagedata", fileref="OEBPS/images/figure1.png")
+    etree.SubElement(fig, "caption").text = "Figure 1.1: Chart"
+
+    with EpubArchive(epub) as archive:
+        zip_path = package_docbook(
+            root,
+            "book",
+            "RITTDOCdtd/v1.1/RittDocBook.dtd",
+            str(tmp_path / "out" / "book.xml"),
+            media_fetcher=archive.fetch,
+        )
+
+    with zipfile.ZipFile(epub) as source, zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        for name, arcname in [
+            ("OEBPS/images/figure1.png", "media/Book_Images/Chapters/Ch0001f01.png"),
+            ("OEBPS/images/logo.png", "media/Book_Images/Shared/logo.png"),
+        ]:
+            original, copied = source.getinfo(name), zf.getinfo(arcname)
+            assert (copied.compress_type, copied.CRC, copied.compress_size) == (
+                original.compress_type,
+                original.CRC,
+                original.compress_size,
+            )
+        catalog = etree.fromstring(zf.read("media/Book_Images/Metadata/image_catalog.xml"))
+        assert catalog.findtext("image/sha256") == hashlib.sha256(_make_png()).hexdigest()
@@ -0,0 +1,52 @@
+import pstats
+
+from pipeline.instrumentation import StageRecorder
+from pipeline.profiling import StageProfiler
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+
+def test_stage_profiler_writes_pstats_and_folded_stacks(tmp_path):
+    profiler = StageProfiler()
+    for _ in range(2):
+        recorder = StageRecorder("book.pdf", profiler=profiler)
+        with recorder.stage("label_blocks"):
+            _busy(20000)
+        with recorder.stage("package"):
+            _busy(5000)
+
+    assert profiler.stages == ["label_blocks", "package"]
+    pstats_path, folded_path = profiler.write(tmp_path, "book")
+
+    stats = pstats.Stats(str(pstats_path))
+    [busy] = [func for func in stats.stats if func[2] == "_busy"]
+    assert stats.stats[busy][1] == 4  # calls aggregated across both recorders
+
+    lines = folded_path.read_text(encoding="utf-8").splitlines()
+    assert lines
+    for line in lines:
+        stack, micros = line.rsplit(" ", 1)
+        assert stack.split(";")[0] in {"label_blocks", "package"}
+        assert int(micros) > 0
+    assert any("_busy (test_profiling.py:" in line for line in lines)
+
+
+def test_stage_profiler_without_stages_writes_nothing(tmp_path):
+    assert StageProfiler().write(tmp_path, "empty") == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stage_profiler_merges_exported_stats():
+    worker = StageProfiler()
+    with worker.profile("label_blocks"):
+        _busy(1000)
+    parent = StageProfiler()
+    with parent.profile("label_blocks"):
+        _busy(1000)
+
+    parent.merge(worker.export())
+
+    [busy] = [func for func in parent.combined().stats if func[2] == "_busy"]
+    assert parent.combined().stats[busy][1] == 2
@@ -0,0 +1,99 @@
+import csv
+
+import pytest
+
+from pipeline import qa_report
+
+
+def _pages(count):
+    for number in range(1, count + 1):
+        flags = ["text_mismatch"] if number % 2 == 0 else []
+        yield {
+            "page": number,
+            "chars_in": 10,
+            "chars_out": 9 if flags else 10,
+            "words_in": 2,
+            "words_out": 2,
+            "checksum_in": "aa",
+            "checksum_out": "bb" if flags else "aa",
+            "flags": flags,
+            "has_ocr": number == 3,
+        }
+
+
+STAGES = [{"stage": "read<x>", "wall_s": 0.12345, "cpu_s": 0.1, "peak_rss_delta_kb": 12, "items": {"pages": 4}}]
+
+
+def test_write_reports_streams_pages_from_a_generator(tmp_path):
+    pytest.importorskip("jinja2")
+    pulled = []
+
+    def pages():
+        for page in _pages(4):
+            pulled.append(page["page"])
+            yield page
+
+    paths = qa_report.write_reports(pages(), "dir/book & co.pdf", tmp_path, stages=STAGES)
+
+    assert pulled == [1, 2, 3, 4]
+    with paths["csv"].open(encoding="utf-8", newline="") as fh:
+        rows = list(csv.DictReader(fh))
+    assert [row["status"] for row in rows] == ["ok", "discrepancy", "ok", "discrepancy"]
+    assert [row["has_ocr"] for row in rows] == ["no", "no", "yes", "no"]
+
+    report = paths["html"].read_text(encoding="utf-8")
+    assert "<title>dir/book &amp; co.pdf QA Report</title>" in report
+    assert report.count('<tr class="has-discrepancy">') == 2
+    assert "<td>read&lt;x&gt;</td>" in report and "<td>pages=4</td>" in report
+    assert paths["stages"].read_text(encoding="utf-8").splitlines()[1] == "dir/book & co.pdf,read<x>,0.123,0.100,0.000,12,pages=4"
+
+
+def test_write_reports_without_pages(tmp_path):
+    pytest.importorskip("jinja2")
+    paths = qa_report.write_reports(iter(()), "empty.epub", tmp_path)
+
+    assert "stages" not in paths
+    assert paths["csv"].read_text(encoding="utf-8").count("\n") == 1
+    assert '<td colspan="9">No pages processed</td>' in paths["html"].read_text(encoding="utf-8")
+
+
+def test_batch_report_ranks_slowest_first_and_updates_per_job(tmp_path):
+    pytest.importorskip("jinja2")
+    report = qa_report.BatchReport(tmp_path, "manifest", total_jobs=3)
+    fast = {"pages": list(_pages(4)), "mismatches": [1]}
+    report.add(qa_report.JobSummary.from_metrics("fast.epub", "epub", fast, 0.5))
+
+    html_text = report.paths["html"].read_text(encoding="utf-8")
+    assert "1 of 3 jobs done (running)" in html_text and 'http-equiv="refresh"' in html_text
+
+    report.add(qa_report.JobSummary.failed("bad.pdf", "pdf", 0.1, ValueError("broken")))
+    report.add(qa_report.JobSummary.from_metrics("slow.pdf", "pdf", {"pages": list(_pages(2))}, 4.0))
+    report.finish()
+
+    with report.paths["csv"].open(encoding="utf-8", newline="") as fh:
+        rows = list(csv.DictReader(fh))
+    assert [row["file"] for row in rows] == ["slow.pdf", "fast.epub", "bad.pdf"]
+    assert rows[1]["pages_per_s"] == "8.00"
+    # pages 2 and 4 carry text_mismatch, page 1 is an extractor mismatch
+    assert rows[1]["mismatch_pages"] == "3" and rows[1]["mismatch_rate"] == "0.7500"
+    assert rows[1]["flagged_pages"] == "2" and rows[1]["ocr_pages"] == "1"
+    assert rows[2]["status"] == "failed" and rows[2]["error"] == "ValueError: broken"
+
+    html_text = report.paths["html"].read_text(encoding="utf-8")
+    assert "3 of 3 jobs done (finished), 1 failed, 0 skipped" in html_text
+    assert 'http-equiv="refresh"' not in html_text
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_batch_report_escapes_job_fields(tmp_path):
+    pytest.importorskip("jinja2")
+    report = qa_report.BatchReport(tmp_path, "manifest", total_jobs=1)
+    report.write()
+    assert '<td colspan="12">No jobs finished yet</td>' in report.paths["html"].read_text(encoding="utf-8")
+
+    report.add(qa_report.JobSummary.failed("<b>&.pdf", "pdf", 0.1, ValueError("'quoted'")))
+    html_text = report.finish()["html"].read_text(encoding="utf-8")
+
+    assert "<td>&lt;b&gt;&amp;.pdf</td>" in html_text
+    assert "<td>ValueError: &#39;quoted&#39;</td>" in html_text
+    assert '<tr class="has-discrepancy">' in html_text
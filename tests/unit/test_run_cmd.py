@@ -0,0 +1,131 @@
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from pipeline.common import ToolError, ToolInterrupted, arun_cmd, run_cmd, stream_cmd
+from pipeline.extractors.poppler_text import _split_pages, pdftotext_pages, pdftotext_pages_async
+
+
+def test_stream_cmd_decodes_characters_split_across_reads():
+    script = (
+        "import sys, time\n"
+        "data = 'é€😀\\f'.encode() * 3\n"
+        "for i in range(len(data)):\n"
+        "    sys.stdout.buffer.write(data[i:i + 1]); sys.stdout.buffer.flush()\n"
+        "    if i % 5 == 0: time.sleep(0.001)\n"
+    )
+    chunks = list(stream_cmd([sys.executable, "-c", script]))
+    assert "".join(chunks) == "é€😀\f" * 3
+    assert len(chunks) > 1
+
+
+def test_stream_cmd_drains_large_stderr_and_reports_its_tail():
+    script = "import sys; sys.stderr.write('x' * 1_000_000 + 'END'); print('out'); sys.exit(2)"
+    with pytest.raises(ToolError) as failed:
+        run_cmd([sys.executable, "-c", script], env={"PYTHONIOENCODING": "utf-8"})
+    assert failed.value.returncode == 2 and str(failed.value).endswith("END")
+    assert len(str(failed.value)) < 100_000
+
+
+def test_timeout_kills_the_whole_process_group():
+    start = time.monotonic()
+    # The background sleep keeps stdout open unless the group is killed.
+    with pytest.raises(ToolInterrupted, match="timed out after 0.2 s"):
+        run_cmd(["sh", "-c", "sleep 30 & wait"], timeout=0.2)
+    assert time.monotonic() - start < 5
+
+
+def test_cancel_and_early_close_stop_the_command():
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    with pytest.raises(ToolInterrupted, match="was cancelled"):
+        list(stream_cmd(["sh", "-c", "sleep 30 & wait"], cancel=cancel))
+
+    start = time.monotonic()
+    stream = stream_cmd(["sh", "-c", "yes & wait"])
+    assert next(stream).startswith("y\n")
+    stream.close()
+    assert time.monotonic() - start < 5
+
+
+def test_split_pages_matches_split_on_whole_output():
+    rng = random.Random(7)
+    text = "".join(rng.choice("ab \n\f") for _ in range(2000)) + "\f"
+    cuts = sorted(rng.sample(range(1, len(text)), 40))
+    chunks = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+    assert list(_split_pages(chunks)) == text.split("\f")
+    assert list(_split_pages([])) == [""]
+
+
+def test_arun_cmd_returns_output_and_raises_tool_errors():
+    assert asyncio.run(arun_cmd([sys.executable, "-c", "print('é' * 3)"])) == "ééé\n"
+    with pytest.raises(ToolError) as failed:
+        asyncio.run(arun_cmd([sys.executable, "-c", "import sys; sys.exit('bad input')"]))
+    assert failed.value.returncode == 1 and str(failed.value).endswith("bad input")
+
+
+def test_astream_cmd_timeout_and_cancel_kill_the_process_group():
+    start = time.monotonic()
+    with pytest.raises(ToolInterrupted, match="timed out after 0.2 s"):
+        asyncio.run(arun_cmd(["sh", "-c", "sleep 30 & wait"], timeout=0.2))
+    assert time.monotonic() - start < 5
+
+    async def cancel_soon():
+        task = asyncio.ensure_future(arun_cmd(["sh", "-c", "sleep 30 & wait"]))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        await task
+
+    start = time.monotonic()
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel_soon())
+    assert time.monotonic() - start < 5
+
+
+def test_pdftotext_pages_async_matches_sync(tmp_path, monkeypatch):
+    tool = tmp_path / "pdftotext"
+    tool.write_text("#!/bin/sh\nprintf 'one\\fsecond page\\f'\n")
+    tool.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    pages = asyncio.run(pdftotext_pages_async("book.pdf"))
+
+    assert pages == pdftotext_pages("book.pdf")
+    assert [page.raw_text for page in pages] == ["one", "second page", ""]
+
+
+def test_stream_cmd_translates_newlines_split_across_reads():
+    script = (
+        "import sys, time\n"
+        "out = sys.stdout.buffer\n"
+        "out.write(b'one\\r'); out.flush(); time.sleep(0.05)\n"
+        "out.write(b'\\ntwo\\rthree\\r\\n'); out.flush()\n"
+    )
+
+    assert run_cmd([sys.executable, "-c", script]) == "one\ntwo\nthree\n"
+    assert asyncio.run(arun_cmd([sys.executable, "-c", script])) == "one\ntwo\nthree\n"
+
+
+def test_watcher_does_not_signal_a_reaped_process(monkeypatch):
+    from pipeline import common
+
+    killed = []
+    monkeypatch.setattr(common, "_kill_group", killed.append)
+    proc = subprocess.Popen([sys.executable, "-c", "pass"], start_new_session=True)
+    reap_lock = threading.Lock()
+    assert common._reap(proc, reap_lock) == 0
+
+    # Its pid may already belong to someone else; a late cancel must not kill
+    # it, nor report a command that finished on its own as interrupted.
+    cancel = threading.Event()
+    cancel.set()
+    reason = []
+    common._watch(proc, threading.Event(), reap_lock, None, cancel, reason)
+
+    assert killed == [] and reason == []
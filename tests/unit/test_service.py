@@ -0,0 +1,84 @@
+import threading
+import zipfile
+
+import pytest
+
+import cli
+from benchmarks.generators import make_synthetic_epub
+from pipeline.service import ConversionServer, ServiceError, submit
+
+
+@pytest.fixture
+def serve(tmp_path):
+    servers = []
+
+    def start(handler):
+        server = ConversionServer(tmp_path / "svc.sock", handler)
+        thread = threading.Thread(
+            target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        thread.start()
+        servers.append((server, thread))
+        return server
+
+    yield start
+    for server, thread in servers:
+        server.shutdown()
+        server.server_close()
+        thread.join(timeout=5)
+
+
+def test_service_answers_jobs_errors_and_ping(serve):
+    def handler(request):
+        if request["command"] == "fail":
+            raise RuntimeError("boom")
+        return {"echo": request["value"]}
+
+    server = serve(handler)
+
+    assert submit(server.socket_path, {"command": "echo", "value": 3}) == {"ok": True, "echo": 3}
+    with pytest.raises(ServiceError, match="RuntimeError: boom"):
+        submit(server.socket_path, {"command": "fail"})
+    assert submit(server.socket_path, {"command": "ping"})["jobs"] == 2
+
+
+def test_service_refuses_second_server_and_replaces_stale_socket(tmp_path, serve):
+    stale = tmp_path / "svc.sock"
+    stale.write_text("")  # left behind by a killed service
+
+    server = serve(lambda request: {})
+
+    with pytest.raises(ServiceError, match="already listening"):
+        ConversionServer(server.socket_path, lambda request: {})
+
+
+def test_cli_client_mode_converts_through_service(tmp_path, serve, capsys):
+    pytest.importorskip("jinja2")  # QA reports
+    epub = make_synthetic_epub(tmp_path / "book.epub", chapters=2, paragraphs=3)
+    reports = tmp_path / "reports"
+    server = serve(
+        lambda request: cli._service_job(request, config_dir=cli.Path("config"), report_dir=reports)
+    )
+
+    exit_code = cli.main(
+        [
+            "--server",
+            str(server.socket_path),
+            "--report-dir",
+            str(reports),
+            "epub",
+            "--input",
+            str(epub),
+            "--out",
+            str(tmp_path / "out" / "book.xml"),
+            "--publisher",
+            "publisher_A",
+        ]
+    )
+
+    assert exit_code == 0
+    output = capsys.readouterr().out.strip()
+    assert output == str(tmp_path / "out" / "book.zip")
+    with zipfile.ZipFile(output) as zf:
+        assert "Book.xml" in zf.namelist()
+    assert (reports / "book_qa.csv").exists()
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pipeline.instrumentation import StageRecorder, record_queue_wait
+from pipeline.steps import arun_steps, cpu_step, run_steps, tool_step
+
+
+async def _slow_tool(seconds):
+    await asyncio.sleep(seconds)
+    return "tool"
+
+
+def _pipeline(log, tool_seconds=0.0, cpu_seconds=0.0):
+    try:
+        first = yield cpu_step(lambda value: value * 2, 21)
+        second = yield tool_step(lambda seconds: "tool", _slow_tool, tool_seconds)
+        third = yield cpu_step(time.sleep, cpu_seconds)
+        log.append("finished")
+        return first, second, third
+    finally:
+        log.append("cleaned up")
+
+
+def test_run_steps_and_arun_steps_return_the_same_result():
+    log = []
+    assert run_steps(_pipeline(log)) == (42, "tool", None)
+    assert asyncio.run(arun_steps(_pipeline(log))) == (42, "tool", None)
+    assert log == ["finished", "cleaned up"] * 2
+
+
+def test_step_errors_are_raised_inside_the_generator():
+    caught = []
+
+    def steps():
+        try:
+            yield cpu_step(int, "not a number")
+        except ValueError as exc:
+            caught.append(exc)
+        return (yield cpu_step(int, "7"))
+
+    assert run_steps(steps()) == 7
+    assert asyncio.run(arun_steps(steps())) == 7
+    assert len(caught) == 2
+
+
+def test_cancelling_a_tool_step_unwinds_the_generator():
+    log = []
+
+    async def main():
+        task = asyncio.ensure_future(arun_steps(_pipeline(log, tool_seconds=30)))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main())
+    assert log == ["cleaned up"]
+
+
+def test_cancelling_a_cpu_step_waits_for_its_thread():
+    log = []
+    started = threading.Event()
+
+    def steps():
+        try:
+            yield cpu_step(lambda: (started.set(), time.sleep(0.3)))
+            log.append("next step")
+        finally:
+            log.append("cleaned up")
+
+    async def main(executor):
+        task = asyncio.ensure_future(arun_steps(steps(), executor=executor))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        await task
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        start = time.monotonic()
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(main(executor))
+    assert time.monotonic() - start >= 0.25
+    assert log == ["cleaned up"]
+
+
+def test_cpu_steps_run_inside_the_current_stage():
+    def steps(recorder):
+        with recorder.stage("wait"):
+            yield cpu_step(record_queue_wait, 0.5)
+        return recorder.stages[0].queue_wait_s
+
+    assert run_steps(steps(StageRecorder())) == 0.5
+    assert asyncio.run(arun_steps(steps(StageRecorder()))) == 0.5
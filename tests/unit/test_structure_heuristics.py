@@ -196,3 +196,30 @@ def test_chapter_fallback_without_keyword(tmp_path):
         "Introduction",
         "Background",
     ]
+
+
+def test_table_after_image_consumes_only_table_lines(tmp_path):
+    pdf_xml = dedent(
+        """
+        <pdf2xml>
+          <fontspec id="f2" size="12" family="Body" />
+          <page number="5" width="600" height="800">
+            <text top="100" left="100" width="380" height="15" font="f2">Body text long enough to set the base font size.</text>
+            <image top="130" left="100" width="200" height="100" src="fig-5.png"/>
+            <text top="250" left="100" width="60" height="15" font="f2">Drug</text>
+            <text top="250" left="300" width="60" height="15" font="f2">Dose</text>
+            <text top="268" left="100" width="60" height="15" font="f2">Aspirin</text>
+            <text top="268" left="300" width="60" height="15" font="f2">81 mg</text>
+            <text top="330" left="100" width="380" height="15" font="f2">Closing paragraph after the table on this page.</text>
+          </page>
+        </pdf2xml>
+        """
+    ).strip()
+    pdf_path = tmp_path / "table.xml"
+    pdf_path.write_text(pdf_xml, encoding="utf-8")
+
+    blocks = label_blocks(str(pdf_path), mapping={})
+
+    assert [block["label"] for block in blocks] == ["para", "figure", "table", "para"]
+    assert blocks[2]["rows"] == [["Drug", "Dose"], ["Aspirin", "81 mg"]]
+    assert blocks[3]["text"] == "Closing paragraph after the table on this page."